@@ -1,9 +1,55 @@
+import time
+start_time = time.perf_counter()
+import argparse
+
+parser = argparse.ArgumentParser(description='Browse and edit sqlite tables.')
+parser.add_argument('--record-keys', metavar='FILE',
+                    help='record the pressed keys to FILE, to be replayed by '
+                         'benchmarks.replay')
+parser.add_argument('--trace-sql', metavar='FILE',
+                    help='write every SQL statement, with its time, to FILE')
+parser.add_argument('--slow-queries', metavar='FILE',
+                    help='write slow SQL statements, with their query plans, '
+                         'to FILE')
+parser.add_argument('--startup-profile', metavar='FILE',
+                    help='profile starting up until the first screen is '
+                         'drawn, write the profile to FILE and show the time '
+                         'that it took')
+args = parser.parse_args()
+if args.startup_profile:
+    # Started before the other modules are imported, so that importing
+    # them is profiled too.
+    import profiler
+    profiler.Profiler.start()
+
 import ui
+import keylog
+import sqltrace
 import shared
+import render
+import status_bar
+import enums
 import settings.keys
 
+if args.trace_sql or args.slow_queries:
+    sqltrace.SQLTraceRegistry.create(args.trace_sql, args.slow_queries)
+
 ui.UIRegistry.create(settings.keys.KeyMap.get())
 user_interface = ui.UIRegistry.get()
 user_interface.create()
+if args.startup_profile:
+    render.RenderScheduler.flush()
+    elapsed = time.perf_counter() - start_time
+    try:
+        summary = profiler.Profiler.stop(args.startup_profile)
+    except OSError as err:
+        summary = str(err)
+    status_bar.StatusBarRegistry.get().prompt(
+            'First screen in {:.1f}ms.  {}'.format(elapsed * 1000, summary),
+            enums.Prompt.INFO)
+if args.record_keys:
+    keylog.KeyRecorderRegistry.create(args.record_keys)
 user_interface.get_key()
 ui.UIRegistry.destroy()
+keylog.KeyRecorderRegistry.destroy()
+sqltrace.SQLTraceRegistry.destroy()
@@ -0,0 +1,665 @@
+"""Draw on a terminal or on a screen in memory.
+
+Widgets used to call curses directly to start the terminal and to make
+their windows and pads, so nothing could be drawn, measured or checked
+without a real terminal.  They now get their windows from a backend.
+CursesBackend is the terminal and is used by default.  MemoryBackend
+keeps the screen in memory, so that drawing can be run without a
+terminal, for example by the benchmarks, and what ends up on the screen
+can be read back exactly.  It also counts the writes, the refreshes and
+the bytes that a terminal would have been sent.
+
+The constants of curses, such as curses.A_REVERSE and curses.KEY_RESIZE,
+are still used directly.  Like curses.initscr, MemoryBackend sets
+curses.LINES and curses.COLS to the size of its screen.
+
+Classes:
+    BackendRegistry: Choose the backend that widgets draw with.
+    CursesBackend: Draw on the terminal.
+    MemoryBackend: Draw on a screen in memory.
+    MemoryWindow: A window or pad of a MemoryBackend.
+    NoInputError: A key was waited for and none was left.
+"""
+import collections
+import curses
+import time
+import unicodedata
+
+
+class NoInputError(Exception):
+    """Raised when a MemoryBackend waits for a key and none is left.
+
+    A terminal would wait for the user forever.
+    """
+    pass
+
+
+class BackendRegistry:
+    """Choose the backend that widgets draw with.
+
+    This class provides static methods to get and set the backend.  The
+    backend must be set before the user interface is created.
+
+    Methods:
+        get: Return the backend.
+        set: Set the backend.
+    """
+    _backend = None
+
+    @staticmethod
+    def get():
+        """Return the backend.
+
+        If none has been set, then a CursesBackend is set and returned.
+        """
+        if BackendRegistry._backend is None:
+            BackendRegistry._backend = CursesBackend()
+        return BackendRegistry._backend
+
+    @staticmethod
+    def set(backend):
+        """Set the backend.
+
+        Args:
+            backend: A CursesBackend or a MemoryBackend.
+        """
+        BackendRegistry._backend = backend
+
+
+class CursesBackend:
+    """Draw on the terminal.
+
+    Every method calls the curses function of the same name.
+
+    Methods:
+        initscr: Start curses and return the screen window.
+        endwin: End curses.
+        cbreak, nocbreak, echo, noecho, curs_set: Set the terminal mode.
+        newwin: Return a new window.
+        newpad: Return a new pad.
+        doupdate: Update the terminal.
+        ungetch: Push a key back onto the input.
+        update_lines_cols: Update curses.LINES and curses.COLS.
+    """
+    def initscr(self):
+        return curses.initscr()
+
+    def endwin(self):
+        curses.endwin()
+
+    def cbreak(self):
+        curses.cbreak()
+
+    def nocbreak(self):
+        curses.nocbreak()
+
+    def echo(self):
+        curses.echo()
+
+    def noecho(self):
+        curses.noecho()
+
+    def curs_set(self, visibility):
+        curses.curs_set(visibility)
+
+    def newwin(self, rows, cols, beg_row, beg_col):
+        return curses.newwin(rows, cols, beg_row, beg_col)
+
+    def newpad(self, rows, cols):
+        return curses.newpad(rows, cols)
+
+    def doupdate(self):
+        curses.doupdate()
+
+    def ungetch(self, key):
+        curses.ungetch(key)
+
+    def update_lines_cols(self):
+        curses.update_lines_cols()
+
+
+# Bytes that select an attribute, after resetting the attributes with
+# '\x1b[0m'.  The other attributes are not used by aniLog.
+_ATTR_CODES = ((curses.A_BOLD, '\x1b[1m'), (curses.A_UNDERLINE, '\x1b[4m'),
+               (curses.A_REVERSE, '\x1b[7m'))
+
+
+def _char_width(char):
+    """Return the number of screen columns that a character takes."""
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+class MemoryBackend:
+    """Draw on a screen in memory.
+
+    Windows copy their cells to a virtual screen when noutrefresh is
+    called, and doupdate copies the cells of the virtual screen that
+    changed to the terminal screen, like curses does.  Each cell is a
+    character and its attributes.  The second column of a wide character
+    holds an empty string.
+
+    Keys are read from a queue that is filled with push_keys and
+    ungetch.  When a key is waited for and the queue is empty, the keys
+    returned by the key source are added, and NoInputError is raised if
+    there are none.  Getting a key with a timeout sleeps for the timeout
+    and returns -1, like a terminal when no key is pressed.
+
+    The counts are:
+        writes: Calls that draw on a window or pad, such as addstr,
+            chgat and erase.
+        refreshes: Windows and pads copied to the virtual screen.
+        updates: Calls to doupdate.
+        cells: Cells sent to the terminal.
+        bytes: An estimate of the bytes sent to the terminal.  A cell
+            costs the UTF-8 bytes of its character, moving the cursor
+            costs an ANSI cursor position sequence, and changing the
+            attributes costs an ANSI reset plus one code per attribute.
+            curses can send fewer, for example by scrolling lines or
+            by clearing to the end of a line.
+
+    Methods:
+        initscr: Return the screen window.
+        endwin, cbreak, nocbreak, echo, noecho, curs_set: Do nothing.
+        newwin: Return a new window.
+        newpad: Return a new pad.
+        doupdate: Update the terminal screen.
+        ungetch: Push a key back onto the input.
+        update_lines_cols: Set curses.LINES and curses.COLS.
+        push_keys: Add keys to the end of the input.
+        set_key_source: Set what gives keys when the input is empty.
+        resize_screen: Resize the screen as a terminal would.
+        clear_screen: Blank the screen.
+        get_lines: Return the text on the terminal screen.
+        get_attrs: Return the attributes of a line on the terminal screen.
+        get_counts: Return the counts.
+        reset_counts: Set the counts to zero.
+    """
+    def __init__(self, rows=24, cols=80):
+        """Constructor.
+
+        Args:
+            rows (int): The number of lines of the screen.
+            cols (int): The number of columns of the screen.
+        """
+        self.rows = rows
+        self.cols = cols
+        self._virtual = self._blank_screen()
+        self._terminal = self._blank_screen()
+        self._keys = collections.deque()
+        self._key_source = None
+        self._stdscr = None
+        self._counts = {}
+        self.reset_counts()
+
+    def initscr(self):
+        """Return the screen window and set curses.LINES and curses.COLS."""
+        if self._stdscr is None:
+            self._stdscr = MemoryWindow(self, self.rows, self.cols, 0, 0)
+        self.update_lines_cols()
+        return self._stdscr
+
+    def endwin(self):
+        pass
+
+    def cbreak(self):
+        pass
+
+    def nocbreak(self):
+        pass
+
+    def echo(self):
+        pass
+
+    def noecho(self):
+        pass
+
+    def curs_set(self, visibility):
+        pass
+
+    def newwin(self, rows, cols, beg_row, beg_col):
+        """Return a new window.
+
+        Raises;
+            curses.error: If the window does not fit in the screen.
+        """
+        if (beg_row + rows > self.rows) or (beg_col + cols > self.cols):
+            raise curses.error('newwin() returned NULL')
+        return MemoryWindow(self, rows, cols, beg_row, beg_col)
+
+    def newpad(self, rows, cols):
+        """Return a new pad."""
+        return MemoryWindow(self, rows, cols, is_pad=True)
+
+    def doupdate(self):
+        """Copy the cells that changed to the terminal screen."""
+        self._counts['updates'] += 1
+        cursor = None
+        cur_attr = curses.A_NORMAL
+        for row_idx in range(self.rows):
+            virtual_row = self._virtual[row_idx]
+            terminal_row = self._terminal[row_idx]
+            for col_idx in range(self.cols):
+                cell = virtual_row[col_idx]
+                if cell == terminal_row[col_idx]:
+                    continue
+                terminal_row[col_idx] = cell
+                char, attr = cell
+                if not char:
+                    # The second column of a wide character.
+                    continue
+                if cursor != (row_idx, col_idx):
+                    self._counts['bytes'] += len(
+                            '\x1b[{};{}H'.format(row_idx + 1, col_idx + 1))
+                if attr != cur_attr:
+                    self._counts['bytes'] += len('\x1b[0m') + sum(
+                            len(code) for bit, code in _ATTR_CODES
+                            if attr & bit)
+                    cur_attr = attr
+                self._counts['cells'] += 1
+                self._counts['bytes'] += len(char.encode('utf-8'))
+                cursor = (row_idx, col_idx + _char_width(char))
+
+    def ungetch(self, key):
+        """Push a key back onto the input, to be read next."""
+        if isinstance(key, str):
+            key = ord(key)
+        self._keys.appendleft(key)
+
+    def update_lines_cols(self):
+        curses.LINES = self.rows
+        curses.COLS = self.cols
+
+    def push_keys(self, keys):
+        """Add keys to the end of the input.
+
+        Args:
+            keys: A str, or an iterable of ints and strs of one character.
+        """
+        for key in keys:
+            self._keys.append(ord(key) if isinstance(key, str) else key)
+
+    def set_key_source(self, key_source):
+        """Set what gives keys when the input is empty.
+
+        Args:
+            key_source: A function that takes no arguments and returns
+                a list of keys to add to the input, or None.  It is
+                called when a key is waited for and the input is empty.
+                It may also call push_keys and resize_screen.
+        """
+        self._key_source = key_source
+
+    def resize_screen(self, rows, cols):
+        """Resize the screen as a terminal would.
+
+        The screen is cleared, and curses.KEY_RESIZE is added to the end
+        of the input.  curses.LINES and curses.COLS are set when the
+        Resize command calls update_lines_cols.
+        """
+        self.rows = rows
+        self.cols = cols
+        self._virtual = self._blank_screen()
+        self._terminal = self._blank_screen()
+        if self._stdscr is not None:
+            self._stdscr.resize(rows, cols)
+        self._keys.append(curses.KEY_RESIZE)
+
+    def clear_screen(self):
+        """Blank the virtual and terminal screens.
+
+        Nothing is counted, as if the terminal had been cleared by
+        something else.  The windows are not changed.
+        """
+        self._virtual = self._blank_screen()
+        self._terminal = self._blank_screen()
+
+    def get_lines(self):
+        """Return the text of each line on the terminal screen.
+
+        Trailing spaces are kept, so every line is as wide as the screen,
+        less one column for each wide character.
+        """
+        return [''.join(char for char, attr in row) for row in self._terminal]
+
+    def get_attrs(self, row_idx):
+        """Return the attributes of each cell of a terminal screen line."""
+        return [attr for char, attr in self._terminal[row_idx]]
+
+    def get_counts(self):
+        """Return a copy of the counts.
+
+        Returns:
+            A dict from 'writes', 'refreshes', 'updates', 'cells' and
+            'bytes' to ints.
+        """
+        return dict(self._counts)
+
+    def reset_counts(self):
+        """Set the counts to zero."""
+        self._counts = dict.fromkeys(
+                ('writes', 'refreshes', 'updates', 'cells', 'bytes'), 0)
+
+    def _blank_screen(self):
+        return [[(' ', curses.A_NORMAL)] * self.cols for row in range(self.rows)]
+
+    def _copy(self, cells, touched, beg_row, beg_col, scr_rect):
+        """Copy the touched lines of a window to the virtual screen.
+
+        Args:
+            cells: The cells of the window.
+            touched (set): The indices of the lines of the window that
+                changed.  The lines that are copied are removed.
+            beg_row (int): The first line of the window to copy.
+            beg_col (int): The first column of the window to copy.
+            scr_rect: A tuple (top, left, bottom, right) of the screen
+                rectangle to copy to.
+        """
+        self._counts['refreshes'] += 1
+        top, left, bottom, right = scr_rect
+        bottom = min(bottom, self.rows - 1)
+        right = min(right, self.cols - 1)
+        for scr_row in range(max(top, 0), bottom + 1):
+            row_idx = beg_row + scr_row - top
+            if row_idx >= len(cells):
+                break
+            if row_idx not in touched:
+                continue
+            touched.discard(row_idx)
+            row = cells[row_idx]
+            virtual_row = self._virtual[scr_row]
+            for scr_col in range(max(left, 0), right + 1):
+                col_idx = beg_col + scr_col - left
+                if col_idx >= len(row):
+                    break
+                virtual_row[scr_col] = row[col_idx]
+
+    def _get_key(self, delay):
+        """Return the next key.
+
+        Args:
+            delay (int): The milliseconds to wait for a key, or a
+                negative number to wait until there is one.
+
+        Raises;
+            NoInputError: If delay is negative and no key is left.
+        """
+        if (not self._keys) and (delay < 0) and\
+                (self._key_source is not None):
+            self.push_keys(self._key_source() or [])
+        if self._keys:
+            return self._keys.popleft()
+        if delay < 0:
+            raise NoInputError('no keys are left')
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return -1
+
+
+class MemoryWindow:
+    """A window or pad of a MemoryBackend.
+
+    This supports the methods of curses windows that aniLog uses, with
+    the same arguments.  Writing past the end of a line continues on the
+    next line, and writing past the end of the window raises curses.error
+    after writing what fits, as curses does.
+
+    Methods:
+        addstr, addnstr, insch, delch, chgat, clrtoeol, erase, clear:
+            Draw on the window.
+        move, getyx, getmaxyx, getbegyx: Move the cursor and get the
+            position and size.
+        instr: Return the characters of a line as bytes.
+        overwrite: Copy a rectangle to another window.
+        resize, mvwin: Change the size and the position.
+        touchwin: Mark every line to be copied by the next refresh.
+        noutrefresh, refresh: Copy to the virtual screen.
+        getch: Return the next key.
+        keypad, leaveok, nodelay, timeout: Set the input and cursor
+            options.
+    """
+    def __init__(self, backend, rows, cols, beg_row=0, beg_col=0,
+                 is_pad=False):
+        self._backend = backend
+        self._rows = rows
+        self._cols = cols
+        self._beg_row = beg_row
+        self._beg_col = beg_col
+        self._is_pad = is_pad
+        self._cells = [self._blank_line() for row in range(rows)]
+        self._touched = set(range(rows))
+        self._cur_row = 0
+        self._cur_col = 0
+        self._delay = -1
+
+    def addstr(self, *args):
+        """addstr([y, x,] str[, attr])"""
+        row, col, args = self._split_position(args, 1)
+        attr = args[1] if len(args) > 1 else curses.A_NORMAL
+        self._put(row, col, args[0], attr)
+
+    def addnstr(self, *args):
+        """addnstr([y, x,] str, n[, attr])"""
+        row, col, args = self._split_position(args, 2)
+        attr = args[2] if len(args) > 2 else curses.A_NORMAL
+        self._put(row, col, args[0][: max(args[1], 0)], attr)
+
+    def insch(self, *args):
+        """insch([y, x,] ch[, attr])"""
+        row, col, args = self._split_position(args, 1)
+        char = chr(args[0]) if isinstance(args[0], int) else args[0]
+        attr = args[1] if len(args) > 1 else curses.A_NORMAL
+        self._write()
+        line = self._cells[row]
+        line.insert(col, (char, attr))
+        line.pop()
+        self._touched.add(row)
+
+    def delch(self, *args):
+        """delch([y, x])"""
+        row, col, args = self._split_position(args, 0)
+        self._write()
+        line = self._cells[row]
+        del line[col]
+        line.append((' ', curses.A_NORMAL))
+        self._touched.add(row)
+
+    def chgat(self, *args):
+        """chgat([y, x,] [num,] attr)"""
+        if len(args) > 2:
+            row, col = args[0], args[1]
+            self.move(row, col)
+            args = args[2:]
+        else:
+            row, col = self._cur_row, self._cur_col
+        num = args[0] if len(args) > 1 else -1
+        attr = args[-1]
+        self._write()
+        line = self._cells[row]
+        end = self._cols if num < 0 else min(col + num, self._cols)
+        for col_idx in range(col, end):
+            line[col_idx] = (line[col_idx][0], attr)
+        self._touched.add(row)
+
+    def clrtoeol(self):
+        self._write()
+        line = self._cells[self._cur_row]
+        line[self._cur_col:] = [(' ', curses.A_NORMAL)] *\
+                (self._cols - self._cur_col)
+        self._touched.add(self._cur_row)
+
+    def erase(self):
+        self._write()
+        self._cells = [self._blank_line() for row in range(self._rows)]
+        self._touched = set(range(self._rows))
+        self._cur_row = 0
+        self._cur_col = 0
+
+    def clear(self):
+        self.erase()
+
+    def move(self, row, col):
+        """Move the cursor.
+
+        Raises;
+            curses.error: If the position is outside of the window.
+        """
+        if not ((0 <= row < self._rows) and (0 <= col < self._cols)):
+            raise curses.error('wmove() returned ERR')
+        self._cur_row = row
+        self._cur_col = col
+
+    def getyx(self):
+        return (self._cur_row, self._cur_col)
+
+    def getmaxyx(self):
+        return (self._rows, self._cols)
+
+    def getbegyx(self):
+        return (self._beg_row, self._beg_col)
+
+    def instr(self, *args):
+        """instr([y, x,] [n])"""
+        row, col, args = self._split_position(args, 0)
+        line = self._cells[row][col:]
+        if args:
+            line = line[: args[0]]
+        return ''.join(char for char, attr in line).encode('utf-8')
+
+    def overwrite(self, destwin, sminrow, smincol, dminrow, dmincol, dmaxrow,
+                  dmaxcol):
+        """Copy a rectangle of cells, with their attributes, to a window.
+
+        Only the form of curses that gives the rectangle is supported.
+        The rows and columns of the destination are inclusive.
+        """
+        self._write()
+        rows = [self._cells[sminrow + row_idx]
+                [smincol: smincol + dmaxcol - dmincol + 1]
+                for row_idx in range(dmaxrow - dminrow + 1)]
+        for row_idx, cells in enumerate(rows, dminrow):
+            destwin._cells[row_idx][dmincol: dmincol + len(cells)] = cells
+            destwin._touched.add(row_idx)
+
+    def resize(self, rows, cols):
+        """Resize the window, keeping the cells that still fit."""
+        self._cells = [(line + self._blank_line())[: cols]
+                       for line in self._cells[: rows]]
+        self._rows = rows
+        self._cols = cols
+        self._cells.extend(self._blank_line()
+                           for row in range(rows - len(self._cells)))
+        self._touched = set(range(rows))
+        self._cur_row = min(self._cur_row, rows - 1)
+        self._cur_col = min(self._cur_col, cols - 1)
+
+    def mvwin(self, beg_row, beg_col):
+        """Move the window.
+
+        Raises;
+            curses.error: If the window would not fit in the screen.
+        """
+        if (beg_row + self._rows > self._backend.rows) or\
+                (beg_col + self._cols > self._backend.cols):
+            raise curses.error('mvwin() returned ERR')
+        self._beg_row = beg_row
+        self._beg_col = beg_col
+
+    def touchwin(self):
+        self._touched = set(range(self._rows))
+
+    def noutrefresh(self, *args):
+        """noutrefresh() for windows, or for pads:
+        noutrefresh(pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol)
+        """
+        if self._is_pad:
+            beg_row, beg_col = args[0], args[1]
+            scr_rect = args[2:]
+        else:
+            beg_row, beg_col = 0, 0
+            scr_rect = (self._beg_row, self._beg_col,
+                        self._beg_row + self._rows - 1,
+                        self._beg_col + self._cols - 1)
+        self._backend._copy(self._cells, self._touched, beg_row, beg_col,
+                            scr_rect)
+
+    def refresh(self, *args):
+        """Same as noutrefresh, then update the terminal screen."""
+        self.noutrefresh(*args)
+        self._backend.doupdate()
+
+    def getch(self):
+        """Return the next key.
+
+        A window that changed is refreshed first, as curses does.
+
+        Raises;
+            NoInputError: If this waits for a key and none is left.
+        """
+        if (not self._is_pad) and self._touched:
+            self.refresh()
+        return self._backend._get_key(self._delay)
+
+    def keypad(self, flag):
+        pass
+
+    def leaveok(self, flag):
+        pass
+
+    def nodelay(self, flag):
+        self._delay = 0 if flag else -1
+
+    def timeout(self, delay):
+        self._delay = delay
+
+    def _blank_line(self):
+        return [(' ', curses.A_NORMAL)] * self._cols
+
+    def _split_position(self, args, count):
+        """Move the cursor if args start with a position.
+
+        Args:
+            args (tuple): The arguments of a drawing method.
+            count (int): The number of arguments that the method needs
+                besides the position.
+
+        Returns:
+            A tuple (row, col, the other arguments).
+        """
+        if len(args) >= count + 2:
+            self.move(args[0], args[1])
+            args = args[2:]
+        return self._cur_row, self._cur_col, args
+
+    def _put(self, row, col, text, attr):
+        """Write a string at a position.
+
+        Raises;
+            curses.error: If the string does not fit in the window.  What
+                fits is written.
+        """
+        self._write()
+        for char in text:
+            width = _char_width(char)
+            if col + width > self._cols:
+                row = row + 1
+                col = 0
+            if row >= self._rows:
+                self._cur_row, self._cur_col = self._rows - 1, self._cols - 1
+                raise curses.error('addwstr() returned ERR')
+            line = self._cells[row]
+            line[col] = (char, attr)
+            if width == 2:
+                line[col + 1] = ('', attr)
+            self._touched.add(row)
+            col = col + width
+        if col >= self._cols:
+            if row + 1 >= self._rows:
+                # curses cannot move the cursor past the last cell.
+                self._cur_row, self._cur_col = self._rows - 1, self._cols - 1
+                raise curses.error('addwstr() returned ERR')
+            row, col = row + 1, 0
+        self._cur_row = row
+        self._cur_col = col
+
+    def _write(self):
+        self._backend._counts['writes'] += 1
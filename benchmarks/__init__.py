@@ -0,0 +1,24 @@
+"""Measure how long aniLog takes to do common things.
+
+The benchmarks run aniLog's commands on synthetic databases with the
+same nine columns as the databases made by aniData, at several sizes.
+The timings are written to a JSON file so that two versions of aniLog
+can be compared.
+
+Usage (from the directory that contains aniLog.py, in a terminal unless
+--headless is given):
+    $ python -m benchmarks.run --rows 1000 100000 1000000 -o new.json
+    $ python -m benchmarks.compare old.json new.json
+
+Keys recorded with 'aniLog.py --record-keys keys.log' can be replayed:
+    $ python -m benchmarks.replay keys.log --files Big.db
+
+A database can also be generated on its own:
+    $ python -m benchmarks.generate Big.db 100000
+
+Modules:
+    generate: Make databases with the aniData schema.
+    run: Time commands and write the results as JSON.
+    compare: Compare the results of two runs.
+    replay: Replay recorded keys and report their latencies.
+"""
@@ -0,0 +1,330 @@
+"""Check the logic behind the screen, without drawing the screen.
+
+Each check runs one part of aniLog on its own and compares what it
+returns with what it should:
+    layout: Column widths never cut numbers or primary keys, and mostly
+        empty columns are as wide as their values.
+    warmcache: Snapshots are read back as they were saved, and one that
+        cannot be read is left out without losing the others.
+    jobs: Cancelling a Job interrupts its statement and not those of the
+        next Job, Esc leaves the Jobs that aniLog started on its own, and
+        small Jobs wait their turn on their database's writer.
+    rowstore: A RowStore returns the rows that were stored, and keeps
+        1, 1.0 and True apart.
+    fit: Values are cut and padded by screen width.
+    interrupt: Esc cancels a query even after other keys, which are
+        given back in order.
+
+No terminal is needed, so this can run in CI.  The exit status is 1 if
+anything differs, and what differs is printed.
+
+Usage:
+    $ python -m benchmarks.check_logic
+
+Functions:
+    check: Run every check and return what differs.
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import backend
+import browser
+import db
+import layout
+import rowstore
+import ui
+import warmcache
+import workers
+import settings.keys
+import settings.positions as positions
+
+# Rows of the table whose column widths are checked.
+LAYOUT_ROWS = 20000
+# Seconds that a Job's statement is allowed to take to stop once the Job
+# is cancelled.
+CANCEL_TIMEOUT = 2
+
+
+def _compare(name, actual, expected, errors):
+    """Add an error to 'errors' if a value is not the expected one."""
+    if actual != expected:
+        errors.append('{}:\n    expected {!r}\n    actual   {!r}'.format(
+                          name, expected, actual))
+
+
+def _wait(pool, jobs):
+    """Deliver the events of a pool until the given Jobs have finished."""
+    end = time.perf_counter() + CANCEL_TIMEOUT * 5
+    while not all(job.is_finished() for job in jobs):
+        if time.perf_counter() > end:
+            raise RuntimeError('a Job did not finish')
+        pool.poll()
+        time.sleep(0.001)
+
+
+def _slow_query(rows):
+    """Return a statement that counts up to 'rows' in sqlite."""
+    return 'with recursive n(x) as (select 1 union all select x + 1 from n'\
+           ' where x < {}) select count(*) from n'.format(rows)
+
+
+def _check_layout(errors):
+    """Check the column widths of a table with long ids and sparse notes."""
+    rand = random.Random(0)
+    notes = set(rand.sample(range(1, LAYOUT_ROWS + 1), LAYOUT_ROWS // 20))
+    connection = sqlite3.connect('layout.db')
+    connection.execute('create table anime (id integer primary key,'
+                       ' name text, score real, notes text, eps integer)')
+    connection.executemany(
+            'insert into anime values (?, ?, ?, ?, ?)',
+            ((idx, 'Mushishi', idx / 3,
+              'x' * 150 if idx in notes else None,
+              123456789012 if idx == LAYOUT_ROWS - 1 else 12)
+             for idx in range(1, LAYOUT_ROWS + 1)))
+    connection.commit()
+    connection.close()
+    conn = db.DBConnection('layout.db')
+    conn.connect()
+    try:
+        widths = layout.LayoutCache.get_widths(
+                conn, 'layout.db', 'anime',
+                ['id', 'name', 'score', 'notes', 'eps'])
+    finally:
+        conn.close()
+    # The last ids are 5 digits long, as is the longest id.
+    _compare('width of the primary key', widths[0],
+             len(str(LAYOUT_ROWS)), errors)
+    _compare('width of the text', widths[1], len('Mushishi'), errors)
+    if widths[2] < max(len(str(idx / 3))
+                       for idx in range(1, LAYOUT_ROWS + 1)):
+        errors.append('the reals are cut to {}'.format(widths[2]))
+    _compare('width of the notes, of which 95% are NULL', widths[3],
+             positions.MAX_COL_WIDTH, errors)
+    # Only one row has the long number, and it is not in the first rows.
+    _compare('width of the numbers', widths[4], len('123456789012'), errors)
+
+
+def _check_warmcache(errors):
+    """Check that snapshots are read back as they were saved."""
+    session_dir = 'we?ird#di%r'
+    os.mkdir(session_dir)
+    session = os.path.join(session_dir, 'session')
+    snapshots = [
+        warmcache.Snapshot(
+            'a.db', 'anime', 'stamp', 3, 'select * from "anime"', [2, 8],
+            [(1, 'Mushishi'), (2, '進撃の巨人')], 1, 1, 0, 0),
+        warmcache.Snapshot('a.db', 'empty', 'stamp', 3,
+                           'select * from "empty"', [], []),
+        warmcache.Snapshot('a.db', 'broken', 'stamp', 3,
+                           'select * from "broken"', [2], [(1,), (2,)]),
+        ]
+    warmcache.WarmCache.save(session, snapshots)
+    connection = sqlite3.connect(warmcache.WarmCache.get_path(session))
+    connection.execute("update snapshot set widths = 'x' where"
+                       " tbl = 'broken'")
+    connection.commit()
+    connection.close()
+    loaded = warmcache.WarmCache.load(session)
+    _compare('snapshots read back', sorted(loaded),
+             [('a.db', 'anime'), ('a.db', 'empty')], errors)
+    snapshot = loaded.get(('a.db', 'anime'))
+    if snapshot is not None:
+        _compare('rows of a snapshot', snapshot.rows, snapshots[0].rows,
+                 errors)
+        _compare('view of a snapshot',
+                 (snapshot.widths, snapshot.cur_row, snapshot.cur_col),
+                 ([2, 8], 1, 1), errors)
+
+
+def _check_jobs(errors):
+    """Check cancelling Jobs and running small Jobs."""
+    connection = sqlite3.connect('jobs.db')
+    connection.execute('create table log (name text)')
+    connection.commit()
+    connection.close()
+    pool = workers.WorkerPool()
+    try:
+        # Cancelling a Job interrupts its statement.
+        started = threading.Event()
+        def work_slow(job, conn):
+            started.set()
+            conn.execute(_slow_query(10 ** 10)).fetchall()
+        job = workers.Job('slow', 'jobs.db', work_slow)
+        pool.submit(job)
+        started.wait(CANCEL_TIMEOUT)
+        start = time.perf_counter()
+        job.cancel()
+        _wait(pool, [job])
+        if time.perf_counter() - start > CANCEL_TIMEOUT:
+            errors.append('cancelling a Job did not interrupt it')
+        _compare('error of a cancelled Job', job.error, None, errors)
+        # A Job that has finished cannot interrupt the next one.
+        started.clear()
+        results = []
+        def work_next(job, conn):
+            started.set()
+            results.append(conn.execute(_slow_query(10 ** 6)).fetchall())
+        next_job = workers.Job('next', 'jobs.db', work_next)
+        pool.submit(next_job)
+        started.wait(CANCEL_TIMEOUT)
+        job.cancel()
+        _wait(pool, [next_job])
+        _compare('result of the Job after a cancelled one',
+                 (results, next_job.error), ([[(10 ** 6,)]], None), errors)
+        # Esc leaves the Jobs that aniLog started on its own.
+        release = threading.Event()
+        def work_wait(job, conn):
+            release.wait(CANCEL_TIMEOUT)
+        internal = workers.Job('prefetch', 'jobs.db', work_wait,
+                               cancellable=False)
+        command = workers.Job('paste', 'jobs.db', work_wait)
+        pool.submit(internal)
+        pool.submit(command)
+        cancelled = pool.cancel_all(cancellable_only=True)
+        release.set()
+        _wait(pool, [internal, command])
+        _compare('Jobs cancelled by Esc', cancelled, 1, errors)
+        _compare('cancelled (prefetch, paste)',
+                 (internal.is_cancelled(), command.is_cancelled()),
+                 (False, True), errors)
+        # A small Job runs after the Jobs queued before it, and does not
+        # block the caller while they run.
+        release.clear()
+        def work_log(job, conn):
+            if job.name == 'first':
+                release.wait(CANCEL_TIMEOUT)
+            conn.execute('insert into log values (?)', (job.name,))
+            conn.commit()
+        first = workers.Job('first', 'jobs.db', work_log)
+        second = workers.Job('second', 'jobs.db', work_log)
+        pool.submit(first)
+        start = time.perf_counter()
+        finished = pool.run_now(second)
+        waited = time.perf_counter() - start
+        release.set()
+        _wait(pool, [first, second])
+        _compare('run_now finished behind a busy Job', finished, False,
+                 errors)
+        if waited > CANCEL_TIMEOUT / 2:
+            errors.append('run_now blocked for {:.1f}s'.format(waited))
+        third = workers.Job('third', 'jobs.db', work_log)
+        _compare('run_now finished on an idle writer', pool.run_now(third),
+                 True, errors)
+        connection = sqlite3.connect('jobs.db')
+        order = [row[0] for row in connection.execute(
+                     'select name from log order by rowid')]
+        connection.close()
+        _compare('order of the Jobs', order, ['first', 'second', 'third'],
+                 errors)
+    finally:
+        pool.shutdown()
+
+
+def _check_rowstore(errors):
+    """Check that a RowStore returns the rows that were stored."""
+    rand = random.Random(0)
+    rows = [(idx, rand.choice(['Sunrise', 'Wit', None]),
+             rand.choice([1, 1.0, True, 'x' * rand.randint(0, 3)]),
+             'name {}'.format(idx))
+            for idx in range(3000)]
+    store = rowstore.RowStore(rows)
+    expected = list(rows)
+    store[10] = expected[10] = (10, 'Madhouse', 2, 'changed')
+    store.pop(5)
+    expected.pop(5)
+    store.append((-1, 'Wit', 1.0, None))
+    expected.append((-1, 'Wit', 1.0, None))
+    _compare('rows of a RowStore', list(store), expected, errors)
+    _compare('slice of a RowStore', store[100: 110], expected[100: 110],
+             errors)
+    _compare('types kept apart', [type(row[2]) for row in store],
+             [type(row[2]) for row in expected], errors)
+
+
+def _check_fit(errors):
+    """Check that values are cut and padded by screen width."""
+    cases = [
+        (('Mushishi', 5), 'Mushi'),
+        (('Wit', 5), 'Wit  '),
+        # Wide characters take two columns, and one that does not fit is
+        # replaced by a space.
+        (('進撃の巨人', 5), '進撃 '),
+        # A combining mark takes no column.
+        (('Pokémon', 7), 'Pokémon'),
+        (('a\nb', 4), 'a b '),
+        ]
+    for args, expected in cases:
+        _compare('_fit{!r}'.format(args), browser._fit(*args), expected,
+                 errors)
+
+
+def _check_interrupt(errors):
+    """Check that Esc cancels a query even after other keys."""
+    scr = backend.MemoryBackend(6, 40)
+    backend.BackendRegistry.set(scr)
+    ui.UIRegistry.create(settings.keys.KeyMap.get())
+    try:
+        interface = ui.UIRegistry.get()
+        interface.create()
+        cases = [
+            # Esc behind other keys cancels, and they are given back.
+            (['a', 'b', 27], True, [ord('a'), ord('b')]),
+            (['a', 'b'], False, [ord('a'), ord('b')]),
+            # Esc and a key is Alt and that key.
+            ([27, 'x'], False, [27, ord('x')]),
+            ]
+        for keys, cancel, left in cases:
+            scr.push_keys(keys)
+            _compare('cancel after {!r}'.format(keys),
+                     interface._check_interrupt(0), cancel, errors)
+            remaining = []
+            key = scr._get_key(0)
+            while key != -1:
+                remaining.append(key)
+                key = scr._get_key(0)
+            _compare('keys left after {!r}'.format(keys), remaining, left,
+                     errors)
+    finally:
+        ui.UIRegistry.destroy()
+
+
+def check():
+    """Run every check and return what differs from what is expected.
+
+    The working directory is changed to a temporary directory while the
+    checks run, so that their databases go there.
+
+    Returns:
+        A list of the differences, as text.  It is empty if everything
+        is as expected.
+    """
+    errors = []
+    prev_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='aniLog-check-')
+    try:
+        os.chdir(work_dir)
+        for check_part in (_check_layout, _check_warmcache, _check_jobs,
+                           _check_rowstore, _check_fit, _check_interrupt):
+            check_part(errors)
+    finally:
+        os.chdir(prev_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return errors
+
+
+def main():
+    errors = check()
+    for error in errors:
+        print(error)
+    if errors:
+        sys.exit(1)
+    print('Everything is as expected.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Check what aniLog draws, headless, against the exact expected screen.
+
+A small table is opened on a backend.MemoryBackend, and the lines of the
+screen, the attributes of the current cell, and the writes, refreshes and
+terminal updates that it took are compared with what they should be.
+The cursor is then moved down one row, which must only redraw the two
+cells that changed.  No terminal is needed, so this can run in CI.  The
+exit status is 1 if anything differs, and what differs is printed.
+
+Usage:
+    $ python -m benchmarks.check_screen
+
+Functions:
+    check: Draw the table and return what differs.
+"""
+import curses
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import backend
+import browser
+import cmd_line_test
+import commands
+import enums
+import render
+import ui
+import settings.keys
+from benchmarks import run
+
+# Lines and columns of the screen.
+SCREEN = (6, 40)
+# The rows of the table that is drawn.
+ROWS = [
+    (1, 'Cowboy Bebop', 26, 'Sunrise'),
+    (2, '進撃の巨人', 25, 'Wit'),
+    (3, 'Mushishi', 26, 'Artland'),
+    ]
+# The lines of the screen once the table has been opened, without their
+# trailing spaces.  A wide character takes two columns but one str.
+EXPECTED_LINES = [
+    '1   Cowboy Bebop 26  Sunrise',
+    '2   進撃の巨人   25  Wit',
+    '3   Mushishi     26  Artland',
+    '',
+    '',
+    'check.db.anime:id',
+    ]
+# The counts of backend.MemoryBackend.get_counts for opening the table,
+# and for moving the cursor down one row.
+EXPECTED_OPEN_COUNTS = {'writes': 37, 'refreshes': 6, 'updates': 2,
+                        'cells': 70, 'bytes': 177}
+# Only the current cell of the two rows, 'id' and its separator, is sent.
+EXPECTED_DOWN_COUNTS = {'writes': 7, 'refreshes': 2, 'updates': 1,
+                        'cells': 8, 'bytes': 28}
+
+
+def _create_database(db_name):
+    """Write the table 'anime' with ROWS to a new database."""
+    connection = sqlite3.connect(db_name)
+    connection.execute('create table anime (id integer primary key,'
+                       ' name text, eps integer, studio text)')
+    connection.executemany('insert into anime values (?, ?, ?, ?)', ROWS)
+    connection.commit()
+    connection.close()
+
+
+def _compare(name, actual, expected, errors):
+    """Add an error to 'errors' if a value is not the expected one."""
+    if actual != expected:
+        errors.append('{}:\n    expected {!r}\n    actual   {!r}'.format(
+                          name, expected, actual))
+
+
+def check():
+    """Draw the table and return what differs from what is expected.
+
+    The working directory is changed to a temporary directory while the
+    table is drawn, so that the command line history goes there.
+
+    Returns:
+        A list of the differences, as text.  It is empty if everything
+        is as expected.
+    """
+    errors = []
+    scr = backend.MemoryBackend(*SCREEN)
+    backend.BackendRegistry.set(scr)
+    prev_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='aniLog-check-')
+    ui.UIRegistry.create(settings.keys.KeyMap.get())
+    try:
+        os.chdir(work_dir)
+        _create_database('check.db')
+        ui.UIRegistry.get().create()
+        scr.clear_screen()
+        cmd_line_test.CommandLineRegistry.get().run('edit check.db anime')
+        run.wait_for_jobs()
+        counts = scr.get_counts()
+        lines = [line.rstrip() for line in scr.get_lines()]
+        for idx, (line, expected) in enumerate(zip(lines, EXPECTED_LINES)):
+            _compare('line {}'.format(idx), line, expected, errors)
+        _compare('number of lines', len(lines), len(EXPECTED_LINES), errors)
+        _compare('current cell', scr.get_attrs(0)[0], curses.A_REVERSE,
+                 errors)
+        _compare('counts of opening the table', counts,
+                 EXPECTED_OPEN_COUNTS, errors)
+        scr.reset_counts()
+        commands.Scroll(enums.Scroll.DOWN, '', '').execute()
+        render.RenderScheduler.flush()
+        _compare('counts of moving down', scr.get_counts(),
+                 EXPECTED_DOWN_COUNTS, errors)
+        _compare('current cell after moving down', scr.get_attrs(1)[0],
+                 curses.A_REVERSE, errors)
+    finally:
+        ui.UIRegistry.destroy()
+        browser.BrowserRegistry.get_buffer().clear()
+        os.chdir(prev_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return errors
+
+
+def main():
+    errors = check()
+    for error in errors:
+        print(error)
+    if errors:
+        sys.exit(1)
+    print('The screen is as expected.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare the results of two benchmark runs.
+
+For every benchmark and table size in both files, the median times are
+shown with their ratio.  A ratio below 1 means that the new run is
+faster.
+
+Usage:
+    $ python -m benchmarks.compare old.json new.json
+
+Functions:
+    compare: Return the rows of the comparison.
+"""
+import argparse
+import json
+
+
+def compare(old, new):
+    """Return the rows of the comparison of two runs.
+
+    Args:
+        old (dict): The report of the first run, as written by
+            benchmarks.run.
+        new (dict): The report of the second run.
+
+    Returns:
+        A list of tuples (benchmark name, rows, old median, new median,
+        new median / old median), for the benchmarks and sizes that are
+        in both runs.
+    """
+    rows = []
+    for name, old_by_rows in old['results'].items():
+        new_by_rows = new['results'].get(name, {})
+        for size, old_timing in old_by_rows.items():
+            if size not in new_by_rows:
+                continue
+            old_median = old_timing['median']
+            new_median = new_by_rows[size]['median']
+            ratio = new_median / old_median if old_median else float('inf')
+            rows.append((name, size, old_median, new_median, ratio))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Compare the results of two benchmark runs.')
+    parser.add_argument('old', help='the JSON file of the first run')
+    parser.add_argument('new', help='the JSON file of the second run')
+    args = parser.parse_args()
+    with open(args.old) as old_file, open(args.new) as new_file:
+        old = json.load(old_file)
+        new = json.load(new_file)
+    print('{:<10} {:>8}  {:>10}  {:>10}  {:>6}'.format(
+              'benchmark', 'rows', old.get('label') or 'old',
+              new.get('label') or 'new', 'ratio'))
+    for name, size, old_median, new_median, ratio in compare(old, new):
+        print('{:<10} {:>8}  {:>9.4f}s  {:>9.4f}s  {:>6.2f}'.format(
+                  name, size, old_median, new_median, ratio))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Make databases with the aniData schema.
+
+The rows look like those of a real catalog: most values of the studio,
+the genres, the air date and the episode counts repeat, a few names are
+in Japanese, and most notes are empty while a few are long.  The same
+seed always gives the same rows.
+
+Usage:
+    $ python -m benchmarks.generate path rows [table ...]
+
+Functions:
+    generate: Make a database.
+"""
+import argparse
+import random
+import sqlite3
+
+SCHEMA = ('create table "{table}" (id integer primary key, name text,'
+          ' eps_watched integer, total_eps integer, date_aired text,'
+          ' studio text, score integer, genres text, notes text)')
+_STUDIOS = ['Madhouse', 'Bones', 'Sunrise', 'Production I.G',
+            'Kyoto Animation', 'MAPPA', 'Wit Studio', 'Toei Animation',
+            'Shaft', 'A-1 Pictures', 'J.C.Staff', 'Trigger',
+            'David Production', 'Ufotable', 'P.A.Works']
+_GENRES = ['Action', 'Adventure', 'Comedy', 'Drama', 'Fantasy', 'Horror',
+           'Mecha', 'Mystery', 'Romance', 'Sci-Fi', 'Slice of Life', 'Sports']
+_WORDS = ['Blue', 'Sky', 'Steel', 'Heart', 'Night', 'Ghost', 'Dream', 'Star',
+          'Academy', 'Chronicle', 'Legend', 'Spring', 'Shadow', 'Wings']
+_JAPANESE = ['進撃の巨人', '鋼の錬金術師', '涼宮ハルヒの憂鬱', '四月は君の嘘',
+             'ソードアート・オンライン', '魔法少女まどか☆マギカ']
+_BATCH_SIZE = 10000
+
+
+def _make_row(rand, idx):
+    """Return the values of one row, without its id."""
+    if rand.random() < 0.1:
+        name = '{} {}'.format(rand.choice(_JAPANESE), idx)
+    else:
+        name = '{} {} {}'.format(rand.choice(_WORDS), rand.choice(_WORDS),
+                                 idx)
+    total_eps = rand.choice([12, 13, 24, 25, 26, 50, None])
+    eps_watched = rand.randint(0, total_eps or 12)
+    date_aired = None
+    if rand.random() < 0.7:
+        date_aired = '{:04}-{:02}-01'.format(rand.randint(1990, 2024),
+                                             rand.randint(1, 12))
+    studio = rand.choice(_STUDIOS) if rand.random() < 0.8 else None
+    score = rand.randint(1, 10) if rand.random() < 0.5 else None
+    genres = ', '.join(sorted(rand.sample(_GENRES, rand.randint(1, 3))))
+    notes = ''
+    chance = rand.random()
+    if chance < 0.01:
+        notes = ' '.join(rand.choice(_WORDS) for word in range(2000))
+    elif chance < 0.2:
+        notes = ' '.join(rand.choice(_WORDS) for word in range(10))
+    return (name, eps_watched, total_eps, date_aired, studio, score, genres,
+            notes)
+
+
+def generate(path, rows, tables=('anime',), seed=0):
+    """Make a database with the aniData schema.
+
+    Args:
+        path (str): The file to write.  It must not exist yet.
+        rows (int): The number of rows in each table.
+        tables ([str]): The names of the tables.
+        seed (int): The seed of the random values.
+
+    Raises;
+        sqlite3.OperationalError: If a table already exists.
+    """
+    rand = random.Random(seed)
+    connection = sqlite3.connect(path)
+    try:
+        # The file is thrown away if this fails, so it does not need to
+        # survive a crash.
+        connection.execute('pragma journal_mode = off')
+        connection.execute('pragma synchronous = off')
+        for table in tables:
+            connection.execute(SCHEMA.format(table=table))
+            statement = 'insert into "{table}" values (null{params})'.format(
+                    table=table, params=', ?' * 8)
+            for beg in range(0, rows, _BATCH_SIZE):
+                end = min(beg + _BATCH_SIZE, rows)
+                connection.executemany(statement,
+                        (_make_row(rand, idx) for idx in range(beg, end)))
+            connection.commit()
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Make a database with the aniData schema.')
+    parser.add_argument('path', help='the database file to write')
+    parser.add_argument('rows', type=int, help='the number of rows per table')
+    parser.add_argument('tables', nargs='*', default=['anime'],
+                        help='the names of the tables (default: anime)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of the random values')
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.tables, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Replay recorded keys headless and report the latency of each.
+
+Keys are recorded by starting aniLog with --record-keys FILE.  The
+replay runs aniLog on a screen in memory of the recorded size, in a
+temporary directory that holds copies of the given files, so the
+databases that were used are not changed.  Each recorded group of keys
+is given to aniLog as soon as it waits for a key, and its latency is the
+time until aniLog waits for the next key with every background job
+finished and the screen updated.  The time that the user took between
+keys is not replayed.
+
+The latencies are grouped by the type of the keys, such as 'Scroll' or
+':filter', and the 50th, 95th and 99th percentiles of each type are
+reported.
+
+Usage (from the directory that contains aniLog.py):
+    $ python -m benchmarks.replay keys.log --files Big.db [-o FILE]
+
+Functions:
+    replay: Replay recorded keys and return their latencies.
+    summarize: Return the percentiles of the latencies of each type.
+"""
+import argparse
+import collections
+import curses
+import datetime
+import json
+import math
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import backend
+import ui
+import settings.keys
+from benchmarks import run
+
+
+def _read_log(path):
+    """Return the screen size and the key groups of a recording.
+
+    Returns:
+        A tuple (lines, cols, entries), where entries is a list of dicts
+        as described in keylog.
+    """
+    with open(path) as log:
+        header = json.loads(log.readline())
+        entries = [json.loads(line) for line in log if line.strip()]
+    return header['lines'], header['cols'], entries
+
+
+def _percentile(latencies, percent):
+    """Return a percentile of sorted latencies, by the nearest rank."""
+    rank = math.ceil(percent / 100 * len(latencies))
+    return latencies[max(rank, 1) - 1]
+
+
+def replay(path, files=()):
+    """Replay recorded keys and return their latencies.
+
+    Args:
+        path (str): The recording.
+        files ([str]): The files to copy to the directory that the keys
+            are replayed in, such as the databases and sessions that were
+            opened while recording.  They are copied by their base names.
+
+    Returns:
+        A dict from key types to lists of latencies in seconds, in the
+        order that the keys were replayed.
+
+    Raises;
+        OSError: If the recording or a file cannot be read.
+    """
+    lines, cols, entries = _read_log(os.path.abspath(path))
+    files = [os.path.abspath(name) for name in files]
+    latencies = collections.defaultdict(list)
+    entry_iter = iter(entries)
+    scr = backend.MemoryBackend(lines, cols)
+    # The key group that is being handled and when it was given.
+    pending = [None, 0]
+
+    def next_keys():
+        run.wait_for_jobs()
+        if pending[0] is not None:
+            latencies[pending[0]].append(time.perf_counter() - pending[1])
+            pending[0] = None
+        entry = next(entry_iter, None)
+        if entry is None:
+            return None
+        keys = entry['keys']
+        if 'lines' in entry:
+            # resize_screen adds the resize key.
+            scr.resize_screen(entry['lines'], entry['cols'])
+            keys = [key for key in keys if key != curses.KEY_RESIZE]
+        pending[0] = entry['type']
+        pending[1] = time.perf_counter()
+        return keys
+
+    prev_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='aniLog-replay-')
+    backend.BackendRegistry.set(scr)
+    scr.set_key_source(next_keys)
+    ui.UIRegistry.create(settings.keys.KeyMap.get())
+    try:
+        for name in files:
+            shutil.copy(name, work_dir)
+        os.chdir(work_dir)
+        ui.UIRegistry.get().create()
+        try:
+            ui.UIRegistry.get().get_key()
+        except backend.NoInputError:
+            pass
+        # The last key, such as q, is not followed by a wait for a key.
+        next_keys()
+    finally:
+        ui.UIRegistry.destroy()
+        os.chdir(prev_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return dict(latencies)
+
+
+def summarize(latencies):
+    """Return the percentiles of the latencies of each type.
+
+    Args:
+        latencies: A dict from key types to lists of seconds, as
+            returned by replay.
+
+    Returns:
+        A dict from key types to dicts with the keys 'count', 'p50',
+        'p95' and 'p99'.
+    """
+    summary = {}
+    for kind, times in latencies.items():
+        times = sorted(times)
+        summary[kind] = {
+            'count': len(times),
+            'p50': _percentile(times, 50),
+            'p95': _percentile(times, 95),
+            'p99': _percentile(times, 99),
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Replay recorded keys headless and report the '
+                        'latency of each.')
+    parser.add_argument('log', help='the file written by aniLog.py '
+                                    '--record-keys')
+    parser.add_argument('--files', nargs='+', default=[],
+                        help='the databases and sessions to replay with; '
+                             'copies are used')
+    parser.add_argument('--label', default='',
+                        help='a name for this run, such as a commit')
+    parser.add_argument('-o', '--output',
+                        help='a JSON file to write the latencies to')
+    args = parser.parse_args()
+    latencies = replay(args.log, args.files)
+    summary = summarize(latencies)
+    if args.output:
+        report = {
+            'label': args.label,
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'log': args.log,
+            'latency': summary,
+            'times': latencies,
+            }
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+            output.write('\n')
+        print('Wrote {}.'.format(args.output), file=sys.stderr)
+    print('{:<16} {:>6}  {:>9}  {:>9}  {:>9}'.format(
+              'type', 'count', 'p50', 'p95', 'p99'))
+    for kind, stats in sorted(summary.items()):
+        print('{:<16} {:>6}  {:>7.2f}ms  {:>7.2f}ms  {:>7.2f}ms'.format(
+                  kind, stats['count'], stats['p50'] * 1000,
+                  stats['p95'] * 1000, stats['p99'] * 1000))
+
+
+if __name__ == '__main__':
+    main()
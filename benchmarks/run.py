@@ -0,0 +1,344 @@
+"""Time aniLog's commands and write the results as JSON.
+
+Each benchmark opens a table of a generated database, gets it ready
+without timing that, and then times one thing that a user does, such as
+filtering or pasting, until its result is on the screen.  Background
+jobs are waited for.  Benchmarks that change the database work on a
+copy of it, so every repetition starts from the same rows.
+
+The benchmarks draw on the terminal, which shows what is being timed.
+With --headless, they draw on a screen in memory instead, so that they
+can run without a terminal, and the writes, refreshes and bytes that a
+terminal would have been sent are counted as well.
+
+Usage:
+    $ python -m benchmarks.run [--rows N ...] [--repeat N] [--headless]
+                               [-o FILE]
+
+Functions:
+    wait_for_jobs: Wait until every background job has been shown.
+    run: Run the benchmarks and return their results.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import backend
+import browser
+import cmd_line_test
+import commands
+import enums
+import render
+import shared
+import ui
+import workers
+import settings.keys
+from benchmarks import generate
+
+# Number of pages that the scroll benchmark scrolls down.
+SCROLL_PAGES = 50
+# Number of rows that are pasted, deleted or incremented.
+CHANGED_ROWS = 1000
+# Number of tables that 'edit db *' and 'ldsession' open.  The rows of a
+# benchmark are split among them.
+SESSION_TABLES = 4
+# Text that the filter benchmark searches for in the names.
+FILTER_TEXT = 'Star'
+# Lines and columns of the screen of headless runs.
+HEADLESS_SCREEN = (24, 80)
+
+
+def wait_for_jobs():
+    """Wait until every background job has finished and been shown."""
+    pool = workers.WorkerPoolRegistry.get()
+    while pool.is_busy():
+        pool.poll()
+        time.sleep(0.001)
+    render.RenderScheduler.flush()
+
+
+def _reset():
+    """Close every Table and database connection."""
+    wait_for_jobs()
+    browser.BrowserRegistry.destroy_all()
+    browser.BrowserRegistry.get_buffer().clear()
+    shared.SelectBuffer.get().clear()
+    shared.DBRegistry.destroy_all()
+
+
+def _run_command(input_str):
+    """Run a command as if it had been typed in the command line."""
+    cmd_line_test.CommandLineRegistry.get().run(input_str)
+
+
+def _open(db_name, table='anime'):
+    """Open a table and wait until its rows are shown."""
+    _run_command('edit {db} {table}'.format(db=db_name, table=table))
+    wait_for_jobs()
+    return browser.BrowserRegistry.get_buffer().get()
+
+
+def _go_to_column(table, col_name):
+    """Make a column of a Table the current column."""
+    table.scroll(enums.Scroll.H_HOME)
+    while table.get_cur_col_name() != col_name:
+        table.scroll(enums.Scroll.RIGHT)
+
+
+def _select_first_rows(count):
+    """Select the rows whose primary keys are 1 to 'count'."""
+    selections = shared.SelectBuffer.get()
+    selections.clear()
+    selections.update(str(pk) for pk in range(1, count + 1))
+
+
+def _time(operation):
+    """Return the seconds that a function takes to show its result.
+
+    On a screen in memory, only what the function draws is counted.
+    """
+    scr = backend.BackendRegistry.get()
+    if isinstance(scr, backend.MemoryBackend):
+        scr.reset_counts()
+    start = time.perf_counter()
+    operation()
+    wait_for_jobs()
+    return time.perf_counter() - start
+
+
+def bench_create(files):
+    """Open a table and read all of its rows."""
+    return _time(lambda: _open(files['single']))
+
+
+def bench_scroll(files):
+    """Scroll down page by page."""
+    _open(files['single'])
+    page_down = commands.Scroll(enums.Scroll.PAGE_DOWN, '', '')
+    def operation():
+        for page in range(SCROLL_PAGES):
+            page_down.execute()
+            render.RenderScheduler.flush()
+    return _time(operation)
+
+
+def bench_filter(files):
+    """Show the rows whose names contain a word."""
+    table = _open(files['single'])
+    _go_to_column(table, 'name')
+    return _time(lambda: _run_command('filter ' + FILTER_TEXT))
+
+
+def bench_sort(files):
+    """Sort the rows by their air dates."""
+    table = _open(files['single'])
+    _go_to_column(table, 'date_aired')
+    return _time(lambda: _run_command('sort desc'))
+
+
+def bench_paste(files):
+    """Paste copied rows at the end of the table."""
+    _open(files['copy'])
+    _select_first_rows(CHANGED_ROWS)
+    commands.Copy('', '').execute()
+    return _time(settings.keys.CommandMap.get()['paste'].execute)
+
+
+def bench_delete(files):
+    """Delete the selected rows."""
+    _open(files['copy'])
+    _select_first_rows(CHANGED_ROWS)
+    # Answer the confirmation prompt.
+    backend.BackendRegistry.get().ungetch('y')
+    return _time(lambda: _run_command('del_entry'))
+
+
+def bench_increment(files):
+    """Increment the episodes watched of the selected rows."""
+    table = _open(files['copy'])
+    _go_to_column(table, 'eps_watched')
+    _select_first_rows(CHANGED_ROWS)
+    return _time(settings.keys.CommandMap.get()['increment'].execute)
+
+
+def bench_edit_all(files):
+    """Open every table of a database with 'edit db *'."""
+    return _time(lambda: _run_command('edit {} *'.format(files['multi'])))
+
+
+def bench_ldsession(files):
+    """Load a session of several tables."""
+    _run_command('edit {} *'.format(files['multi']))
+    wait_for_jobs()
+    _run_command('mksession bench.session')
+    _reset()
+    return _time(lambda: _run_command('ldsession bench.session'))
+
+
+# The benchmarks, in the order that they are run.
+BENCHMARKS = {
+    'create': bench_create,
+    'scroll': bench_scroll,
+    'filter': bench_filter,
+    'sort': bench_sort,
+    'paste': bench_paste,
+    'delete': bench_delete,
+    'increment': bench_increment,
+    'edit_all': bench_edit_all,
+    'ldsession': bench_ldsession,
+    }
+
+
+def _get_databases(data_dir, rows):
+    """Generate the databases of a size unless they already exist.
+
+    Returns:
+        A tuple (single, multi).  single has one table named anime with
+        'rows' rows, and multi has SESSION_TABLES tables that have
+        'rows' rows in total.
+    """
+    single = os.path.join(data_dir, 'aniData-{}.db'.format(rows))
+    multi = os.path.join(data_dir, 'aniData-{}-multi.db'.format(rows))
+    if not os.path.exists(single):
+        generate.generate(single + '.tmp', rows)
+        os.replace(single + '.tmp', single)
+    if not os.path.exists(multi):
+        tables = ['anime{}'.format(idx) for idx in range(SESSION_TABLES)]
+        generate.generate(multi + '.tmp', rows // SESSION_TABLES, tables)
+        os.replace(multi + '.tmp', multi)
+    return single, multi
+
+
+def run(sizes, repeat, data_dir, names=None, headless=False):
+    """Run the benchmarks and return their results.
+
+    Curses is started and ended by this function, unless the benchmarks
+    run headless.  The working directory
+    is changed to a temporary directory while the benchmarks run, so
+    that the command line history and sessions go there.
+
+    Args:
+        sizes ([int]): The numbers of rows to run the benchmarks with.
+        repeat (int): The number of times to run each benchmark.
+        data_dir (str): The directory that holds the generated databases.
+        names ([str]): The names of the benchmarks to run, or None to run
+            all of them.
+        headless (bool): If True, then draw on a backend.MemoryBackend
+            instead of the terminal.
+
+    Returns:
+        A dict from benchmark names to dicts from numbers of rows (as
+        strs) to dicts with the keys 'times', 'min' and 'median'.  If
+        headless is True, then these also have the key 'screen', a list
+        with the counts of backend.MemoryBackend.get_counts for each
+        repetition.
+    """
+    names = names or list(BENCHMARKS)
+    databases = {rows: _get_databases(data_dir, rows) for rows in sizes}
+    results = {name: {} for name in names}
+    if headless:
+        backend.BackendRegistry.set(backend.MemoryBackend(*HEADLESS_SCREEN))
+    scr = backend.BackendRegistry.get()
+    prev_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='aniLog-bench-')
+    ui.UIRegistry.create(settings.keys.KeyMap.get())
+    try:
+        os.chdir(work_dir)
+        ui.UIRegistry.get().create()
+        for rows, (single, multi) in databases.items():
+            for name in names:
+                times = []
+                counts = []
+                for rep in range(repeat):
+                    copy = 'copy-{}-{}.db'.format(rows, rep)
+                    shutil.copyfile(single, copy)
+                    files = {'single': single, 'multi': multi, 'copy': copy}
+                    if headless:
+                        # Start from a blank screen, so that every
+                        # repetition draws the same.
+                        scr.clear_screen()
+                    try:
+                        times.append(BENCHMARKS[name](files))
+                        if headless:
+                            counts.append(scr.get_counts())
+                    finally:
+                        _reset()
+                        os.remove(copy)
+                results[name][str(rows)] = {
+                        'times': times,
+                        'min': min(times),
+                        'median': statistics.median(times),
+                        }
+                if headless:
+                    results[name][str(rows)]['screen'] = counts
+    finally:
+        ui.UIRegistry.destroy()
+        os.chdir(prev_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Time aniLog's commands and write the results as "
+                        'JSON.')
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 100000, 1000000],
+                        help='the table sizes (default: 1000 100000 1000000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='the number of runs of each benchmark')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        help='the benchmarks to run (default: all)')
+    parser.add_argument('--data-dir',
+                        help='where to keep the generated databases, so that '
+                             'they are reused (default: a temporary '
+                             'directory)')
+    parser.add_argument('--headless', action='store_true',
+                        help='draw on a screen in memory instead of the '
+                             'terminal, and count what is drawn')
+    parser.add_argument('--label', default='',
+                        help='a name for this run, such as a commit')
+    parser.add_argument('-o', '--output', default='bench_output.json',
+                        help='the JSON file to write')
+    args = parser.parse_args()
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='aniLog-data-')
+    os.makedirs(data_dir, exist_ok=True)
+    data_dir = os.path.abspath(data_dir)
+    try:
+        results = run(args.rows, args.repeat, data_dir, args.only,
+                      args.headless)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    report = {
+        'label': args.label,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'headless': args.headless,
+        'results': results,
+        }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+        output.write('\n')
+    for name, by_rows in results.items():
+        for rows, timing in by_rows.items():
+            line = '{:<10} {:>8} rows  median {:9.4f}s  min {:9.4f}s'.format(
+                       name, rows, timing['median'], timing['min'])
+            if 'screen' in timing:
+                line += '  {:>9} bytes'.format(timing['screen'][-1]['bytes'])
+            print(line)
+    print('Wrote {}.'.format(args.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,26 @@
 import math
 import curses
 import bisect
+import collections
+import functools
+import sys
+import sqlite3
+import unicodedata
+import db
 import enums
 import shared
+import settings.performance as performance
 import settings.positions as positions
 import settings.keys
 import signals
+import layout
+import render
+import rowstore
+import stats
+import workers
+import warmcache
+import backend
+import keylog
 
 
 class _Coordinates:
@@ -29,6 +44,56 @@ class _Coordinates:
         self.sep = sep
 
 
+def _fit(text, width):
+    """Cut or pad a string so that it fills exactly 'width' screen columns.
+
+    East Asian wide and fullwidth characters take two screen columns, and
+    combining marks take none.  Characters that are not printable, such
+    as newlines, are shown as spaces so that they cannot move the cursor.
+
+    Args:
+        text (str): The string to fit.
+        width (int): The number of screen columns to fill.
+
+    Returns:
+        The fitted string.
+    """
+    if text.isascii() and text.isprintable():
+        return text[:width].ljust(width)
+    return _fit_unicode(text, width)
+
+
+@functools.lru_cache(maxsize=performance.FIT_CACHE_SIZE)
+def _fit_unicode(text, width):
+    """Same as _fit, for strings that are not printable ASCII.
+
+    Measuring these one character at a time is slow, so the results are
+    memoized.  Titles in particular repeat across sorts, filters and
+    Tables.
+    """
+    chars = []
+    cols = 0
+    for char in text:
+        if unicodedata.combining(char):
+            # A mark belongs to the character before it.  Drop it if that
+            # character did not fit.
+            if chars:
+                chars.append(char)
+            continue
+        if not char.isprintable():
+            char = ' '
+        char_width = 2 if unicodedata.east_asian_width(char) in ('W', 'F')\
+                else 1
+        if cols + char_width > width:
+            break
+        chars.append(char)
+        cols = cols + char_width
+    return ''.join(chars) + ' ' * (width - cols)
+
+
+stats.Stats.watch_cache('fitted values', _fit_unicode.cache_info)
+
+
 # TODO: 
 
 # Rename scroll to _on_scroll after removing calls that use it and creating
@@ -55,10 +120,9 @@ class Browser(signals.Observer):
              the number of rows that are visible.  _VIS_RNG[1] is the number
              of columns that are visible.  The range changes whenever the
              screen is resized.
-        _END_ROW: The maximum rows that the pad can hold.  This changes when
-            there are more queried rows to show than there are rows in the
-            pad.  This might also change when the screen is resized so that
-            it has more rows than there are in the pad.
+        _END_ROW: The maximum rows that the pad can hold.  This is one more
+            than the number of visible rows, and changes when the screen is
+            resized.
         _BEG_ROW: The first row of the pad.  This is always zero and never
             changes. 
         _END_COL: The maximum columns (chars) that the pad can hold. This
@@ -95,11 +159,70 @@ class Browser(signals.Observer):
             is scrolled vertically.
         _cur_col: The currently selected column.  This changes whenever the
             table is scrolled horizontally.
+        _col_widths ([ints]): The k'th element is the width of the k'th table
+            column, as computed by layout.LayoutCache.  This changes whenever
+            the widths are computed again, such as after the schema changes.
         _col_coords ([_Coordinates]): The k'th element is the coordinates of the
             k'th table column.  This changes whenever the table columns are
             resized.
-        _pad: The pad that displays everything.  This changes whenever new
-            rows need to be displayed (scroll, queries, etc.).
+        _pinned_cols (int): The number of leading columns that are always
+            visible.  This changes whenever the columns or the screen are
+            resized.
+        _first_vis_col (int): The index of the first column after the pinned
+            columns that is visible.  This changes whenever the table is
+            scrolled horizontally.
+        _last_vis_col (int): The index of the last column that is visible,
+            even if only in part.  This changes with _vis_cols.
+        _layout_stale (bool): Whether the screen was resized while the
+            Table was hidden.  The Table is laid out for the new size when
+            it is next shown.
+        _vis_cols ([tuples]): The visible columns, as tuples (column index,
+            screen column, width).  The pinned columns are followed by the
+            columns from _first_vis_col on, and the width of the last one is
+            cut at the edge of the screen.  Only these columns are drawn.
+            This changes whenever the table is scrolled horizontally, or
+            the columns or the screen are resized.
+        _pad: The pad that displays the visible rows.  It is borrowed from
+            render.PadPool while the Table is shown, and is None while it
+            is hidden.  It is drawn again from _rows whenever other rows
+            are scrolled to.
+        _query (db.Query): The query whose rows are displayed.  This
+            changes whenever the rows are sorted or filtered.
+        _result_cols (str): The result columns that rows are selected with.
+            Text is cut to the width of its column, so that long values
+            are never read in full just to be displayed.  This changes
+            whenever the column widths change.
+        _rows (rowstore.RowStore): The displayed rows, in the order that
+            they are displayed, with their values cut to the widths of
+            their columns.  Lines are drawn from these.  A row is changed
+            whenever it is updated or deleted, and the rows are dropped
+            whenever they are read again or the Table is unloaded.
+        _lines (OrderedDict): A map from the indexes of rows to the lines
+            that display their visible columns, of at most
+            LINE_CACHE_ROWS rows that were drawn last.  A row's line is
+            removed whenever the row is updated, and the map is cleared
+            whenever the rows are read again, deleted or unloaded, and
+            whenever the visible columns change.
+        _prefetched ([tuples]): The first rows of the query, read in the
+            background before the Table is shown, or None.  They are used
+            and dropped by create, and dropped whenever the Table is
+            invalidated.
+        _prefetched_stamp (str): The warmcache stamp of the database from
+            before _prefetched was read, or None.
+        _rows_stamp (str): The warmcache stamp of the database from before
+            the displayed rows were read, or None if it is not known.  It
+            is saved with the rows in warm cache snapshots, so that rows
+            changed by another process before then are read again.  It is
+            dropped whenever the Table is invalidated or unloaded.
+        _unverified (bool): Whether _prefetched holds the rows of a warm
+            cache snapshot of a database that has changed since.  They are
+            shown, and then read again in the background.
+        _revalidation (workers.Job): The Job that reads the rows of an
+            unverified snapshot again, or None.  Its rows are dropped if
+            the Table is invalidated before they arrive.
+        _cursor_pk: The primary key of the row that the cursor of a
+            restored session was on, or None.  The cursor is moved to it
+            once the rows have been read.
     """
     def __init__(self, db_name, table):
         """Initialize a table.
@@ -113,8 +236,6 @@ class Browser(signals.Observer):
             ValueError: If the given table does not exist in the
                 database.
         """
-        # This will raise an AssertionError if len(col_widths) != len(cols)
-        col_widths = positions.COL_WIDTHS
         try:
             self._DB = shared.DBRegistry.get_db(db_name)
         except KeyError:
@@ -129,7 +250,10 @@ class Browser(signals.Observer):
                 db=db_name, table=table))
         self.PRIMARY_KEY = 'rowid'
         self._COL_NAMES = self._DB.get_col_names(table)
+        self._query = db.Query(table)
         self._primary_keys = []
+        self._rows = rowstore.RowStore()
+        self._lines = collections.OrderedDict()
         self._DB_NAME = db_name
         self._TABLE_NAME = table
         self._VIS_RNG = [positions.BROWSER_BOTTOM_RIGHT_COORDS[0] -
@@ -139,23 +263,36 @@ class Browser(signals.Observer):
         self._row_count = 0
         self._SCR_COORDS = [positions.BROWSER_UPPER_LEFT_COORDS,
                             positions.BROWSER_BOTTOM_RIGHT_COORDS]
-        self._row_capacity = 1
+        self._row_capacity = 0
         self._BEG_ROW = 0
         self._first_vis_row = 0
         self._last_vis_row = self._VIS_RNG[0]
 
-        self._col_capacity = int(sum(col_widths) + 2*len(col_widths))
+        self._col_capacity = 0
         self._BEG_COL = 0
+        self._pinned_cols = 0
         self._first_vis_col = 0
-        self._last_vis_col = self._VIS_RNG[1]
+        self._last_vis_col = 0
+        self._vis_cols = []
 
         self._cur_row = 0
         self._cur_col = 0 # zero based
+        self._col_widths = []
         self._col_coords = []
-        self._set_col_coords(col_widths)
+        self._result_cols = '*'
 
         self._pad = None
         self._select_buffer = set()
+        self._stale = False
+        self._loaded = False
+        self._evicted = False
+        self._prefetched = None
+        self._prefetched_stamp = None
+        self._rows_stamp = None
+        self._unverified = False
+        self._revalidation = None
+        self._cursor_pk = None
+        self._layout_stale = False
 
         cmd_map = settings.keys.CommandMap.get()
         cmd_map['update'].register(self)
@@ -181,12 +318,7 @@ class Browser(signals.Observer):
                 length must be the same as the number of columns in the
                 table. The numbers must be nonnegative integers. If a
                 width is zero, then that column is not displayed.
-
-        Raises:
-            AssertionError: if the size of col_width is not equal to
-                the number of table columns.
         """
-        assert(len(col_widths) == len(self._COL_NAMES))
         self._col_coords.clear()
         self._col_coords.append(_Coordinates(0, col_widths[0]-1, col_widths[0]))
 
@@ -201,13 +333,13 @@ class Browser(signals.Observer):
             sep = prev_sep + width + 1 if width > 0 else prev_sep
             self._col_coords.append(_Coordinates(beg, end, sep))
 
-    # TODO: save the query so that the same entries will be shown after a
-    # resize.
     def create(self, rows=None):
         """Display rows.
 
-        Display the given rows.  If no rows are given, then all rows
-        from the database table are displayed.
+        Display the given rows.  If no rows are given, then the rows of
+        the Table's query are displayed.  These are read one page at a
+        time, and if the Table is visible, each page is shown as soon as
+        it has been read.
 
         Args:
             rows ([tuples]): The rows to display.  Each tuple
@@ -215,35 +347,216 @@ class Browser(signals.Observer):
                 represent the columns in the row.  The length of the
                 tuples must be the same as the number of columns in
                 the database table.
+
+        Raises:
+            db.QueryCancelledError: If reading the rows was cancelled.
+                The rows that were read before then are displayed.
         """
-        if not rows:
-            rows = self._DB.select_all_from(self._TABLE_NAME)
+        # A Table that was unloaded keeps its cursor when it is reloaded.
+        cur_row = self._cur_row if self._evicted else 0
+        self._evicted = False
+        self._stale = False
+        self._loaded = True
+        self._update_layout()
         # Clear and reset everything to an empty state.
-        self._setup_curses()
-        self._pad.clear()
         self._row_count = 0
         self._cur_row = 0
         self._primary_keys.clear()
-        self._populate_browser(rows)
+        self._rows.clear()
+        self._lines.clear()
+        self._rows_stamp = None
+        if rows:
+            self._populate_browser(rows)
+            self._draw_rows()
+            return
+        is_visible = BrowserRegistry.get_buffer().get() is self
+        if is_visible:
+            self.show()
+        try:
+            offset = 0
+            prefetched, self._prefetched = self._prefetched, None
+            unverified, self._unverified = self._unverified, False
+            self._revalidation = None
+            # The stamp is read before the rows, so that a change made
+            # while they are read makes the stamp out of date, and not the
+            # rows.  The rest of the rows are newer than the prefetched
+            # ones, so the prefetched rows' stamp is kept.
+            self._rows_stamp = warmcache.get_stamp(self._DB_NAME)\
+                    if prefetched is None else self._prefetched_stamp
+            self._prefetched_stamp = None
+            if prefetched is not None:
+                # Show the rows that were read in the background right
+                # away, and read only the rest.
+                self._populate_browser(prefetched)
+                if cur_row < self._row_count:
+                    self._cur_row = cur_row
+                self._show_page(is_visible)
+                if unverified:
+                    # The rows are a snapshot's, and may be out of date.
+                    # They stay shown until they have been read again.
+                    self._rows_stamp = None
+                    self._revalidate()
+                    return
+                if len(prefetched) < performance.PREFETCH_ROWS:
+                    return
+                offset = len(prefetched)
+            statement = self._query.to_sql(columns=self._result_cols,
+                                           offset=offset)
+            pages = self._DB.iter_pages(statement,
+                                        performance.QUERY_PAGE_SIZE)
+            for page in pages:
+                self._populate_browser(page)
+                self._show_page(is_visible)
+        finally:
+            self._cur_row = min(cur_row, max(self._row_count - 1, 0))
+            if self._revalidation is None:
+                # Every row that is going to be read has been.
+                self._move_to_cursor_pk()
+            self._draw_rows()
+
+    def _show_page(self, is_visible):
+        """Show the rows that have been read so far, if the Table is visible.
+
+        Only the rows on the screen are drawn, so this takes the same time
+        for every page.
+        """
+        if not is_visible:
+            return
+        self._draw_rows()
+        self.redraw()
+        render.RenderScheduler.flush()
+
+    def _update_layout(self):
+        """Set the column widths from the table's statistics.
+
+        The columns are read again in case the table has been altered.
+        Prefetched rows are dropped if any width has changed, because
+        they were cut to the old widths.
+        """
+        self._COL_NAMES = self._DB.get_col_names(self._TABLE_NAME)
+        widths = layout.LayoutCache.get_widths(self._DB, self._DB_NAME,
+                                               self._TABLE_NAME,
+                                               self._COL_NAMES)
+        if widths == self._col_widths:
+            return
+        if self._col_widths:
+            self._prefetched = None
+            self._prefetched_stamp = None
+        self._col_widths = widths
+        self._lines.clear()
+        self._set_col_coords(widths)
+        self._result_cols = self._get_result_cols()
+        if self._cur_col >= len(self._COL_NAMES):
+            self._cur_col = len(self._COL_NAMES) - 1
+        self._scroll_to_cur_col()
+        if self._pad is not None:
+            self._fit_pad()
+
+    def _get_result_cols(self):
+        """Return the result columns that rows are selected with.
+
+        The first column is the primary key and is selected as it is.
+        Text and blobs in the other columns are cut by sqlite to the
+        width of their column.  Numbers are selected as they are, so
+        that they are displayed the same way as before.
+        """
+        cols = ['"{}"'.format(self._COL_NAMES[0])]
+        for col_name, width in zip(self._COL_NAMES[1:], self._col_widths[1:]):
+            cols.append('case when typeof("{col}") in (\'text\', \'blob\')'
+                        ' then substr("{col}", 1, {width})'
+                        ' else "{col}" end'.format(col=col_name, width=width))
+        return ', '.join(cols)
+
+    def show(self):
+        """Borrow a pad and draw the visible rows on it.
+
+        The pad only holds the rows that fit on the screen, and is drawn
+        again from the rows whenever other rows are scrolled to.  Call
+        hide to give it back when another Table is shown.  If the
+        screen was resized while the Table was hidden, then the Table
+        is laid out for the new size first.
+        """
+        if self._layout_stale:
+            self._fit_screen()
+        if not self._col_coords:
+            return
+        self._fit_pad()
+        self._draw_rows()
+        self.redraw()
 
-    def _setup_curses(self):
-        """Initialize the pad and some settings."""
-        # If the pad has already been initialized, then nothing is done.
-        if self._pad != None:
+    def hide(self):
+        """Give the pad back to render.PadPool.
+
+        The rows are kept, and are drawn again the next time that the
+        Table is shown.  Nothing is done if the Table has no pad.
+        """
+        if self._pad is None:
+            return
+        self._pad.keypad(0)
+        render.PadPool.give_back(self._pad)
+        self._pad = None
+        self._row_capacity = 0
+        self._col_capacity = 0
+
+    def _fit_pad(self):
+        """Borrow a pad as big as the visible part of the table.
+
+        The pad is exchanged for one of the right size if the screen has
+        been resized.
+        """
+        rows = self._VIS_RNG[0] + 1
+        # The last column is never shown, so that writing the bottom right
+        # corner of the screen cannot fail.
+        cols = self._VIS_RNG[1] + 2
+        if (self._pad is not None) and (self._row_capacity == rows) and\
+                (self._col_capacity == cols):
             return
-        curses.initscr()
-        self._row_capacity = positions.BROWSER_BOTTOM_RIGHT_COORDS[0] * 2
-        self._col_capacity = positions.BROWSER_BOTTOM_RIGHT_COORDS[1] * 2
-        self._pad = curses.newpad(self._row_capacity, self._col_capacity)
+        self.hide()
+        self._pad = render.PadPool.borrow(rows, cols)
         self._pad.keypad(1)
         self._pad.leaveok(0)
+        self._row_capacity = rows
+        self._col_capacity = cols
+
+    def _draw_rows(self):
+        """Draw every visible row on the pad."""
+        if self._pad is None:
+            return
+        self._pad.erase()
+        last_row = min(self._first_vis_row + self._row_capacity,
+                       self._row_count)
+        for row_idx in range(self._first_vis_row, last_row):
+            self._draw_row(row_idx)
+
+    def _draw_row(self, row_idx):
+        """Draw a row on the pad if it is visible.
+
+        Selected rows are highlighted, and so is the current cell.
+
+        Args:
+            row_idx (int): The index of the row in the Table.
+        """
+        pad_row = row_idx - self._first_vis_row
+        if (self._pad is None) or (row_idx >= self._row_count) or\
+                not (0 <= pad_row < self._row_capacity):
+            return
+        stats.Stats.count('screen', 'rows drawn')
+        self._pad.addstr(pad_row, 0, self._get_line(row_idx))
+        self._pad.clrtoeol()
+        if str(self._primary_keys[row_idx]) in self._select_buffer:
+            self._pad.chgat(pad_row, 0, -1, curses.A_REVERSE)
+        if row_idx == self._cur_row:
+            for col_idx, beg, width in self._vis_cols:
+                if col_idx == self._cur_col:
+                    # Include the separator, unless it is off the screen.
+                    width = min(width + 1, self._VIS_RNG[1] + 1 - beg)
+                    self._pad.chgat(pad_row, beg, width, curses.A_REVERSE)
 
     def _populate_browser(self, rows):
-        """Write rows to the browser.
+        """Add rows to the end of the browser.
 
-        The rows are written to the browser starting at the first
-        empty line.  If there are not enough lines in the browser,
-        then it is resized.  Nothing is done if 'rows' is empty.
+        The rows are kept in the Table's RowStore, and are drawn once
+        they are scrolled to.  Nothing is done if 'rows' is empty.
 
         Args:
             rows ([tuples]): The rows to display.  Each tuple
@@ -254,73 +567,521 @@ class Browser(signals.Observer):
         """
         if not rows:
             return
-        if (self._row_count + len(rows)) > self._row_capacity:
-            self._resize(2 * (self._row_count + len(rows)))
         for row in rows:
             self._primary_keys.append(row[0])
+            self._rows.append(row)
+        self._row_count = self._row_count + len(rows)
+
+    def _get_line(self, row_idx):
+        """Return the line that displays the visible columns of a row.
+
+        Each visible column is fitted to its width and written at its
+        screen column, so that the whole row can be written to the pad
+        at once.  Columns that are scrolled out of view are skipped, so
+        this costs the same for wide tables as for narrow ones.  Numbers
+        that are longer than their column are shown as '#'s instead of
+        being cut.  The lines of the rows that were drawn last are
+        cached, so moving the cursor or paging back does not format
+        them again.
+
+        Args:
+            row_idx (int): The index of the row in the Table.
+        """
+        line = self._lines.get(row_idx)
+        if line is not None:
+            self._lines.move_to_end(row_idx)
+            stats.Stats.count('caches', 'line hits')
+            return line
+        stats.Stats.count('caches', 'line misses')
+        line = self._format_cols(self._rows[row_idx], self._vis_cols)
+        self._lines[row_idx] = line
+        if len(self._lines) > performance.LINE_CACHE_ROWS:
+            self._lines.popitem(last=False)
+        return line
+
+    def _format_cols(self, row, vis_cols, end=0):
+        """Return the text of some of the visible columns of a row.
+
+        Args:
+            row (tuple): The row.
+            vis_cols ([tuples]): The visible columns to format, from left
+                to right, as in _vis_cols.
+            end (int): The screen column that the text starts at.  The
+                text has spaces up to the first column.
+        """
+        parts = []
+        for col_idx, beg, width in vis_cols:
+            col_val = row[col_idx]
+            if col_val is None:
+                col_val = ''
+            text = str(col_val)
+            if isinstance(col_val, (int, float)) and\
+                    (len(text) > self._col_widths[col_idx]):
+                # The number has grown since the widths were computed.
+                # A cut number would be another number.
+                text = '#' * width
+            parts.append(' ' * (beg - end))
+            parts.append(_fit(text, width))
+            end = beg + width
+        return ''.join(parts)
+
+    def _scroll_to_cur_col(self, home=False):
+        """Scroll horizontally so that the current column is visible.
+
+        The columns scroll as little as possible.  Moving to a pinned
+        column does not scroll them.
+
+        Args:
+            home (bool): Whether to scroll back to the first column after
+                the pinned columns.
+
+        Returns:
+            True if the visible columns changed, or False otherwise.
+        """
+        prev_vis_cols = self._vis_cols
+        screen_width = self._VIS_RNG[1] + 1
+        coords = self._col_coords
+        pinned = min(positions.PINNED_COLUMNS, len(coords) - 1)
+        while (pinned > 0) and (coords[pinned - 1].sep > screen_width // 2):
+            pinned = pinned - 1
+        self._pinned_cols = max(pinned, 0)
+        if home or (self._first_vis_col < self._pinned_cols):
+            self._first_vis_col = self._pinned_cols
+        if self._cur_col >= self._pinned_cols:
+            if self._cur_col < self._first_vis_col:
+                self._first_vis_col = self._cur_col
+            # The offset of the scrolled columns from where they would be
+            # drawn if the table was not scrolled.
+            while self._first_vis_col < self._cur_col:
+                shift = coords[self._first_vis_col].beg -\
+                        coords[self._pinned_cols].beg
+                if coords[self._cur_col].end - shift < screen_width:
+                    break
+                self._first_vis_col = self._first_vis_col + 1
+        self._first_vis_col = min(self._first_vis_col, len(coords) - 1)
+        self._update_vis_cols()
+        return self._vis_cols != prev_vis_cols
+
+    def _shift_cols(self, prev_vis_cols):
+        """Draw the visible rows after a horizontal scroll.
+
+        The columns that were already on the screen are moved on the pad
+        to where they are now, and only the columns that came into view
+        are formatted and drawn.  The current cell is not highlighted
+        again.
+
+        Args:
+            prev_vis_cols ([tuples]): _vis_cols before the scroll.
+
+        Returns:
+            False if no column could be kept, in which case nothing is
+            drawn, or True otherwise.
+        """
+        if self._pad is None:
+            return True
+        pinned = [col for col in self._vis_cols
+                  if col[0] < self._pinned_cols]
+        if pinned != [col for col in prev_vis_cols
+                      if col[0] < self._pinned_cols]:
+            return False
+        prev_cols = {col_idx: (beg, width)
+                     for col_idx, beg, width in prev_vis_cols[len(pinned):]}
+        scrolled = self._vis_cols[len(pinned):]
+        # The columns that were whole on the screen, and still are.  They
+        # are next to each other, and have all moved by 'shift'.
+        kept = [col for col in scrolled
+                if prev_cols.get(col[0], (0, -1))[1] == col[2]]
+        if not kept:
+            return False
+        shift = kept[0][1] - prev_cols[kept[0][0]][0]
+        kept_beg = kept[0][1]
+        kept_end = kept[-1][1] + kept[-1][2]
+        left = [col for col in scrolled if col[1] < kept_beg]
+        right = [col for col in scrolled if col[1] >= kept_end]
+        pinned_end = pinned[-1][1] + pinned[-1][2] if pinned else 0
+        left_end = left[-1][1] + left[-1][2] if left else pinned_end
+        rows = min(self._row_capacity, self._row_count - self._first_vis_row)
+        if rows <= 0:
+            return True
+        # The columns are copied through another pad, because curses does
+        # not copy overlapping rectangles of one window.
+        scratch = render.PadPool.borrow(rows, kept_end - kept_beg)
+        self._pad.overwrite(scratch, 0, kept_beg - shift, 0, 0, rows - 1,
+                            kept_end - kept_beg - 1)
+        scratch.overwrite(self._pad, 0, 0, 0, kept_beg, rows - 1,
+                          kept_end - 1)
+        render.PadPool.give_back(scratch)
+        for pad_row in range(rows):
+            row_idx = self._first_vis_row + pad_row
+            row = self._rows[row_idx]
+            if left or (left_end < kept_beg):
+                # Wide characters take two columns, so the gap is
+                # counted in columns and not with ljust.
+                self._pad.addstr(pad_row, pinned_end,
+                                 self._format_cols(row, left, pinned_end) +
+                                 ' ' * (kept_beg - left_end))
+            self._pad.addstr(pad_row, kept_end,
+                             self._format_cols(row, right, kept_end))
+            self._pad.clrtoeol()
+            if str(self._primary_keys[row_idx]) in self._select_buffer:
+                self._pad.chgat(pad_row, 0, -1, curses.A_REVERSE)
+        stats.Stats.count('screen', 'horizontal shifts')
+        return True
 
-            # Write each column with the correct width at the correct coord,
-            # starting at the _row_count'th row.
-            for coord, col_val in zip(self._col_coords, row):
-                col_width = coord.end - coord.beg + 1
-                if col_val is None:
-                    col_val = ''
-                self._pad.addnstr(self._row_count, coord.beg, str(col_val),
-                                  col_width)
-            self._row_count = self._row_count + 1
+    def _update_vis_cols(self):
+        """Compute the screen columns of the visible columns.
+
+        The cached lines are dropped if the visible columns change.
+        """
+        prev_vis_cols = self._vis_cols
+        self._vis_cols = []
+        if not self._col_coords:
+            self._lines.clear()
+            return
+        screen_width = self._VIS_RNG[1] + 1
+        coords = self._col_coords
+        shift = coords[self._first_vis_col].beg - coords[self._pinned_cols].beg
+        col_idxs = list(range(self._pinned_cols)) +\
+                   list(range(self._first_vis_col, len(coords)))
+        for col_idx in col_idxs:
+            beg = coords[col_idx].beg
+            if col_idx >= self._pinned_cols:
+                beg = beg - shift
+            if beg >= screen_width:
+                break
+            width = min(coords[col_idx].end - coords[col_idx].beg + 1,
+                        screen_width - beg)
+            if width > 0:
+                self._vis_cols.append((col_idx, beg, width))
+            self._last_vis_col = col_idx
+        if self._vis_cols != prev_vis_cols:
+            self._lines.clear()
 
     def destroy(self):
         """Close the browser."""
-        self._pad.keypad(0)
+        self.hide()
 
-    def redraw(self):
-        """Redraw the screen to show new changes."""
-        self._pad.refresh(self._first_vis_row, self._first_vis_col,
-                          *self._SCR_COORDS[0], *self._SCR_COORDS[1])
+    def invalidate(self):
+        """Reload the rows the next time the Table is shown.
 
-    def _resize(self, rows=None, cols=None):
-        """Resize the pad.
+        Call this when the table has been changed while the Table was
+        hidden, such as by a background job.
+        """
+        self._stale = True
+        self._prefetched = None
+        self._prefetched_stamp = None
+        self._rows_stamp = None
+        self._unverified = False
+        self._revalidation = None
+
+    def prefetch(self):
+        """Start reading the first rows of a stale Table in the background.
+
+        The rows are kept until the Table is shown, so that they can be
+        displayed without waiting for the database.
+
+        Returns:
+            The workers.Job that reads the rows, or None if the Table is
+            not stale or its rows have already been read.
+        """
+        if (not self._stale) or (self._prefetched is not None):
+            return None
+        query = self._query
+        # A Table that has never been shown has no widths yet, so its
+        # prefetched rows are read in full.
+        statement = query.to_sql(columns=self._result_cols,
+                                 limit=performance.PREFETCH_ROWS)
+        def work(job, connection):
+            stamp = warmcache.get_stamp(self._DB_NAME)
+            job.committed((stamp, connection.execute(statement).fetchall()))
+        def on_commit(job, result):
+            # The query may have changed, or the rows may have been read,
+            # since the Job was started.
+            if self._stale and (self._query is query):
+                self._prefetched_stamp, self._prefetched = result
+        job = workers.Job('prefetch {}'.format(self.get_name()),
+                          self._DB_NAME, work, on_commit=on_commit,
+                          cancellable=False)
+        workers.WorkerPoolRegistry.get().submit(job)
+        return job
+
+    def get_snapshot(self):
+        """Return a warmcache.Snapshot of the first rows and of the view.
+
+        The snapshot has the rows down to the bottom of the screen, and
+        at least as many as are prefetched, but no more than
+        WARM_CACHE_ROWS.
 
-        The pad is resized to hold the given number of rows and columns.
-        If no value for a row or column is given, then the respective
-        dimension is doubled.  If an argument is less than or equal to
-        its current value, then nothing is done.  If only one dimension
-        is to be resized, then make sure to give the other dimension
-        a small value (such as 0).
+        Returns:
+            The snapshot, or None if the rows have not been read or may
+            be out of date.
+        """
+        if (not self._loaded) or self._stale or (self._rows_stamp is None):
+            return None
+        row_count = min(self._row_count, performance.WARM_CACHE_ROWS,
+                        max(self._first_vis_row + self._VIS_RNG[0] + 1,
+                            performance.PREFETCH_ROWS))
+        return warmcache.Snapshot(
+                self._DB_NAME, self._TABLE_NAME, self._rows_stamp,
+                self._DB.get_schema_version(), self._query.to_sql(),
+                list(self._col_widths), self._rows[: row_count],
+                self._cur_row, self._cur_col, self._first_vis_row,
+                self._first_vis_col)
+
+    def restore_snapshot(self, snapshot):
+        """Draw the Table from a warmcache.Snapshot until it is read.
+
+        The Table gets the snapshot's column widths, cursor and scroll
+        position, and its first rows are the snapshot's when it is
+        shown.  If the database has changed since the snapshot was
+        taken, then the rows are read again in the background as soon as
+        the snapshot is shown.  Nothing is done if the schema or the
+        query has changed since.
 
         Args:
-            rows: The new number of rows. This must be greater than the
-                current number of rows in order to resize the pad.
-            cols: The new number of columns. This must be greater than
-                the current number of columns in order to resize the pad.
+            snapshot (warmcache.Snapshot): The snapshot of the Table.
+
+        Returns:
+            True if the snapshot was restored, or False otherwise.
         """
-        if (rows <= self._row_capacity) and (cols <= self._col_capacity):
+        version = self._DB.get_schema_version()
+        if (snapshot.schema_version != version) or\
+                (snapshot.query != self._query.to_sql()) or\
+                (len(snapshot.widths) != len(self._COL_NAMES)):
+            stats.Stats.count('caches', 'warm cache misses')
+            return False
+        layout.LayoutCache.set_widths(self._DB_NAME, self._TABLE_NAME,
+                                      version, snapshot.widths)
+        self.invalidate()
+        self._prefetched = snapshot.rows
+        self._prefetched_stamp = snapshot.stamp
+        self._unverified =\
+                snapshot.stamp != warmcache.get_stamp(self._DB_NAME)
+        stats.Stats.count('caches', 'warm cache misses' if self._unverified
+                                    else 'warm cache hits')
+        self._set_position(snapshot.cur_row, snapshot.cur_col,
+                           snapshot.first_vis_row, snapshot.first_vis_col)
+        return True
+
+    def get_view(self):
+        """Return the query and the position of the Table, to be saved.
+
+        Returns:
+            A dict with the where and order_by clauses of the query, the
+            index and the primary key of the current row ('cur_row' and
+            'cursor_pk'), the name of the current column ('cur_col'), and
+            the scroll position ('first_vis_row' and 'first_vis_col').
+            'cursor_pk' is None if the Table has no rows.  The view of
+            the current Table also has the primary keys of the selected
+            rows ('selection').
+        """
+        cursor_pk = self._cursor_pk
+        if (cursor_pk is None) and (self._cur_row < self._row_count):
+            cursor_pk = self._primary_keys[self._cur_row]
+        view = {
+            'where': self._query.where,
+            'order_by': self._query.order_by,
+            'cur_row': self._cur_row,
+            'cursor_pk': cursor_pk,
+            'cur_col': self._COL_NAMES[self._cur_col],
+            'first_vis_row': self._first_vis_row,
+            'first_vis_col': self._first_vis_col,
+            }
+        if BrowserRegistry.get_buffer().get() is self:
+            view['selection'] = sorted(shared.SelectBuffer.get(), key=int)
+        return view
+
+    def restore_view(self, view):
+        """Give the Table a saved query and position.
+
+        Nothing is read.  The query is run the first time that the Table
+        is shown, and the cursor is then moved to the row that it was
+        on, if that row is still there.  The selected rows of the view
+        are added to the selection.
+
+        Args:
+            view (dict): The view, as returned by get_view.  Missing keys
+                keep their defaults.
+
+        Returns:
+            True if the view was restored, or False if its query is no
+            longer valid, such as after a column was renamed.
+        """
+        query = db.Query(self._TABLE_NAME, view.get('where', ''),
+                         view.get('order_by', ''))
+        try:
+            # Compiling the statement finds errors without running it.
+            self._DB.execute('explain ' + query.to_sql())
+        except sqlite3.Error:
+            return False
+        self._query = query
+        self.invalidate()
+        col_name = view.get('cur_col')
+        cur_col = self._COL_NAMES.index(col_name)\
+                if col_name in self._COL_NAMES else 0
+        self._set_position(view.get('cur_row', 0), cur_col,
+                           view.get('first_vis_row', 0),
+                           view.get('first_vis_col', 0))
+        self._cursor_pk = view.get('cursor_pk')
+        selection = view.get('selection')
+        if selection:
+            selections = shared.SelectBuffer.get()
+            selections.update(str(pk) for pk in selection)
+            self._select_buffer = set(selections)
+        return True
+
+    def _set_position(self, cur_row, cur_col, first_vis_row, first_vis_col):
+        """Set the cursor and the scroll position of a Table to be read.
+
+        Like an unloaded Table, the Table keeps them when its rows are
+        read.
+        """
+        self._evicted = True
+        self._cur_row = cur_row
+        self._cur_col = cur_col
+        self._first_vis_row = first_vis_row
+        self._first_vis_col = first_vis_col
+        # The screen may be smaller than when the position was saved.
+        if self._cur_row > self._first_vis_row + self._VIS_RNG[0]:
+            self._first_vis_row = self._cur_row - self._VIS_RNG[0]
+        self._last_vis_row = self._VIS_RNG[0] + self._first_vis_row
+
+    def _move_to_cursor_pk(self):
+        """Move the cursor to the row of a restored session.
+
+        The cursor stays where it is if the row is not among the rows
+        that were read.  Either way, it is only moved once.
+        """
+        if self._cursor_pk is None:
+            return
+        cursor_pk, self._cursor_pk = self._cursor_pk, None
+        try:
+            row_idx = self._primary_keys.index(cursor_pk)
+        except ValueError:
+            return
+        # Scroll as far as the cursor moves, so that it stays on the same
+        # line of the screen.
+        self._first_vis_row = max(
+                self._first_vis_row + row_idx - self._cur_row, 0)
+        self._cur_row = row_idx
+        if self._cur_row > self._first_vis_row + self._VIS_RNG[0]:
+            self._first_vis_row = self._cur_row - self._VIS_RNG[0]
+        self._last_vis_row = self._VIS_RNG[0] + self._first_vis_row
+
+    def _revalidate(self):
+        """Read the rows of an unverified snapshot again in the background.
+
+        Once read, they replace the snapshot's rows, and the rest of the
+        rows are read.  They are dropped if the Table is invalidated or
+        reloaded before then.
+        """
+        query = self._query
+        statement = query.to_sql(columns=self._result_cols,
+                                 limit=max(self._row_count,
+                                           performance.PREFETCH_ROWS))
+        def work(job, connection):
+            stamp = warmcache.get_stamp(self._DB_NAME)
+            job.committed((stamp, connection.execute(statement).fetchall()))
+        def on_commit(job, result):
+            if (self._revalidation is not job) or (self._query is not query):
+                return
+            self.invalidate()
+            self._prefetched_stamp, self._prefetched = result
+            self._evicted = True
+            if BrowserRegistry.get_buffer().get() is self:
+                try:
+                    self.create()
+                except db.QueryCancelledError:
+                    # The rows that were read before then stay shown.
+                    pass
+        job = workers.Job('revalidate {}'.format(self.get_name()),
+                          self._DB_NAME, work, on_commit=on_commit,
+                          cancellable=False)
+        self._revalidation = job
+        workers.WorkerPoolRegistry.get().submit(job)
+
+    def is_stale(self):
+        """Return True if the rows need to be reloaded before showing."""
+        return self._stale
+
+    def evict(self):
+        """Free the rows and the pad.
+
+        The query, cursor and scroll position are kept, and the rows are
+        read again the next time that the Table is shown.  Nothing is
+        done if the rows have not been read.
+        """
+        if not self._loaded:
             return
-        # Get the new number of rows.
-        if rows is None:
-            self._row_capacity = 2 * self._row_capacity
-        elif rows > self._row_capacity:
-            self._row_capacity = rows
-        # Get the new number of columns.
-        if cols is None:
-            self._col_capacity = 2 * self._col_capacity
-        elif cols > self._col_capacity:
-            self._col_capacity = cols
-        self._pad.resize(self._row_capacity, self._col_capacity)
-
-    def _on_new_query(self, rows):
-        """Display the given rows.
-
-        The table is cleared, and the new rows are displayed.
+        self.hide()
+        self._primary_keys = []
+        self._rows = rowstore.RowStore()
+        self._lines.clear()
+        self._row_count = 0
+        self._loaded = False
+        self._evicted = True
+        self._stale = True
+        self._prefetched = None
+        self._prefetched_stamp = None
+        self._rows_stamp = None
+
+    def get_memory_usage(self):
+        """Return an estimate of the bytes used by the rows and the pad."""
+        if not self._loaded:
+            return 0
+        return self._row_capacity * self._col_capacity *\
+                   performance.PAD_CELL_BYTES +\
+               len(self._primary_keys) * performance.PRIMARY_KEY_BYTES +\
+               self._rows.get_memory_usage() +\
+               len(self._lines) * (self._col_capacity + sys.getsizeof(''))
+
+    def is_loaded(self):
+        """Return True if the rows have been read at least once.
+
+        A Table that is opened without being shown only knows its
+        database, table and columns.  Its rows are read the first time
+        that it is shown.
+        """
+        return self._loaded
+
+    def redraw(self, touch=False):
+        """Redraw the screen to show new changes.
+
+        The screen is updated the next time that render.RenderScheduler
+        is flushed.  Only the lines that changed are sent to the terminal.
 
         Args:
-            rows ([tuples]): The rows to display.  Each tuple
-                represents a row, and the elements in a tuple
-                represent the columns in the row.  The size of the
-                tuple must be equal to the number of table columns.
+            touch (bool): Whether to redraw every line, and not only the
+                lines that changed.  Use this after another window, such
+                as the detail pane, was drawn over the Table.
         """
-        self.create(rows)
-        self.redraw()
+        if self._pad is None:
+            return
+        stats.Stats.count('screen', 'Table redraws')
+        if touch:
+            self._pad.touchwin()
+        self._pad.noutrefresh(0, self._BEG_COL,
+                              *self._SCR_COORDS[0], *self._SCR_COORDS[1])
+        render.RenderScheduler.schedule()
+
+    def _on_new_query(self, query):
+        """Display the rows of a new query.
+
+        The table is cleared, and the new rows are displayed as they
+        are read.
+
+        Args:
+            query (db.Query): The query whose rows to display.
+
+        Raises:
+            db.QueryCancelledError: If the query was cancelled.  The
+                rows that were read before then stay displayed.
+        """
+        self._query = query
+        try:
+            self.create()
+        finally:
+            self.redraw()
 
     # TODO: This only shows the newest row.  Make it show all rows inserted
     # since the last redraw.
@@ -334,13 +1095,15 @@ class Browser(signals.Observer):
             val = self._primary_keys[self._row_count - 1]
         else:
             val = -1
-        s = 'select * from "{table}" where "{pk}" > {val}'.format(
+        s = 'select {cols} from "{table}" where "{pk}" > {val}'.format(
+                cols=self._result_cols,
                 table=self._TABLE_NAME,
                 pk=self.PRIMARY_KEY,
                 val=val)
         rows = self._DB.execute(s)
         self._populate_browser(rows)
         self._cur_row = self._row_count - 1
+        self._draw_rows()
         self.scroll(enums.Scroll.END)
 
     def _on_entry_updated(self):
@@ -349,27 +1112,20 @@ class Browser(signals.Observer):
         This updates the current cell's value to match what it is in
         the database.
         """
-        coord = self._col_coords[self._cur_col]
-        new_value = str(self.get_cur_cell())
-        col_width = coord.end - coord.beg + 1
-        blank_col = ''.join([' ' for x in range(col_width)])
         def process(row_idx, pk):
-            cmd = 'select "{col_name}" from "{table}" where'\
-                    ' "{prim_key}"="{key}"'.format(\
-                    col_name=self._COL_NAMES[self._cur_col],
-                    table=self._TABLE_NAME,
-                    prim_key=self.PRIMARY_KEY,
-                    key=str(pk))
+            cmd = 'select {cols} from "{table}" where "{prim_key}"="{key}"'.\
+                    format(cols=self._result_cols,
+                           table=self._TABLE_NAME,
+                           prim_key=self.PRIMARY_KEY,
+                           key=str(pk))
             rows = self._DB.execute(cmd)
-            new_value = str(list(rows[0])[0])
-            # clear the column
-            self._pad.addstr(row_idx, coord.beg, blank_col)
-            # update the column
-            self._pad.addnstr(row_idx, coord.beg, new_value, col_width)
+            self._rows[row_idx] = rows[0]
+            self._lines.pop(row_idx, None)
+            self._draw_row(row_idx)
         self._for_each_selected_row(process)
         self.redraw()
 
-    def _for_each_selected_row(self, process):
+    def _for_each_selected_row(self, process, selections=None):
         """rUN A function over all selected rows.
 
         This function iterates over all selected rows (or only the
@@ -380,8 +1136,12 @@ class Browser(signals.Observer):
             process: a function that takes two arguments.  The first
                      is the zero-based index of a selected row, and
                      the second is its primary key.
+            selections: the primary keys (str) of the rows to iterate
+                        over.  If None, then the selected rows are
+                        used.
         """
-        selections = shared.SelectBuffer.get()
+        if selections is None:
+            selections = shared.SelectBuffer.get()
         if not selections:
             selections = [str(self._primary_keys[self._cur_row])]
         selections_gen = (k for k in reversed(sorted(selections)))
@@ -397,39 +1157,52 @@ class Browser(signals.Observer):
     # TODO: This redraws the table with one less row.  Make it able to redraw
     # the table without all the deleted rows.
     # since the last redraw.
-    def _on_entry_deleted(self):
+    def _on_entry_deleted(self, pks=None):
         """Redraw the table to exclude newly deleted rows.
 
         This redraws the table without rows that were deleted since the last
         redraw.
+
+        Args:
+            pks ([str]): The primary keys of the deleted rows.  If None,
+                then the selected rows are the ones that were deleted.
         """
-        selections = shared.SelectBuffer.get()
-        selections_gen = (k for k in reversed(sorted(selections)))
         def process(row_idx, pk):
             self._primary_keys.pop(row_idx)
+            self._rows.pop(row_idx)
             self._row_count = self._row_count - 1
-            self._pad.move(row_idx, 0)
-            self._pad.deleteln()
-        self._for_each_selected_row(process)
+        if pks is not None:
+            pks = list(pks)
+        self._for_each_selected_row(process, pks)
+        # The rows after the deleted ones have moved up.
+        self._lines.clear()
         if self._cur_row >= self._row_count:
             self._cur_row = self._row_count - 1
+        self._draw_rows()
         self.redraw()
 
-    # TODO: Resize horizontally.
     def _on_screen_resize(self):
         """Redraw the table to fit in the screen."""
-        if self._row_capacity < positions.BROWSER_BOTTOM_RIGHT_COORDS[0]:
-            self._resize(rows=positions.BROWSER_BOTTOM_RIGHT_COORDS[0] * 2,
-                         cols=0)
+        self._fit_screen()
+        if self._pad is not None:
+            self.show()
+
+    def _fit_screen(self):
+        """Lay out the table for the size of the screen.
+
+        The current row and column are kept on the screen.
+        """
+        self._layout_stale = False
         self._VIS_RNG = [positions.BROWSER_BOTTOM_RIGHT_COORDS[0] -
                              positions.BROWSER_UPPER_LEFT_COORDS[0],
                          positions.BROWSER_BOTTOM_RIGHT_COORDS[1] -
                              positions.BROWSER_UPPER_LEFT_COORDS[1]]
         self._SCR_COORDS = [positions.BROWSER_UPPER_LEFT_COORDS,
                             positions.BROWSER_BOTTOM_RIGHT_COORDS]
+        if self._cur_row > self._first_vis_row + self._VIS_RNG[0]:
+            self._first_vis_row = self._cur_row - self._VIS_RNG[0]
         self._last_vis_row = self._VIS_RNG[0] + self._first_vis_row
-        self._last_vis_col = self._VIS_RNG[1]
-        self.redraw()
+        self._scroll_to_cur_col()
 
     # TODO: maybe move this to a method in DBConnection.
     def get_cur_cell(self):
@@ -474,18 +1247,25 @@ class Browser(signals.Observer):
         """Return the column name of the current cell."""
         return self._COL_NAMES[self._cur_col]
 
+    def get_row_count(self):
+        """Return the number of rows that are displayed."""
+        return self._row_count
+
     def receive_signal(self, signal, args=None):
         """Override singals.Observer."""
-        if signal is signals.Signal.SCREEN_RESIZED:
-            self._on_screen_resize()
-            return
         buffer = BrowserRegistry.get_buffer()
         if (buffer is None) or (buffer.get() is not self):
+            if signal is signals.Signal.SCREEN_RESIZED:
+                # Only the visible Table is laid out right away.  The
+                # others are laid out when they are shown.
+                self._layout_stale = True
             return
+        elif signal is signals.Signal.SCREEN_RESIZED:
+            self._on_screen_resize()
         elif signal is signals.Signal.ENTRY_INSERTED:
             self._on_entry_inserted()
         elif signal is signals.Signal.ENTRY_DELETED:
-            self._on_entry_deleted()
+            self._on_entry_deleted(args)
         elif signal is signals.Signal.ENTRY_UPDATED:
             self._on_entry_updated()
         elif signal is signals.Signal.NEW_QUERY:
@@ -551,11 +1331,11 @@ class Browser(signals.Observer):
         """Scroll in the given direction."""
         if self._row_count == 0 or self._cur_row < 0:
             return
-        prev_cell_coords = self._col_coords[self._cur_col]
-        prev_cell_val = self._pad.instr(self._cur_row, prev_cell_coords.beg,
-                prev_cell_coords.sep - prev_cell_coords.beg)
         prev_row = self._cur_row
         prev_col = self._cur_col
+        prev_first_vis_row = self._first_vis_row
+        prev_vis_cols = self._vis_cols
+        cols_changed = False
         if direction in (enums.Scroll.DOWN, enums.Scroll.UP,
                          enums.Scroll.PAGE_DOWN, enums.Scroll.PAGE_UP,
                          enums.Scroll.END, enums.Scroll.HOME):
@@ -572,6 +1352,10 @@ class Browser(signals.Observer):
             elif self._cur_row < self._first_vis_row:
                 self._first_vis_row = self._cur_row
                 self._last_vis_row = self._first_vis_row + self._VIS_RNG[0]
+            if self._first_vis_row < self._BEG_ROW:
+                # There are fewer rows than fit on the screen.
+                self._first_vis_row = self._BEG_ROW
+                self._last_vis_row = self._first_vis_row + self._VIS_RNG[0]
 
         elif direction in (enums.Scroll.RIGHT, enums.Scroll.LEFT,
                          enums.Scroll.PAGE_RIGHT, enums.Scroll.PAGE_LEFT,
@@ -581,22 +1365,16 @@ class Browser(signals.Observer):
                 self._cur_col = 0
             elif self._cur_col >= len(self._COL_NAMES):
                 self._cur_col = len(self._COL_NAMES) - 1
-            if self._col_coords[self._cur_col].sep > self._last_vis_col:
-                self._last_vis_col = self._col_coords[self._cur_col].sep
-                self._first_vis_col = self._last_vis_col - self._VIS_RNG[1]
-            elif self._col_coords[self._cur_col].beg < self._first_vis_col:
-                self._first_vis_col = self._col_coords[self._cur_col].beg
-                self._last_vis_col = self._first_vis_col + self._VIS_RNG[1]
-        cur_cell_coords = self._col_coords[self._cur_col]
-        if str(self._primary_keys[prev_row]) not in self._select_buffer:
-            #self._pad.addstr(prev_row, prev_cell_coords.beg, prev_cell_val)
-            self._pad.chgat(prev_row, 0, -1, curses.A_NORMAL)
+            cols_changed = self._scroll_to_cur_col(
+                    home=(direction == enums.Scroll.H_HOME))
+        if cols_changed and (self._first_vis_row == prev_first_vis_row) and\
+                self._shift_cols(prev_vis_cols):
+            self._draw_row(self._cur_row)
+        elif cols_changed or (self._first_vis_row != prev_first_vis_row):
+            self._draw_rows()
         else:
-            self._pad.chgat(prev_row, 0, -1, curses.A_REVERSE)
-        cur_cell_val = self._pad.instr(self._cur_row, cur_cell_coords.beg,
-                cur_cell_coords.sep - cur_cell_coords.beg)
-        self._pad.addstr(self._cur_row, cur_cell_coords.beg, cur_cell_val,
-                curses.A_REVERSE)
+            self._draw_row(prev_row)
+            self._draw_row(self._cur_row)
         self.redraw()
 
     def _on_select(self):
@@ -630,9 +1408,11 @@ class Browser(signals.Observer):
         for pk_str in selections:
             pk = int(pk_str)
             row_idx = bisect.bisect_left(self._primary_keys, pk)
+            pad_row = row_idx - self._first_vis_row
             if row_idx != len(self._primary_keys) and\
-                    self._primary_keys[row_idx] == pk:
-                self._pad.chgat(row_idx, 0, -1, attr)
+                    self._primary_keys[row_idx] == pk and\
+                    (0 <= pad_row < self._row_capacity):
+                self._pad.chgat(pad_row, 0, -1, attr)
         self.redraw()
 
 
@@ -655,7 +1435,23 @@ class NullBrowser(Browser):
         pass
     def destroy(self):
         pass
-    def redraw(self):
+    def invalidate(self):
+        pass
+    def prefetch(self):
+        return None
+    def is_stale(self):
+        return False
+    def is_loaded(self):
+        return False
+    def evict(self):
+        pass
+    def show(self):
+        pass
+    def hide(self):
+        pass
+    def get_memory_usage(self):
+        return 0
+    def redraw(self, touch=False):
         pass
     def get_cur_cell(self):
         return ''
@@ -669,6 +1465,8 @@ class NullBrowser(Browser):
         return []
     def get_cur_col_name(self):
         return ''
+    def get_row_count(self):
+        return 0
     def receive_signal(self, signal, args=None):
         pass
     def scroll(self, direction, quantifier=1):
@@ -692,10 +1490,8 @@ class BrowserBuffer(signals.Observer):
     _browser_map (str -> browser): a map from Table names to Tables.
         This changes synchronsously with _name_map when Tables are
         removed, added, or when the buffer is cleared.
-    _END_ROW: The maximum rows that the pad can hold.  This changes when
-        there are more Tables than there are rows in the pad.
-    _pad: The pad that displays the list of Tabs.  This changes whenever
-        the state of the buffer changes (Tables are added, removed, switched).
+    _pad: The pad that displays the list of Tabs.  It is borrowed from
+        render.PadPool while the list is shown, and is None otherwise.
     _id: A number that increments whenever a Table is added.  Its current
         value is assigned as a unique identifier for a Table and then
         incremented.
@@ -703,17 +1499,28 @@ class BrowserBuffer(signals.Observer):
         is switched to.
     _prev: The table that was previously visible.  This changes whenever a
         Table is switched to.
+    _shown: The Table that holds a pad.  This changes whenever a Table is
+        shown, and the Table that was shown before gives its pad back.
+    _recent ([str]): The names of the Tables that have been shown, from the
+        least to the most recently shown.  This changes whenever a Table is
+        shown or removed, and decides which Tables are unloaded first when
+        the memory budget is exceeded.
+    _prefetch_jobs (str -> workers.Job): a map from Table names to the Jobs
+        that read their first rows in the background.  This changes whenever
+        a Table is shown.
     """
     def __init__(self):
         """Initialize the buffer to an empty state."""
         self._name_map = {}
         self._browser_map = {}
-        curses.initscr()
-        self._row_capacity = 2
-        self._pad = curses.newpad(self._row_capacity, curses.COLS)
+        backend.BackendRegistry.get().initscr()
+        self._pad = None
         self._id = 0
         self._cur = null_browser
         self._prev = null_browser
+        self._shown = null_browser
+        self._recent = []
+        self._prefetch_jobs = {}
         cmd_map = settings.keys.CommandMap.get()
         cmd_map['ls'].register(self)
 
@@ -781,6 +1588,8 @@ class BrowserBuffer(signals.Observer):
         self._remove_startup()
         name = self._name_map.pop(id)
         removed_browser = self._browser_map.pop(name)
+        if name in self._recent:
+            self._recent.remove(name)
         self._remove_cleanup(removed_browser)
 
     def remove_cur(self):
@@ -803,8 +1612,10 @@ class BrowserBuffer(signals.Observer):
         self._browser_map.clear()
         self._cur = null_browser
         self._prev = null_browser
+        self._shown.hide()
+        self._shown = null_browser
+        self._recent.clear()
         self._id = 0
-        self._row_capacity = 2
 
     def _remove_startup(self):
         """Ensure that the last Table is not being removed."""
@@ -841,7 +1652,7 @@ class BrowserBuffer(signals.Observer):
             self._cur = self._prev
         # case 4 is the else clause.  Nothing special needs to be done.
         removed_browser.destroy()
-        self._cur.redraw()
+        self._show_cur()
 
     def get_by_id(self, id):
         """Return the Table with the given id.
@@ -882,6 +1693,30 @@ class BrowserBuffer(signals.Observer):
             return
         self.set_cur_from_name(self._prev.get_name())
 
+    def set_cur_by_offset(self, offset):
+        """Set the current Table to one that is near it in the buffer.
+
+        The new current Table is displayed.
+
+        Args:
+            offset (int): How many places after the current Table the new
+                one is in the buffer list, as shown by the 'ls' command.
+                A negative offset counts backwards.  The list wraps
+                around at both ends.
+
+        Raises:
+            db.QueryCancelledError: If the Table's rows had to be read,
+                and reading them was cancelled.
+        """
+        names = list(self._name_map.values())
+        if not names:
+            return
+        try:
+            idx = names.index(self._cur.get_name())
+        except ValueError:
+            idx = -offset
+        self.set_cur_from_name(names[(idx + offset) % len(names)])
+
     def set_cur_from_id(self, id):
         """Set the current Table to the one with the given id.
 
@@ -907,27 +1742,97 @@ class BrowserBuffer(signals.Observer):
 
         Raises:
             KeyError: If no Table has the given name.
+            db.QueryCancelledError: If the Table's rows had to be read,
+                and reading them was cancelled.
         """
         if self._prev is null_browser:
             self._prev = self._browser_map[name]
         else:
             self._prev = self._cur
         self._cur = self._browser_map[name]
-        self._cur.redraw()
+        self._show_cur()
+
+    def _show_cur(self):
+        """Draw the current Table, reading its rows if they are stale."""
+        name = self._cur.get_name()
+        if name in self._recent:
+            self._recent.remove(name)
+        self._recent.append(name)
+        if self._shown is not self._cur:
+            self._shown.hide()
+            self._shown = self._cur
+        try:
+            if self._cur.is_stale():
+                self._cur.create()
+        finally:
+            self._cur.show()
+            self._enforce_budget()
+            self._prefetch_neighbours()
+
+    def _prefetch_neighbours(self):
+        """Read the first rows of the Tables that are likely shown next.
+
+        These are the Tables before and after the current one, which gt
+        and gT switch to, and the previous Table, which b# switches to.
+        Prefetching Tables that are no longer among them is cancelled.
+
+        The pages of the current Table in the direction it is scrolled
+        are not prefetched: create reads every page of the query before
+        it returns, so scrolling never waits for the database.  Only a
+        query that was cancelled has fewer rows, and those were not
+        wanted.
+        """
+        names = list(self._name_map.values())
+        neighbours = {self._prev}
+        if self._cur.get_name() in names:
+            idx = names.index(self._cur.get_name())
+            for offset in (1, -1):
+                neighbours.add(self._browser_map[
+                        names[(idx + offset) % len(names)]])
+        neighbours.discard(self._cur)
+        neighbour_names = {browser.get_name() for browser in neighbours}
+        for name, job in list(self._prefetch_jobs.items()):
+            if name not in neighbour_names:
+                job.cancel()
+                del self._prefetch_jobs[name]
+            elif job.is_finished():
+                del self._prefetch_jobs[name]
+        for browser in neighbours:
+            name = browser.get_name()
+            if name in self._prefetch_jobs:
+                continue
+            job = browser.prefetch()
+            if job is not None:
+                self._prefetch_jobs[name] = job
+
+    def _enforce_budget(self):
+        """Unload the least recently shown Tables until within budget.
+
+        The current Table is never unloaded.
+        """
+        usage = sum(browser.get_memory_usage()
+                    for browser in self._browser_map.values())
+        for name in list(self._recent):
+            if usage <= performance.BROWSER_MEMORY_BUDGET:
+                return
+            browser = self._browser_map[name]
+            if browser is self._cur:
+                continue
+            usage = usage - browser.get_memory_usage()
+            browser.evict()
 
     def _update(self):
         """Write Table ids and names to the pad."""
-        if len(self._name_map) > self._row_capacity:
-            self._row_capacity = len(self._name_map)
-            self._pad.resize(self._row_capacity * 2, curses.COLS)
         row_count = 0
-        self._pad.clear()
+        self._pad.erase()
         for id, name in self._name_map.items():
             self._pad.addstr(row_count, 0, str(id).ljust(4))
             if self._browser_map[name] is self._cur:
                 self._pad.addstr(row_count, 6, '%')
             if self._browser_map[name] is self._prev:
                 self._pad.addstr(row_count, 7, '#')
+            if not self._browser_map[name].is_loaded():
+                self._pad.addstr(row_count, 5, '-')
             self._pad.addstr(row_count, 8, name)
             self._pad.clrtoeol()
             row_count = row_count + 1
@@ -936,8 +1841,19 @@ class BrowserBuffer(signals.Observer):
         """Show the buffer list.
 
         This method draws the buffer list to the screen.  The list
-        shows all of the Tables that are currently open.
+        shows all of the Tables that are currently open.  The pad is
+        only borrowed while the list is shown.
         """
+        self._pad = render.PadPool.borrow(max(len(self._name_map), 1) * 2,
+                                          curses.COLS)
+        try:
+            self._show_list()
+        finally:
+            render.PadPool.give_back(self._pad)
+            self._pad = None
+
+    def _show_list(self):
+        """Draw the buffer list on the pad and show it."""
         """
         Variables:
             top_row: the row in the screen where the top of the pad is
@@ -961,6 +1877,8 @@ class BrowserBuffer(signals.Observer):
             key = 0
             while key != ord('q'):
                 key = self._pad.getch()
+                render.RenderScheduler.mark_key()
+                keylog.KeyRecorderRegistry.record([key], 'ls')
                 if key == ord('j'):
                     pad_top_row = pad_top_row + 1
                     if pad_top_row + v_range > len(self._name_map):
@@ -1052,7 +1970,7 @@ class BrowserRegistry:
 
     # TODO: Remove the lines that useless things like increment the index.
     @staticmethod
-    def create(db_name, table):
+    def create(db_name, table, show=True):
         """Create and display a Table.
 
         The Table is connected to the database 'db_name' and displays
@@ -1062,6 +1980,9 @@ class BrowserRegistry:
         Args:
             db_name (str): The name of the database to connect to.
             table_name (str): The name of the table to display.
+            show (bool): If False, then the Table is only added to the
+                buffer.  Its rows are not read until it is first
+                switched to.  Use this to open many tables at once.
 
         Returns:
             The new Table (or the matching Table if it already exists).
@@ -1070,6 +1991,7 @@ class BrowserRegistry:
             FileNotFoundError: If the database does not exist.
             ValueError: If the given table does not exist in the
                 database.
+            db.QueryCancelledError: If reading the rows was cancelled.
         """
         name = '{}.{}'.format(db_name, table)
         if BrowserRegistry._browser_buffer is None:
@@ -1084,8 +2006,11 @@ class BrowserRegistry:
                                                new_browser)
         #BrowserRegistry.set_cur(BrowserRegistry._cur_idx + 1)
         BrowserRegistry._browser_buffer.add(name, new_browser)
-        BrowserRegistry._browser_buffer.get_by_name(name).create()
-        BrowserRegistry._browser_buffer.set_cur_from_name(name)
+        # Read the rows once the Table is current, so that each page is
+        # shown as soon as it has been read.
+        new_browser.invalidate()
+        if show:
+            BrowserRegistry._browser_buffer.set_cur_from_name(name)
         return new_browser
 
     @staticmethod
@@ -4,6 +4,10 @@ import settings.keys
 import keymap
 import signals
 import enums
+import render
+import backend
+import keylog
+import sqltrace
 
 
 class InputBar(signals.Observer):
@@ -17,28 +21,23 @@ class InputBar(signals.Observer):
         receive_signal: Override signals.Observer.
     """
     def __init__(self):
-        try:
-            self._cmd_line_history = open('cmd_line_history', 'r')
-        except FileNotFoundError:
-            self._cmd_line_history = open('cmd_line_history', 'w')
-            self._cmd_line_history.close()
-            self._cmd_line_history = open('cmd_line_history', 'r')
-        self._history = []
-        for line in self._cmd_line_history:
-            self._history.insert(0, line.strip())
-        self._cmd_line_history.close()
+        # The history is read from 'cmd_line_history' the first time that
+        # it is used.  See _get_history.
+        self._history = None
         self._history_idx = -1
         self._match_gen = None
         self._match_idx = 0
         self._last_char_idx = 0
         self._is_open = False
+        self._entered_line = ''
         def f():
             return (x for x in range(0))
         self._cmd_arg_iter = _CommandArgIter('.', '.', f)
-        curses.initscr()
-        curses.cbreak()
-        curses.noecho()
-        self._win = curses.newwin(1, curses.COLS, curses.LINES - 1, 0)
+        scr = backend.BackendRegistry.get()
+        scr.initscr()
+        scr.cbreak()
+        scr.noecho()
+        self._win = scr.newwin(1, curses.COLS, curses.LINES - 1, 0)
         self._win.keypad(1)
         self._key_map = settings.keys.CommandLineKeyMap.get()
         cmd_map = settings.keys.CommandMap.get()
@@ -80,78 +79,105 @@ class InputBar(signals.Observer):
             The typed string.
         """
         self._is_open = True
-        history_len = len(self._history)
+        self._entered_line = ''
         key = 0
-        curses.curs_set(1)
+        backend.BackendRegistry.get().curs_set(1)
         self._win.move(0, 0)
         self._win.clrtoeol()
         self._win.addstr(0, 0, initial_str)
         while self._is_open:
             key = self._win.getch()
+            if key == -1: # Interrupted by a signal.
+                continue
+            render.RenderScheduler.mark_key()
+            keys = [key]
             if key == 27: # Either alt or esc.
                 self._win.nodelay(1)
                 key = self._win.getch()
                 self._win.nodelay(0)
                 if key == -1: # esc
+                    keylog.KeyRecorderRegistry.record(keys, 'cmd_line')
                     self._is_open = False
                     continue
+                keys.append(key)
             row, col = self._win.getyx()
             try:
                 cmd = self._key_map.get_cmd(key)
             except KeyError:
+                keylog.KeyRecorderRegistry.record(keys, 'cmd_line')
                 self._match_gen = None
                 self._win.insch(key)
                 self._win.move(row, col + 1)
                 self._last_char_idx = self._last_char_idx + 1
                 continue
+            keylog.KeyRecorderRegistry.record(keys, self._get_key_type(cmd))
             cmd.execute()
-        curses.curs_set(0)
+        backend.BackendRegistry.get().curs_set(0)
         self._win.move(0, 0)
         self._win.clrtoeol()
         self._win.refresh()
         self._last_char_idx = 0
-        return self._close(history_len)
+        return self._entered_line
 
     def destroy(self):
         """Close the command line and end curses."""
-        curses.nocbreak()
+        scr = backend.BackendRegistry.get()
+        scr.nocbreak()
         self._win.keypad(0)
-        curses.echo()
-        curses.endwin()
+        scr.echo()
+        scr.endwin()
 
-    def _close(self, history_len):
-        """Append the command to the history file.
+    def _get_history(self):
+        """Return the entered commands, newest first.
 
-        If no command was entered, then nothing is written.
+        The history file is read the first time that the history is
+        needed, such as when Enter or Up is pressed, rather than when
+        the command line is created.
+        """
+        if self._history is None:
+            self._history = []
+            try:
+                with open('cmd_line_history', 'r') as cmd_line_history:
+                    for line in cmd_line_history:
+                        self._history.insert(0, line.strip())
+            except FileNotFoundError:
+                pass
+        return self._history
 
-        Args:
-            history_len: The length of self._history when the command
-                line was opened.
+    def _get_key_type(self, cmd):
+        """Return the type of a key to record.
 
-        Returns:
-            The contents of the command line.
+        Enter is recorded as ':' and the name of the entered command, so
+        that its latency includes running the command.
+
+        Args:
+            cmd: The Command bound to the key, or None.
         """
-        if history_len == len(self._history):
-            return ''
-        cmd_line_history = open('cmd_line_history', 'a')
-        cmd_line_history.write(self._history[0] + '\n')
-        cmd_line_history.close()
-        return self._history[0]
+        if cmd is not settings.keys.CommandMap.get()['press_enter']:
+            return 'cmd_line'
+        line = self._win.instr(0, 0).decode('utf-8').strip()
+        return ':' + line.split(' ', 1)[0]
 
     def _on_screen_resize(self):
-        self._win = curses.newwin(1, curses.COLS, curses.LINES - 1, 0)
-        self._win.keypad(1)
+        render.place_window(self._win, 1, curses.COLS, curses.LINES - 1, 0)
 
     def _on_press_enter(self):
-        """Add the command line contents to the history array.
+        """Add the command line contents to the history.
 
-        If the line is empty or is the same as the most recently
-        entered line, then the history array is unmodified.
+        The line is also appended to the history file.  If the line is
+        empty or is the same as the most recently entered line, then the
+        history is unmodified.
         """
         line = self._win.instr(0, 0)
         line = line.decode('utf-8').strip()
-        if line and ((not self._history) or (line != self._history[0])):
-            self._history.insert(0, line)
+        # The same command can be entered twice in a row, so the history
+        # does not tell whether a command was entered.
+        self._entered_line = line
+        history = self._get_history()
+        if line and ((not history) or (line != history[0])):
+            history.insert(0, line)
+            with open('cmd_line_history', 'a') as cmd_line_history:
+                cmd_line_history.write(line + '\n')
             self._win.move(0, 0)
             self._win.clrtoeol()
         self._history_idx = -1
@@ -177,8 +203,8 @@ class InputBar(signals.Observer):
         row, col = self._win.getyx()
         if direction is enums.Scroll.UP:
             def f():
-                if self._history_idx >= len(self._history):
-                    self._history_idx = len(self._history) - 1
+                if self._history_idx >= len(self._get_history()):
+                    self._history_idx = len(self._get_history()) - 1
             self._on_up_down(direction, f)
             return
         elif direction is enums.Scroll.DOWN:
@@ -209,7 +235,7 @@ class InputBar(signals.Observer):
 
     def _on_up_down(self, direction, check_bounds):
         """Run code common to UP and DOWN."""
-        if not self._history:
+        if not self._get_history():
             return
         if direction is enums.Scroll.UP:
             self._history_idx = self._history_idx + 1
@@ -321,6 +347,7 @@ class CommandLine:
 
     Methods:
         open: Open the command line for editing.
+        run: Run a command as if it had been entered.
         get_cmd_args: Return the arguments for the command.
         get_cmd_name: Return the name of the command.
         destroy: See InputBar's destroy method.
@@ -340,6 +367,18 @@ class CommandLine:
         input_str = self._input_bar.open(initial_str)
         if not input_str:
             return
+        self.run(input_str)
+
+    def run(self, input_str):
+        """Run a command as if it had been entered in the command line.
+
+        The command is not added to the history.  Unknown commands are
+        ignored.
+
+        Args:
+            input_str: The command's name, optionally followed by a space
+                and its arguments.
+        """
         try:
             arg_idx= input_str.index(' ')
             self._cmd_name = input_str[: arg_idx]
@@ -350,10 +389,14 @@ class CommandLine:
         # TODO: get the command associated with input_str[0]
         # TODO: get flags
         cmd_map = settings.keys.CommandMap.get()
+        prev_command = sqltrace.SQLTraceRegistry.set_command(
+                ':' + self._cmd_name)
         try:
             cmd_map[self._cmd_name].execute()
         except KeyError:
             pass
+        finally:
+            sqltrace.SQLTraceRegistry.set_command(prev_command)
         self._cmd_name = ''
         self._cmd_args = ''
 
@@ -24,19 +24,30 @@
         ShowBuffers: Show a list of open Tables.
         SaveSession: Save the current session.
         LoadSession: Load a session.
+        Cancel: Cancel all background jobs.
+        ShowDetail: Show every value of the current row.
+        ShowStats: Show the counts of the session.
+        Profile: Profile the time of the session.
+        ProfileMemory: Trace the memory of the session.
+        ToggleHUD: Show or hide the latency HUD.
 """
-import json
 import curses
+import json
 import re
-import sre_constants
+import time
 import signals
 import enums
 import browser
 import status_bar
 import cmd_line_test
+import backend
 import settings.positions as positions
 import shared
 import sqlite3
+import db
+import stats
+import workers
+import settings.performance as performance
 
 
 class Command:
@@ -78,6 +89,127 @@ class Command:
         return lambda : (x for x in range(0))
 
 
+def _batches(items, size):
+    """Return a generator of consecutive slices of items."""
+    return (items[idx : idx + size] for idx in range(0, len(items), size))
+
+
+def _start_job(job, size):
+    """Run a Job in the background if it is bigger than one batch.
+
+    Jobs that fit in one batch are waited for a moment so that their
+    result is shown without any delay.  If the database is busy, they
+    are shown like the others once they finish.
+
+    Args:
+        job (Job): The Job to run.
+        size (int): The number of rows that the Job will touch.
+    """
+    pool = workers.WorkerPoolRegistry.get()
+    if size > performance.JOB_BATCH_SIZE:
+        pool.submit(job)
+        _show_job_progress(job)
+    elif not pool.run_now(job):
+        _show_job_progress(job)
+
+
+def _show_commit(subject, table, signal, args=None):
+    """Show a Job's committed batch in the Table it was made to.
+
+    If the Table is visible, then the signal is emitted so that it
+    shows the batch right away.  Otherwise, the Table is told to reload
+    its rows the next time it is shown.
+
+    Args:
+        subject (Subject): The Command that emits the signal.
+        table (Browser): The Table that the batch was committed to.
+        signal: The signal to emit.
+        args: The arguments to send with the signal.
+    """
+    if browser.BrowserRegistry.get_buffer().get() is table:
+        subject.emit(signal, args)
+    else:
+        table.invalidate()
+
+
+def _show_job_progress(job):
+    """Show a background Job's progress in the status bar."""
+    stat_bar = status_bar.StatusBarRegistry.get()
+    stat_bar.prompt('{name}: {done}/{total} (Esc to cancel)'.format(
+                        name=job.name, done=job.done, total=job.total),
+                    enums.Prompt.INFO)
+
+
+def _show_job_done(job):
+    """Show how a background Job ended in the status bar."""
+    stat_bar = status_bar.StatusBarRegistry.get()
+    if job.error is not None:
+        stat_bar.prompt('{name}: {err}'.format(name=job.name, err=job.error),
+                        enums.Prompt.ERROR)
+    elif job.is_cancelled():
+        stat_bar.prompt('{name}: cancelled after {done}/{total}.'.format(
+                            name=job.name, done=job.done, total=job.total),
+                        enums.Prompt.INFO)
+    else:
+        stat_bar.redraw()
+
+
+def _run_query(subject, table, query):
+    """Show the rows of a query in the current Table.
+
+    The query can be cancelled with Esc or Ctrl-C, in which case the
+    rows read up to then stay on screen.  The status bar shows how long
+    the query took if it was slow or was cancelled.
+
+    Args:
+        subject (Subject): The Command that emits NEW_QUERY.
+        table (Browser): The current Table.
+        query (db.Query): The query to run.
+    """
+    stat_bar = status_bar.StatusBarRegistry.get()
+    start = time.monotonic()
+    try:
+        subject.emit(signals.Signal.NEW_QUERY, query)
+    except db.QueryCancelledError as err:
+        stat_bar.prompt('{err}  Showing {rows} rows.'.format(
+                            err=err, rows=table.get_row_count()),
+                        enums.Prompt.INFO)
+        return
+    elapsed = time.monotonic() - start
+    if elapsed >= performance.QUERY_STATUS_DELAY:
+        stat_bar.prompt('{rows} rows in {secs:.2f}s.'.format(
+                            rows=table.get_row_count(), secs=elapsed),
+                        enums.Prompt.INFO)
+
+
+def _run_profiler(name, start, stop):
+    """Start or stop a profiler with the arguments of a command.
+
+    The arguments are 'start', or 'stop' and the file to write.
+
+    Args:
+        name (str): The name of the command, for its usage.
+        start: The function that starts the profiler.
+        stop: The function that stops the profiler, writes the file and
+            returns a summary.
+    """
+    import profiler
+    stat_bar = status_bar.StatusBarRegistry.get()
+    args = cmd_line_test.CommandLineRegistry.get().get_cmd_args().split(
+            ' ', 1)
+    try:
+        if args == ['start']:
+            start()
+            stat_bar.prompt('Started {}.'.format(name), enums.Prompt.INFO)
+        elif (args[0] == 'stop') and (len(args) == 2) and args[1]:
+            stat_bar.prompt(stop(args[1]), enums.Prompt.INFO)
+        else:
+            stat_bar.prompt('Usage: {} start|stop FILE'.format(name),
+                            enums.Prompt.ERROR)
+    except (profiler.ProfilerError, OSError) as err:
+        stat_bar.prompt(str(err), enums.Prompt.ERROR)
+
+
 # TODO: emit a signal and remove the Browser reference.
 class Scroll(Command, signals.Subject):
     def __init__(self, direction, name, desc, quantifier=1, **kwargs):
@@ -184,16 +316,32 @@ class Clone(Command, signals.Subject):
         schema = cur_db.execute(s)[0][0]
         s = schema.replace(table_name, clone_table_name, 1)
         cur_db.execute(s)
-        if cmd_line.get_cmd_name().endswith('!'):
-            s = 'insert into "{clone}" select * from "{original}"'.format(
-                    clone=clone_table_name,
-                    original=table_name)
-            if rowids:
-                where_clause = ' where rowid in ({selected_ids})'.format(
-                        selected_ids=','.join(rowids))
-                s += where_clause
-            cur_db.execute(s)
         cur_db.commit()
+        if not cmd_line.get_cmd_name().endswith('!'):
+            return
+        # Copy the rows in batches so that the copy can be cancelled.
+        if rowids:
+            rowids = sorted(rowids, key=int)
+        else:
+            s = 'select rowid from "{original}"'.format(original=table_name)
+            rowids = [str(row[0]) for row in cur_db.execute(s)]
+        def work(job, connection):
+            for batch in _batches(rowids, performance.JOB_BATCH_SIZE):
+                if job.is_cancelled():
+                    return
+                s = 'insert into "{clone}" select * from "{original}"\
+                        where rowid in ({ids})'.format(
+                                clone=clone_table_name,
+                                original=table_name,
+                                ids=','.join(batch))
+                connection.execute(s)
+                connection.commit()
+                job.progress(job.done + len(batch), len(rowids))
+        job = workers.Job('clone {}'.format(clone_table_name), db_name, work,
+                          on_progress=_show_job_progress,
+                          on_done=_show_job_done)
+        job.total = len(rowids)
+        _start_job(job, len(rowids))
         #self.emit(signals.Signal.ENTRY_INSERTED)
 
 
@@ -248,14 +396,29 @@ class Delete(Command, signals.Subject):
             if not args:
                 args = str(table.get_cur_row_pks())
             selections.add(args)
-        s = 'delete from "{table}" where "{pk}" in ({vals})'.format(
-                table=table_name,
-                pk=table.PRIMARY_KEY,
-                vals=','.join(selections))
-        cur_db.execute(s)
-        cur_db.commit()
-        self.emit(signals.Signal.ENTRY_DELETED)
-        selections.clear()
+        pks = sorted(selections, key=int)
+        def work(job, connection):
+            for batch in _batches(pks, performance.JOB_BATCH_SIZE):
+                if job.is_cancelled():
+                    return
+                s = 'delete from "{table}" where "{pk}" in ({vals})'.format(
+                        table=table_name,
+                        pk=table.PRIMARY_KEY,
+                        vals=','.join(batch))
+                connection.execute(s)
+                connection.commit()
+                job.committed(batch)
+                job.progress(job.done + len(batch), len(pks))
+        def on_commit(job, batch):
+            # Rows that were not deleted (after a cancel) stay selected.
+            selections.difference_update(batch)
+            _show_commit(self, table, signals.Signal.ENTRY_DELETED, batch)
+        job = workers.Job('delete', db_name, work,
+                          on_progress=_show_job_progress,
+                          on_commit=on_commit,
+                          on_done=_show_job_done)
+        job.total = len(pks)
+        _start_job(job, len(pks))
 
 
 class Copy(Command):
@@ -293,7 +456,9 @@ class Copy(Command):
                     continue
                 row[idx] = '"{}"'.format(val)
             entries.append(tuple(row))
-        shared.CopyBuffer.set(shared.CopyBuffer.DEFAULT_KEY, entries)
+        import rowstore
+        shared.CopyBuffer.set(shared.CopyBuffer.DEFAULT_KEY,
+                              rowstore.RowStore(entries))
         selections.clear()
 
 
@@ -314,14 +479,27 @@ class Paste(Command, signals.Subject):
                               enums.Prompt.ERROR)
             return
         rows = shared.CopyBuffer.get(shared.CopyBuffer.DEFAULT_KEY)
-        for row in rows:
-            values = ','.join(row)
-            s = 'insert into "{table}" values ({val})'.format(
-                    table=table_name,
-                    val=values)
-            cur_db.execute(s)
-        cur_db.commit()
-        self.emit(signals.Signal.ENTRY_INSERTED)
+        def work(job, connection):
+            for batch in _batches(rows, performance.JOB_BATCH_SIZE):
+                if job.is_cancelled():
+                    return
+                for row in batch:
+                    values = ','.join(row)
+                    s = 'insert into "{table}" values ({val})'.format(
+                            table=table_name,
+                            val=values)
+                    connection.execute(s)
+                connection.commit()
+                job.committed()
+                job.progress(job.done + len(batch), len(rows))
+        def on_commit(job, result):
+            _show_commit(self, cur_browser, signals.Signal.ENTRY_INSERTED)
+        job = workers.Job('paste', db_name, work,
+                          on_progress=_show_job_progress,
+                          on_commit=on_commit,
+                          on_done=_show_job_done)
+        job.total = len(rows)
+        _start_job(job, len(rows))
 
 
 class NextBrowser(Command, signals.Subject):
@@ -330,12 +508,11 @@ class NextBrowser(Command, signals.Subject):
         signals.Subject.__init__(self)
 
     def execute(self):
-        cur_idx = browser.BrowserRegistry.get_cur_idx()
+        buffer = browser.BrowserRegistry.get_buffer()
         try:
-            browser.BrowserRegistry.set_cur(cur_idx + 1)
-        except IndexError:
-            browser.BrowserRegistry.set_cur(0)
-        self.emit(signals.Signal.BROWSER_SWITCHED)
+            buffer.set_cur_by_offset(1)
+        finally:
+            self.emit(signals.Signal.BROWSER_SWITCHED)
 
 
 class PreviousBrowser(Command, signals.Subject):
@@ -344,14 +521,11 @@ class PreviousBrowser(Command, signals.Subject):
         signals.Subject.__init__(self)
 
     def execute(self):
-        cur_idx = browser.BrowserRegistry.get_cur_idx()
+        buffer = browser.BrowserRegistry.get_buffer()
         try:
-            if cur_idx == 0:
-                raise IndexError
-            browser.BrowserRegistry.set_cur(cur_idx - 1)
-        except IndexError:
-            browser.BrowserRegistry.set_cur(browser.BrowserRegistry.get_count() - 1)
-        self.emit(signals.Signal.BROWSER_SWITCHED)
+            buffer.set_cur_by_offset(-1)
+        finally:
+            self.emit(signals.Signal.BROWSER_SWITCHED)
 
 
 class RemoveTable(Command, signals.Subject):
@@ -382,7 +556,7 @@ class RemoveTable(Command, signals.Subject):
         # work.  Instead, it raises a KeyError.
         try:
             pattern = re.compile(args)
-        except sre_constants.error as err:
+        except re.error as err:
             stat_bar.prompt(str(err), enums.Prompt.ERROR)
             return
         try:
@@ -428,14 +602,16 @@ class SwitchTable(Command, signals.Subject):
             return
         try:
             buffer.set_cur_from_id(int(args))
+            self.emit(signals.Signal.BROWSER_SWITCHED)
             selections.clear()
+            return
         except KeyError:
             pass
         except ValueError:
             pass
         try:
             pattern = re.compile(args)
-        except sre_constants.error as err:
+        except re.error as err:
             stat_bar.prompt(str(err), enums.Prompt.ERROR)
             return
         try:
@@ -454,7 +630,7 @@ class SwitchTable(Command, signals.Subject):
         buffer = browser.BrowserRegistry.get_buffer()
         try:
             pattern = re.compile(args)
-        except sre_constants.error as err:
+        except re.error as err:
             stat_bar.prompt(str(err), enums.Prompt.ERROR)
             return lambda : (x for x in range(0))
         name_iter = iter(buffer.name_generator())
@@ -489,11 +665,7 @@ class Edit(Command, signals.Subject):
         buffer = browser.BrowserRegistry.get_buffer()
         stat_bar = status_bar.StatusBarRegistry.get()
         args = cmd_line.get_cmd_args()
-        name = ''
         names = []
-        db_name = ''
-        table_names = []
-        table_name = ''
         # TODO: This try-block is uneccesary--just use an if-block.
         try:
             names = self._parse(args)
@@ -503,33 +675,46 @@ class Edit(Command, signals.Subject):
             stat_bar.prompt(str(err), enums.Prompt.ERROR)
             return
         # Open a new buffer with the given database and table.
+        db_name = names[0]
         if names[1] != '*':
-            db_name = names[0]
-            table_names.append((names[1],))
-        elif names[1] == '*':
-            db_name = names[0]
-            new_db = shared.DBRegistry.create(db_name)
-            try:
-                new_db.connect()
-            except FileNotFoundError as err:
-                stat_bar.prompt("'{db}' does not exist.".format(db=str(err)),
-                                enums.Prompt.ERROR)
-                return
-            table_names = new_db.get_tables()
-        for name in table_names:
             try:
-                table_name = name[0]
-                brw = browser.BrowserRegistry.create(db_name, table_name)
+                brw = browser.BrowserRegistry.create(db_name, names[1])
             except FileNotFoundError as err:
                 stat_bar.prompt(str(err), enums.Prompt.ERROR)
                 return
             except ValueError as err:
                 stat_bar.prompt(str(err), enums.Prompt.ERROR)
                 return
-        buffer = browser.BrowserRegistry.get_buffer()
-        buffer.set_cur_from_name(table_name)
-        self.emit(signals.Signal.BROWSER_OPENED)
+            except db.QueryCancelledError as err:
+                self.emit(signals.Signal.BROWSER_OPENED)
+                stat_bar.prompt('{err}  Showing {rows} rows.'.format(
+                                    err=err, rows=buffer.get().get_row_count()),
+                                enums.Prompt.INFO)
+                selections.clear()
+                return
+            buffer.set_cur_from_name(brw.get_name())
+            self.emit(signals.Signal.BROWSER_OPENED)
+            selections.clear()
+            return
+        new_db = shared.DBRegistry.create(db_name)
+        try:
+            new_db.connect()
+        except FileNotFoundError as err:
+            stat_bar.prompt("'{db}' does not exist.".format(db=str(err)),
+                            enums.Prompt.ERROR)
+            return
+        # Only the first table is read now.  The others are read when
+        # they are first switched to.
+        table_names = [name[0] for name in new_db.get_tables()]
+        for table_name in table_names:
+            browser.BrowserRegistry.create(db_name, table_name, show=False)
         selections.clear()
+        if table_names:
+            name = '{}.{}'.format(db_name, table_names[0])
+            try:
+                buffer.set_cur_from_name(name)
+            finally:
+                self.emit(signals.Signal.BROWSER_OPENED)
 
     def _parse(self, args):
             """Return a combination of db name, table name, and id.
@@ -600,12 +785,9 @@ class Filter(Command, signals.Subject):
             stat_bar.prompt('No connection to the database.',
                               enums.Prompt.ERROR)
             return
-        s = 'select * from "{table}" where "{col_name}" like \'%{val}%\''.\
-                format(table=table_name,
-                       col_name=col_name,
-                       val=args)
-        rows = cur_db.execute(s)
-        self.emit(signals.Signal.NEW_QUERY, rows)
+        where = '"{col_name}" like \'%{val}%\''.format(col_name=col_name,
+                                                       val=args)
+        _run_query(self, cur_browser, db.Query(table_name, where=where))
         selections.clear()
 
 
@@ -653,12 +835,9 @@ class Sort(Command, signals.Subject):
             col_name = args[sep_idx + 1:]
         if not col_name:
             col_name = cur_browser.get_cur_col_name()
-        s = 'select * from "{table}" order by "{col_name}" {dir}'.format(
-                table=table_name,
-                col_name=col_name,
-                dir=direction)
-        rows = cur_db.execute(s)
-        self.emit(signals.Signal.NEW_QUERY, rows)
+        order_by = '"{col_name}" {dir}'.format(col_name=col_name,
+                                               dir=direction)
+        _run_query(self, cur_browser, db.Query(table_name, order_by=order_by))
         selections.clear()
 
 
@@ -740,7 +919,7 @@ class Resize(Command, signals.Subject):
         self.emit(signals.Signal.SCREEN_RESIZED)
 
     def _set_coords(self):
-        curses.update_lines_cols()
+        backend.BackendRegistry.get().update_lines_cols()
         if positions.STATUS_BAR_POSITION == positions.SCREEN_TOP:
             positions.STATUS_BAR_COORDS = (0, 0)
             positions.BROWSER_UPPER_LEFT_COORDS = (1, 0)
@@ -844,13 +1023,26 @@ class SaveSession(Command, signals.Subject):
             stat_bar.prompt('Cannot save an empty session.',
                     enums.Prompt.ERROR)
             return
+        import warmcache
         session = open(args, 'w')
+        snapshots = []
         for name, table in iter(buffer.table_generator()):
             table_name = table.get_table_name()
             db_name = table.get_db_name()
-            json.dump((db_name, table_name), session)
+            view = table.get_view()
+            if table is buffer.get():
+                view['current'] = True
+            json.dump((db_name, table_name, view), session)
             session.write('\n')
+            snapshot = table.get_snapshot()
+            if snapshot is not None:
+                snapshots.append(snapshot)
         session.close()
+        try:
+            warmcache.WarmCache.save(args, snapshots)
+        except (OSError, sqlite3.Error) as err:
+            stat_bar.prompt('The warm cache was not saved: {}'.format(err),
+                            enums.Prompt.ERROR)
         #self.emit(signals.Signal.SHOW_BUFFERS)
 
 
@@ -861,6 +1053,7 @@ class LoadSession(Command, signals.Subject):
 
     def execute(self):
         all_tables_loaded = True
+        all_views_restored = True
         selections = shared.SelectBuffer.get()
         buffer = browser.BrowserRegistry.get_buffer()
         stat_bar = status_bar.StatusBarRegistry.get()
@@ -872,27 +1065,54 @@ class LoadSession(Command, signals.Subject):
             stat_bar.prompt('usage: ldsession session_name',
                     enums.Prompt.ERROR)
             return
+        import warmcache
         try:
             session = open(args, 'r')
         except FileNotFoundError as err:
             stat_bar.prompt(str(err), enums.Prompt.ERROR)
             return
+        snapshots = warmcache.WarmCache.load(args)
         browser.BrowserRegistry.destroy_all()
         if buffer is not None:
             buffer.clear()
+        selections.clear()
+        # Only the current table is read now.  The others are read, with
+        # their queries, when they are first switched to.  Tables with a
+        # snapshot in the warm cache are drawn from it first.
+        last_table = None
+        cur_table = None
         for line in session:
             try:
-                browser.BrowserRegistry.create(*(json.loads(line)))
+                entry = json.loads(line)
+                # Sessions saved before views were saved only have the
+                # database and the table.
+                db_name, table_name = entry[: 2]
+                view = entry[2] if len(entry) > 2 else {}
+                last_table = browser.BrowserRegistry.create(
+                        db_name, table_name, show=False)
+                if view and not last_table.restore_view(view):
+                    all_views_restored = False
+                if view.get('current'):
+                    cur_table = last_table
+                snapshot = snapshots.get((db_name, table_name))
+                if snapshot is not None:
+                    last_table.restore_snapshot(snapshot)
             except ValueError:
                 all_tables_loaded = False
             except FileNotFoundError as err:
                 stat_bar.prompt(str(err), enums.Prompt.ERROR)
                 break
+        session.close()
+        if cur_table is None:
+            cur_table = last_table
+        if cur_table is not None:
+            buffer.set_cur_from_name(cur_table.get_name())
         if not all_tables_loaded:
             stat_bar.prompt('Some tables could not be loaded.',
                             enums.Prompt.ERROR)
-        session.close()
-        selections.clear()
+        elif not all_views_restored:
+            stat_bar.prompt('Some sorts and filters could not be restored.',
+                            enums.Prompt.ERROR)
 
 
 class Increment(Command, signals.Subject):
@@ -957,3 +1177,100 @@ class SendSignal(Command, signals.Subject):
 
     def execute(self):
         self.emit(self._signal)
+
+
+class Cancel(Command):
+    """Cancel all background jobs that were started by commands.
+
+    Rows that a job has already committed are kept.  Prefetches and
+    other jobs that aniLog starts on its own are left to finish.
+    """
+    def execute(self):
+        workers.WorkerPoolRegistry.get().cancel_all(cancellable_only=True)
+
+
+class ShowDetail(Command):
+    """Show every value of the current row in the detail pane.
+
+    Long values are read as the pane is scrolled.  The Table is drawn
+    again once the pane is closed.
+    """
+    def execute(self):
+        stat_bar = status_bar.StatusBarRegistry.get()
+        cur_browser = browser.BrowserRegistry.get_buffer().get()
+        if cur_browser.get_row_count() == 0:
+            stat_bar.prompt('No row to show.', enums.Prompt.ERROR)
+            return
+        db_name = cur_browser.get_db_name()
+        table_name = cur_browser.get_table_name()
+        try:
+            cur_db = shared.DBRegistry.get_db(db_name)
+        except KeyError:
+            stat_bar.prompt('No connection to the database.',
+                              enums.Prompt.ERROR)
+            return
+        import detail
+        pane = detail.DetailPane(cur_db, table_name,
+                                 cur_db.get_col_names(table_name),
+                                 cur_browser.get_cur_row_pks(),
+                                 cur_browser.get_cur_col_name())
+        try:
+            pane.open()
+        finally:
+            cur_browser.redraw(touch=True)
+
+
+class ShowStats(Command):
+    """Show the counts of the session in a pane over the Table.
+
+    The counts are those of stats.Stats, such as the statements run and
+    the screen updates.  The Table is drawn again once the pane is
+    closed.  'stats reset' sets the counts to zero instead, so that the
+    counts of what is done next can be seen on their own.
+    """
+    def execute(self):
+        stat_bar = status_bar.StatusBarRegistry.get()
+        args = cmd_line_test.CommandLineRegistry.get().get_cmd_args()
+        if args == 'reset':
+            stats.Stats.clear()
+            stat_bar.prompt('The counts were set to zero.', enums.Prompt.INFO)
+            return
+        elif args:
+            stat_bar.prompt('Usage: stats [reset]', enums.Prompt.ERROR)
+            return
+        import stats_pane
+        try:
+            stats_pane.StatsPane().open()
+        finally:
+            browser.BrowserRegistry.get_buffer().get().redraw(touch=True)
+
+
+class Profile(Command):
+    """Profile the time of the session with cProfile.
+
+    'profile start' starts profiling, and 'profile stop FILE' writes the
+    profile to FILE and shows the slowest functions in the status bar.
+    """
+    def execute(self):
+        import profiler
+        _run_profiler('profile', profiler.Profiler.start,
+                      profiler.Profiler.stop)
+
+
+class ProfileMemory(Command):
+    """Trace the memory of the session with tracemalloc.
+
+    'memprofile start' starts tracing, and 'memprofile stop FILE' writes a
+    snapshot to FILE and shows the lines that allocated the most memory
+    in the status bar.
+    """
+    def execute(self):
+        import profiler
+        _run_profiler('memprofile', profiler.Profiler.start_memory,
+                      profiler.Profiler.stop_memory)
+
+
+class ToggleHUD(Command):
+    """Show or hide the latency HUD at the right of the status bar."""
+    def execute(self):
+        status_bar.StatusBarRegistry.get().toggle_hud()
@@ -1,5 +1,10 @@
+import codecs
 import os
 import sqlite3
+import time
+import sqltrace
+import stats
+import settings.performance as performance
 
 # TODO: Replace get_newest with get_newest_rows
 class NoConnectionError(Exception):
@@ -11,6 +16,54 @@ class NoConnectionError(Exception):
     def __str__(self):
         return 'Database not connected. Call connect().'
 
+class QueryCancelledError(Exception):
+    """Error for a statement that was cancelled while it ran."""
+
+    def __init__(self, elapsed=0.0):
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return 'Query cancelled after {:.2f}s.'.format(self.elapsed)
+
+
+class Query:
+    """A select statement on one table.
+
+    The statement is kept as its parts so that it can be run again
+    later, for example to reload a Table with the same sort and filter.
+
+    Instance variables:
+        table (str): The name of the table to select from.
+        where (str): The condition of the where clause, or an empty
+            string to select every row.
+        order_by (str): The terms of the order by clause, or an empty
+            string to keep the table's natural order.
+    """
+    def __init__(self, table, where='', order_by=''):
+        self.table = table
+        self.where = where
+        self.order_by = order_by
+
+    def to_sql(self, columns='*', limit=-1, offset=0):
+        """Return the select statement.
+
+        Args:
+            columns (str): The result columns of the statement.
+            limit (int): The most rows to select.  A negative number
+                means that there is no limit.
+            offset (int): The number of rows to skip.
+        """
+        s = 'select {cols} from "{table}"'.format(cols=columns,
+                                                  table=self.table)
+        if self.where:
+            s += ' where {}'.format(self.where)
+        if self.order_by:
+            s += ' order by {}'.format(self.order_by)
+        if (limit >= 0) or offset:
+            s += ' limit {} offset {}'.format(limit, offset)
+        return s
+
+
 class DBConnection:
     """Interface for an sqlite3 database.
 
@@ -22,11 +75,16 @@ class DBConnection:
         close: Close the connection to the database. 
         get_primary_keys: Return a table's primary keys.
         get_col_names: Return the names of a table's columns.
+        get_schema_version: Return the version of the database schema.
+        get_length_stats: Return statistics about the lengths of values.
+        iter_value: Read a text or blob value a chunk at a time.
         select_all_from: Return all rows of a table.
         get_newest: Deprecated.
         get_tables: Return the names of all tables.
         execute: Execute any sqlite statement.
+        iter_pages: Execute a statement and return its rows in pages.
         commit: Save any changes applied to the database.
+        set_interrupt_check: Allow running statements to be cancelled.
     """
 
     def __init__(self, name):
@@ -35,6 +93,10 @@ class DBConnection:
         self._cursor = None
         self._no_connect_err = NoConnectionError()
         self._table_names = []
+        self._interrupt_check = None
+        self._query_start = 0.0
+        self._last_check = 0.0
+        self._cancelled = False
 
     def connect(self):
         """Connect to the database.
@@ -48,8 +110,11 @@ class DBConnection:
             return
         if not os.path.exists(self._name):
             raise FileNotFoundError(self._name)
-        self._connection = sqlite3.connect(self._name)
+        self._connection = sqltrace.connect(self._name)
+        self._connection.execute('pragma cache_size = -{}'.format(
+                performance.DB_CACHE_SIZE))
         self._cursor = self._connection.cursor()
+        self._install_progress_handler()
         s = 'select name from sqlite_master where type="table"'
         self._table_names = self.execute(s)
 
@@ -107,6 +172,165 @@ class DBConnection:
             col_names.append(row[1])
         return col_names
 
+    def get_schema_version(self):
+        """Return the version of the database schema.
+
+        The version changes whenever a table is created, altered or
+        dropped, by this or any other connection.
+
+        Raises;
+            NoConnectionError: If the database is not connected to.
+        """
+        if not self._connection:
+            raise self._no_connect_err
+        return self._cursor.execute('pragma schema_version').fetchone()[0]
+
+    def get_length_stats(self, table_name, col_names, percentile,
+                         sample_size, whole_col_names=()):
+        """Return statistics about the lengths of each column's values.
+
+        The statistics are computed by sqlite from a sample of rows spread
+        over the whole table, so that they are fast to get even for large
+        tables.  Numbers are measured in every row, because a number that
+        is cut is a different number.  Reals are measured as they are
+        written with 17 significant digits, which is at least as long as
+        Python writes them.
+
+        Args:
+            table_name (str): The name of the table.
+            col_names ([str]): The names of the columns.
+            percentile (int): The percentile of the lengths to return,
+                from 0 to 100.
+            sample_size (int): The number of rows to compute the
+                statistics from.
+            whole_col_names ([str]): The columns whose values are all
+                measured in every row, and not only their numbers, such
+                as primary keys.
+
+        Returns:
+            A list with a tuple (longest, percentile, exact) for each
+            column.  The longest and percentile are of the lengths of the
+            sampled values that are not empty, and are None if there are
+            none.  'exact' is the length of the
+            longest number in the table, or of the longest value for the
+            columns in 'whole_col_names', or None if there are none.
+
+        Raises;
+            NoConnectionError: If the database is not connected to.
+            sqlite3.OperationalError: If the table does not exist.
+        """
+        if not self._connection:
+            raise self._no_connect_err
+        exact_terms = []
+        for col_name in col_names:
+            other = 'length("{col}")'.format(col=col_name)\
+                    if col_name in whole_col_names else 'null'
+            exact_terms.append(
+                    'max(case typeof("{col}")'
+                    ' when \'integer\' then length("{col}")'
+                    ' when \'real\' then length(printf(\'%!.17g\', "{col}"))'
+                    ' else {other} end)'.format(col=col_name, other=other))
+        row = self.execute('select count(*), {terms} from "{table}"'.format(
+                               terms=', '.join(exact_terms),
+                               table=table_name))[0]
+        # Every step'th row is sampled, so that the sample is spread over
+        # the whole table, and not only its first rows.
+        step = max(row[0] // max(sample_size, 1), 1)
+        exact = row[1:]
+        terms = []
+        for col_name in col_names:
+            terms.append('max(length("{col}"))'.format(col=col_name))
+            # Empty values and NULLs are left out of the percentile, so
+            # that a column that is mostly empty is as wide as its values.
+            terms.append('(select length("{col}") from sample'
+                         ' where length("{col}") > 0'
+                         ' order by 1 limit 1 offset'
+                         ' (select count(*) from sample'
+                         ' where length("{col}") > 0) * {pct} / 100)'.format(
+                             col=col_name, pct=percentile))
+        statement = 'with sample as (select * from "{table}"'\
+                    ' where rowid % {step} = 0 limit {size})'\
+                    ' select {terms} from sample'.format(
+                        table=table_name,
+                        step=step,
+                        size=sample_size,
+                        terms=', '.join(terms))
+        row = self.execute(statement)[0]
+        return list(zip(row[0::2], row[1::2], exact))
+
+    def iter_value(self, table_name, col_name, rowid, chunk_size):
+        """Read a text or blob value a chunk at a time.
+
+        The value is read with sqlite's incremental blob I/O, so only
+        the chunks that are used are read from the database.  If the
+        value cannot be opened as a blob, such as when its table has no
+        rowid, then it is read in chunks with substr instead.
+
+        Args:
+            table_name (str): The name of the table.
+            col_name (str): The name of the value's column.
+            rowid (int): The rowid of the value's row.
+            chunk_size (int): The number of bytes to read at a time.
+                Text that is read with substr is read this many
+                characters at a time.
+
+        Returns:
+            A generator of strs if the value is text, or of bytes if it
+            is a blob.  Nothing is generated for other values.
+
+        Raises;
+            NoConnectionError: If the database is not connected to.
+            sqlite3.OperationalError: If the table or column does not
+                exist.
+        """
+        if not self._connection:
+            raise self._no_connect_err
+        rows = self.execute(
+                'select typeof("{col}") from "{table}" where rowid = {rowid}'.\
+                format(col=col_name, table=table_name, rowid=int(rowid)))
+        if (not rows) or (rows[0][0] not in ('text', 'blob')):
+            return
+        is_text = rows[0][0] == 'text'
+        try:
+            blob = self._connection.blobopen(table_name, col_name, rowid,
+                                             readonly=True)
+        except (AttributeError, sqlite3.OperationalError):
+            # blobopen is new in Python 3.11.
+            blob = None
+        if blob is None:
+            yield from self._iter_substr(table_name, col_name, rowid,
+                                         chunk_size)
+            return
+        if is_text:
+            encoding = self.execute('pragma encoding')[0][0]
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        with blob:
+            while True:
+                data = blob.read(chunk_size)
+                if not data:
+                    break
+                yield decoder.decode(data) if is_text else data
+        if is_text:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+
+    def _iter_substr(self, table_name, col_name, rowid, chunk_size):
+        """Same as iter_value, using substr instead of blob I/O."""
+        start = 1
+        while True:
+            rows = self.execute(
+                    'select substr("{col}", {start}, {size}) from "{table}"'
+                    ' where rowid = {rowid}'.format(col=col_name,
+                                                    start=start,
+                                                    size=chunk_size,
+                                                    table=table_name,
+                                                    rowid=int(rowid)))
+            if (not rows) or (not rows[0][0]):
+                return
+            yield rows[0][0]
+            start = start + chunk_size
+
     def select_all_from(self, table):
         """Return every row from the table.
 
@@ -121,10 +345,7 @@ class DBConnection:
             NoConnectionError: If the database is not connected to.
             sqlite3.OperationalError: If the table does not exist.
         """
-        if not self._connection:
-            raise self._no_connect_err
-        self._cursor.execute('select * from "{}"'.format(table))
-        return self._cursor.fetchall()
+        return self.execute('select * from "{}"'.format(table))
 
     def get_newest(self, table_name):
         """Deprecated."""
@@ -180,8 +401,127 @@ class DBConnection:
         """
         if not self._connection:
             raise self._no_connect_err
-        self._cursor.execute(statement)
-        return self._cursor.fetchall()
+        self._begin_statement()
+        try:
+            self._cursor.execute(statement)
+            rows = self._cursor.fetchall()
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        finally:
+            self._count_statement()
+        stats.Stats.count('db', 'rows read', len(rows))
+        return rows
+
+    def iter_pages(self, statement, page_size):
+        """Execute a statement and return its rows in pages.
+
+        The pages are fetched as they are needed, so the rows of the
+        first page can be used before the statement has finished.  If
+        the statement is cancelled, the pages that have already been
+        returned are still valid.
+
+        Args:
+            statement (str): The sqlite statement to execute.
+            page_size (int): The number of rows in each page.
+
+        Returns:
+            A generator of lists of tuples.  The tuples are the rows
+            from the result set.  Every page but the last one has
+            page_size rows.
+
+        Raises;
+            NoConnectionError: If the database is not connected to.
+            sqlite3.OperationalError: If 'statement' is not a legal
+                sqlite statement.
+            QueryCancelledError: If the statement was cancelled.
+        """
+        if not self._connection:
+            raise self._no_connect_err
+        # Use a cursor of its own so that other statements can run
+        # between pages.
+        cursor = self._connection.cursor()
+        self._begin_statement()
+        # The time that the pages are used is not the statement's.
+        elapsed = 0.0
+        start = time.perf_counter()
+        try:
+            cursor.execute(statement)
+            while True:
+                rows = cursor.fetchmany(page_size)
+                elapsed = elapsed + time.perf_counter() - start
+                if not rows:
+                    return
+                stats.Stats.count('db', 'rows read', len(rows))
+                yield rows
+                start = time.perf_counter()
+                if self._on_progress():
+                    self._raise_if_cancelled()
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        finally:
+            cursor.close()
+            stats.Stats.count('db', 'statements')
+            stats.Stats.observe('db', 'statement latency', elapsed)
+
+    def set_interrupt_check(self, check):
+        """Allow running statements to be cancelled.
+
+        While a statement runs, check is called every few milliseconds
+        with the number of seconds that the statement has been running.
+        If it returns True, the statement is interrupted and
+        QueryCancelledError is raised by the method that ran it.
+
+        Args:
+            check: The function to call, or None to make statements
+                uncancellable.
+        """
+        self._interrupt_check = check
+        if self._connection:
+            self._install_progress_handler()
+
+    def _install_progress_handler(self):
+        """Make sqlite call _on_progress while statements run."""
+        if self._interrupt_check is None:
+            self._connection.set_progress_handler(None, 0)
+        else:
+            self._connection.set_progress_handler(
+                    self._on_progress, performance.PROGRESS_HANDLER_STEPS)
+
+    def _begin_statement(self):
+        """Reset the cancellation state for a new statement."""
+        self._query_start = self._last_check = time.monotonic()
+        self._cancelled = False
+
+    def _count_statement(self):
+        """Count a statement that began with _begin_statement."""
+        stats.Stats.count('db', 'statements')
+        stats.Stats.observe('db', 'statement latency',
+                            time.monotonic() - self._query_start)
+
+    def _on_progress(self):
+        """Ask the interrupt check whether to cancel the statement.
+
+        Returns:
+            A true value if the statement should be interrupted.
+        """
+        if self._interrupt_check is None:
+            return 0
+        now = time.monotonic()
+        if now - self._last_check < performance.INTERRUPT_POLL_INTERVAL:
+            return 0
+        self._last_check = now
+        if self._interrupt_check(now - self._query_start):
+            self._cancelled = True
+            return 1
+        return 0
+
+    def _raise_if_cancelled(self):
+        """Raise QueryCancelledError if the statement was cancelled."""
+        if self._cancelled:
+            self._cancelled = False
+            raise QueryCancelledError(time.monotonic() - self._query_start)
 
     def commit(self):
         """Save changes applied to the database.
@@ -197,3 +537,4 @@ class DBConnection:
         if not self._connection:
             raise self._no_connect_err
         self._connection.commit()
+        stats.Stats.count('db', 'commits')
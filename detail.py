@@ -0,0 +1,247 @@
+"""Show every value of the current row in a pane.
+
+Cells only show the first characters of their values, and 'cc' puts a
+whole value in the one-line command line.  The detail pane shows every
+column of one row instead, with long values wrapped to the width of the
+screen.  It is drawn over the Table until it is closed.
+
+Text and blobs are read from the database one chunk at a time as the
+pane is scrolled, so a long note is only read as far as it is shown.
+
+Classes:
+    DetailPane: Show every value of one row.
+"""
+import curses
+import sqlite3
+import unicodedata
+import render
+import backend
+import keylog
+import settings.performance as performance
+import settings.positions as positions
+
+
+def _wrap(pieces, width):
+    """Split text into lines that fit in 'width' screen columns.
+
+    East Asian wide and fullwidth characters take two screen columns, and
+    combining marks take none.  Newlines start a new line, and other
+    characters that are not printable are shown as spaces.
+
+    Args:
+        pieces: An iterable of strs.  The text is their concatenation,
+            and a piece is only read once the lines before it are used.
+        width (int): The number of screen columns in a line.
+
+    Returns:
+        A generator of strs.
+    """
+    line = []
+    cols = 0
+    for piece in pieces:
+        for char in piece:
+            if char == '\n':
+                yield ''.join(line)
+                line = []
+                cols = 0
+                continue
+            if unicodedata.combining(char):
+                if line:
+                    line.append(char)
+                continue
+            if not char.isprintable():
+                char = ' '
+            char_width = 2 if unicodedata.east_asian_width(char) in ('W', 'F')\
+                    else 1
+            if cols + char_width > width:
+                yield ''.join(line)
+                line = []
+                cols = 0
+            line.append(char)
+            cols = cols + char_width
+    if line:
+        yield ''.join(line)
+
+
+class DetailPane:
+    """Show every value of one row.
+
+    The value of the current column is shown first, followed by the
+    values of the other columns in the order of the table.  Each value
+    is preceded by the name of its column.
+
+    Methods:
+        open: Show the pane until it is closed.
+    """
+    """
+    Private Attributes:
+        _lines ([(str, int)]): The lines that have been read so far, with
+            the curses attributes to draw them with.
+        _line_gen: The generator of the lines that have not been read.
+            It is None once every line has been read.
+        _top: The index of the first line that is visible.
+    """
+    def __init__(self, connection, table_name, col_names, rowid, cur_col):
+        """Initialize the pane.
+
+        Nothing is read from the database until the pane is opened.
+
+        Args:
+            connection (db.DBConnection): The database of the row.
+            table_name (str): The table of the row.
+            col_names ([str]): The names of the table's columns.
+            rowid (int): The rowid of the row.
+            cur_col (str): The name of the column to show first.
+        """
+        self._DB = connection
+        self._TABLE_NAME = table_name
+        self._ROWID = rowid
+        self._COL_NAMES = [cur_col] + [name for name in col_names
+                                       if name != cur_col]
+        self._lines = []
+        self._line_gen = None
+        self._top = 0
+        self._win = None
+
+    def open(self):
+        """Show the pane until q or Esc is pressed.
+
+        j and k scroll one line, Ctrl-f and Ctrl-b scroll one page, and g
+        and G go to the first and last line.  Going to the last line
+        reads every value in full.  If the screen is resized, then the
+        pane is closed so that the Table can be redrawn.
+        """
+        upper_left = positions.BROWSER_UPPER_LEFT_COORDS
+        bottom_right = positions.BROWSER_BOTTOM_RIGHT_COORDS
+        rows = bottom_right[0] - upper_left[0] + 1
+        cols = bottom_right[1] - upper_left[1] + 1
+        # The first line of the window is the title.
+        page = rows - 1
+        self._win = backend.BackendRegistry.get().newwin(rows, cols,
+                                                         *upper_left)
+        self._win.keypad(1)
+        # Leave the last screen column empty so that writing the bottom
+        # right corner cannot fail.
+        self._line_gen = self._generate_lines(cols - 1)
+        try:
+            while True:
+                self._read_lines(self._top + page)
+                self._draw(page)
+                render.RenderScheduler.flush()
+                key = self._win.getch()
+                if key == curses.KEY_RESIZE:
+                    # The Table reads and records it.
+                    backend.BackendRegistry.get().ungetch(key)
+                    return
+                render.RenderScheduler.mark_key()
+                keylog.KeyRecorderRegistry.record([key], 'detail')
+                if key in (ord('q'), 27):
+                    return
+                elif key in (ord('j'), curses.KEY_DOWN):
+                    self._scroll(self._top + 1, page)
+                elif key in (ord('k'), curses.KEY_UP):
+                    self._scroll(self._top - 1, page)
+                elif key == 6: # Ctrl-f
+                    self._scroll(self._top + page, page)
+                elif key == 2: # Ctrl-b
+                    self._scroll(self._top - page, page)
+                elif key == ord('g'):
+                    self._scroll(0, page)
+                elif key == ord('G'):
+                    self._read_lines()
+                    self._scroll(len(self._lines), page)
+        finally:
+            if self._line_gen is not None:
+                # Close the blob that is being read, if any.
+                self._line_gen.close()
+            self._win.keypad(0)
+
+    def _scroll(self, top, page):
+        """Make 'top' the first visible line, if there are lines below it.
+
+        Args:
+            top (int): The index of the line to show first.
+            page (int): The number of lines that are visible.
+        """
+        self._read_lines(top + page)
+        self._top = max(min(top, len(self._lines) - page), 0)
+
+    def _read_lines(self, count=None):
+        """Read lines until there are 'count' of them.
+
+        Args:
+            count (int): The number of lines to have, or None to read
+                every line.
+        """
+        while (self._line_gen is not None) and\
+                ((count is None) or (len(self._lines) < count)):
+            try:
+                self._lines.append(next(self._line_gen))
+            except StopIteration:
+                self._line_gen = None
+            except sqlite3.OperationalError as err:
+                # The row was changed or deleted while it was read.
+                self._lines.append(('Cannot read the row: {}'.format(err),
+                                    curses.A_NORMAL))
+                self._line_gen = None
+
+    def _generate_lines(self, width):
+        """Read the row and return its lines.
+
+        Numbers are read with the row.  Text and blobs are read one
+        chunk at a time as their lines are used.  Blobs are shown as
+        hexadecimal bytes.
+
+        Args:
+            width (int): The number of screen columns in a line.
+
+        Returns:
+            A generator of tuples (line, curses attribute).
+        """
+        terms = []
+        for col_name in self._COL_NAMES:
+            terms.append('typeof("{col}")'.format(col=col_name))
+            terms.append('case when typeof("{col}") in (\'text\', \'blob\')'
+                         ' then null else "{col}" end'.format(col=col_name))
+        rows = self._DB.execute(
+                'select {terms} from "{table}" where rowid = {rowid}'.format(
+                    terms=', '.join(terms),
+                    table=self._TABLE_NAME,
+                    rowid=int(self._ROWID)))
+        if not rows:
+            yield ('This row no longer exists.', curses.A_NORMAL)
+            return
+        row = rows[0]
+        for idx, col_name in enumerate(self._COL_NAMES):
+            value_type = row[2 * idx]
+            yield (col_name, curses.A_BOLD)
+            if value_type in ('text', 'blob'):
+                chunks = self._DB.iter_value(self._TABLE_NAME, col_name,
+                                             self._ROWID,
+                                             performance.DETAIL_CHUNK_SIZE)
+                if value_type == 'blob':
+                    chunks = (chunk.hex(' ') + ' ' for chunk in chunks)
+            elif value_type == 'null':
+                chunks = []
+            else:
+                chunks = [str(row[2 * idx + 1])]
+            for line in _wrap(chunks, width):
+                yield (line, curses.A_NORMAL)
+            yield ('', curses.A_NORMAL)
+
+    def _draw(self, page):
+        """Draw the title and the visible lines.
+
+        Args:
+            page (int): The number of lines that are visible.
+        """
+        self._win.erase()
+        title = '{table}: rowid {rowid}  (q to close)'.format(
+                table=self._TABLE_NAME, rowid=self._ROWID)
+        self._win.addnstr(0, 0, title, self._win.getmaxyx()[1] - 1,
+                          curses.A_REVERSE)
+        visible = self._lines[self._top : self._top + page]
+        for row, (line, attr) in enumerate(visible, 1):
+            self._win.addstr(row, 0, line, attr)
+        self._win.noutrefresh()
+        render.RenderScheduler.schedule()
@@ -15,9 +15,13 @@ class Prompt(enum.Enum):
         CONFIRM: Set the status bar to confirmation mode.  After
             writing a string to the status bar, the user will need to
             enter a 'y' or 'n'.
+        INFO: Set the status bar to information mode.  Any string
+            written to it is shown as is, such as the progress of a
+            background job.
     """
     ERROR = 1
     CONFIRM = 2
+    INFO = 3
 
 
 class Scroll(enum.Enum):
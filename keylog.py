@@ -0,0 +1,127 @@
+"""Record the keys that are pressed, to replay them later.
+
+When aniLog is started with --record-keys FILE, every key that it reads
+is written to FILE with the time that it was read, so that a real
+session can be replayed headless by benchmarks.replay and its latency
+measured.
+
+The file has one JSON object per line.  The first line has the size of
+the screen, {"lines": 24, "cols": 80}.  Every other line is a group of
+keys that were read together, such as Alt and a key:
+    time: The seconds since recording started.
+    keys: The keys, as ints.
+    type: What the keys do: the class of the Command that they run, such
+        as 'Scroll', ':' and the name of a command entered in the
+        command line, or 'cmd_line', 'prompt', 'detail', 'stats' or 'ls'
+        for other keys typed in the command line, a confirmation prompt,
+        the detail pane, the stats pane or a long list of Tables.  Keys
+        that do not complete a key sequence are 'none'.
+    lines, cols: The new size of the screen, for resizes only.
+
+Ctrl-C is a signal rather than a key, so it is not recorded.  Neither is
+Esc pressed to cancel a running query.
+
+Classes:
+    KeyRecorder: Write keys to a file.
+    KeyRecorderRegistry: Manage the key recorder.
+"""
+import curses
+import time
+import backend
+
+
+class KeyRecorder:
+    """Write keys to a file.
+
+    Methods:
+        record: Write a group of keys.
+        close: Close the file.
+    """
+    def __init__(self, path):
+        """Open the file and write the size of the screen.
+
+        Curses must have been started.
+
+        Args:
+            path (str): The file to write.  It is replaced if it exists.
+
+        Raises;
+            OSError: If the file cannot be opened.
+        """
+        self._file = open(path, 'w')
+        self._start = time.perf_counter()
+        self._write({'lines': curses.LINES, 'cols': curses.COLS})
+
+    def record(self, keys, kind):
+        """Write a group of keys.
+
+        Args:
+            keys ([int]): The keys that were read together.
+            kind (str): What the keys do.  See the module docstring.
+        """
+        entry = {
+            'time': round(time.perf_counter() - self._start, 4),
+            'keys': keys,
+            'type': kind,
+            }
+        if curses.KEY_RESIZE in keys:
+            # The Resize command has not updated the size yet.
+            backend.BackendRegistry.get().update_lines_cols()
+            entry['lines'] = curses.LINES
+            entry['cols'] = curses.COLS
+        self._write(entry)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def _write(self, obj):
+        # Imported here, so that it is only imported while recording.
+        import json
+        # Flushed at once so that a crash keeps the keys that led to it.
+        self._file.write(json.dumps(obj) + '\n')
+        self._file.flush()
+
+
+class KeyRecorderRegistry:
+    """Manage the key recorder.
+
+    This class provides static methods to start and stop recording keys.
+    Nothing is recorded unless create has been called.
+
+    Methods:
+        get: Return the key recorder.
+        create: Start recording keys.
+        record: Record a group of keys if keys are being recorded.
+        destroy: Stop recording keys.
+    """
+    _recorder = None
+
+    @staticmethod
+    def get():
+        """Return the key recorder, or None if keys are not recorded."""
+        return KeyRecorderRegistry._recorder
+
+    @staticmethod
+    def create(path):
+        """Start recording keys to a file.
+
+        Raises;
+            OSError: If the file cannot be opened.
+        """
+        if KeyRecorderRegistry._recorder is None:
+            KeyRecorderRegistry._recorder = KeyRecorder(path)
+        return KeyRecorderRegistry._recorder
+
+    @staticmethod
+    def record(keys, kind):
+        """Same as KeyRecorder.record, if keys are being recorded."""
+        if KeyRecorderRegistry._recorder is not None:
+            KeyRecorderRegistry._recorder.record(keys, kind)
+
+    @staticmethod
+    def destroy():
+        """Stop recording keys."""
+        if KeyRecorderRegistry._recorder is not None:
+            KeyRecorderRegistry._recorder.close()
+            KeyRecorderRegistry._recorder = None
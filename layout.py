@@ -0,0 +1,102 @@
+"""Decide how wide each column of a table is drawn.
+
+Column widths used to be a fixed list in the settings, which only fit
+tables with exactly that many columns.  They are now computed from the
+lengths of the values in each table, which sqlite measures over a sample
+of rows spread over the whole table.  Short columns are as wide as their
+longest value, and columns with long values, such as notes, are as wide
+as most of their values.  Numbers and primary keys are never cut, so
+their columns are as wide as their longest value in the whole table.
+
+Measuring a table takes two queries, so the widths are remembered for as
+long as the database schema does not change.
+
+Classes:
+    LayoutCache: Compute and remember the column widths of tables.
+"""
+import stats
+import settings.performance as performance
+import settings.positions as positions
+
+
+class LayoutCache:
+    """Compute and remember the column widths of tables.
+
+    This class provides static methods to get the column widths of a
+    table.  The widths of each table are computed once per version of
+    its database's schema.
+
+    Methods:
+        get_widths: Return the column widths of a table.
+        set_widths: Remember the column widths of a table.
+    """
+    _layouts = {}
+
+    @staticmethod
+    def get_widths(connection, db_name, table_name, col_names):
+        """Return the column widths of a table.
+
+        Args:
+            connection (db.DBConnection): A connection to the database.
+            db_name (str): The name of the database.
+            table_name (str): The name of the table.
+            col_names ([str]): The names of the table's columns.
+
+        Returns:
+            A list with the width of each column, in screen columns.
+
+        Raises;
+            NoConnectionError: If the database is not connected to.
+            sqlite3.OperationalError: If the table does not exist.
+        """
+        key = (db_name, table_name)
+        version = connection.get_schema_version()
+        cached = LayoutCache._layouts.get(key)
+        if (cached is not None) and (cached[0] == version):
+            stats.Stats.count('caches', 'layout hits')
+            return cached[1]
+        stats.Stats.count('caches', 'layout misses')
+        # The first column is the primary key.
+        length_stats = connection.get_length_stats(table_name, col_names,
+                                            positions.COL_WIDTH_PERCENTILE,
+                                            performance.LAYOUT_SAMPLE_ROWS,
+                                            col_names[: 1])
+        widths = [LayoutCache._get_width(longest, typical, exact)
+                  for longest, typical, exact in length_stats]
+        LayoutCache._layouts[key] = (version, widths)
+        return widths
+
+    @staticmethod
+    def set_widths(db_name, table_name, version, widths):
+        """Remember the column widths of a table.
+
+        Use this for widths that were computed before, such as those of
+        a warm cache snapshot, so that the table is not measured again.
+
+        Args:
+            db_name (str): The name of the database.
+            table_name (str): The name of the table.
+            version (int): The version of the database's schema that the
+                widths were computed for.
+            widths ([int]): The width of each column.
+        """
+        LayoutCache._layouts[(db_name, table_name)] = (version, widths)
+
+    @staticmethod
+    def _get_width(longest, typical, exact):
+        """Return the width of a column.
+
+        Args:
+            longest (int): The length of the longest sampled value, or
+                None if there were no values.
+            typical (int): The percentile of the sampled lengths.
+            exact (int): The length of the longest value that must not
+                be cut, or None if there is none.
+        """
+        if longest is None:
+            width = positions.MIN_COL_WIDTH
+        elif longest <= positions.MAX_COL_WIDTH:
+            width = longest
+        else:
+            width = min(typical or 0, positions.MAX_COL_WIDTH)
+        return max(width, exact or 0, positions.MIN_COL_WIDTH)
@@ -0,0 +1,181 @@
+"""Profile a live session.
+
+':profile start' turns cProfile on for the input thread, and
+':profile stop FILE' turns it off, writes the profile to FILE and shows
+the functions that took the most time in the status bar.  FILE can be
+read with pstats or a viewer such as snakeviz:
+    $ python -m pstats FILE
+
+':memprofile start' and ':memprofile stop FILE' do the same for memory
+with tracemalloc.  FILE is a snapshot of the memory that was allocated
+while tracing and is still in use, which can be read with
+tracemalloc.Snapshot.load.  The status bar shows the lines that
+allocated the most of it.
+
+cProfile only profiles the thread that turned it on, so background
+jobs, such as pastes and 'clone!', are not in the profile.  tracemalloc
+traces every thread.
+
+cProfile, pstats and tracemalloc are imported when they are first used,
+since pstats alone takes about 15 milliseconds to import.
+
+Classes:
+    ProfilerError: Error for starting or stopping a profiler twice.
+    Profiler: Turn cProfile and tracemalloc on and off.
+"""
+import os
+import settings.performance as performance
+
+
+class ProfilerError(Exception):
+    """Error for starting or stopping a profiler twice."""
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def _get_location(filename, line):
+    """Return a short location, such as 'browser.py:461'."""
+    return '{}:{}'.format(os.path.basename(filename), line)
+
+
+def _get_function_str(filename, line, func):
+    """Return a function of a profile, such as 'browser.py:461(_draw_rows)'.
+
+    Built-in functions have no file, so only their names are returned.
+    """
+    if filename == '~':
+        return func
+    return '{}({})'.format(_get_location(filename, line), func)
+
+
+def _get_size_str(size):
+    """Return a number of bytes in B, KiB or MiB."""
+    if size < 1024:
+        return '{}B'.format(size)
+    if size < 1024 * 1024:
+        return '{:.1f}KiB'.format(size / 1024)
+    return '{:.1f}MiB'.format(size / (1024 * 1024))
+
+
+class Profiler:
+    """Turn cProfile and tracemalloc on and off.
+
+    This class provides static methods to profile the time and the
+    memory of the session between two commands.
+
+    Methods:
+        start: Start profiling the time of the input thread.
+        stop: Stop profiling time and write the profile.
+        start_memory: Start tracing memory allocations.
+        stop_memory: Stop tracing memory and write a snapshot.
+    """
+    _profile = None
+
+    @staticmethod
+    def start():
+        """Start profiling the time of the input thread.
+
+        Raises;
+            ProfilerError: If the profiler is already running.
+        """
+        if Profiler._profile is not None:
+            raise ProfilerError('The profiler is already running.')
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as err:
+            # Another profiler, such as python -m cProfile, is running.
+            raise ProfilerError(str(err))
+        Profiler._profile = profile
+
+    @staticmethod
+    def stop(path):
+        """Stop profiling time and write the profile to a file.
+
+        Args:
+            path (str): The file to write, for pstats.
+
+        Returns:
+            A summary with the total time and the PROFILE_SUMMARY_SIZE
+            functions that took the most time of their own.
+
+        Raises;
+            ProfilerError: If the profiler is not running.
+            OSError: If the file cannot be written.  The profiler is
+                stopped anyway.
+        """
+        if Profiler._profile is None:
+            raise ProfilerError('The profiler is not running.')
+        profile = Profiler._profile
+        Profiler._profile = None
+        profile.disable()
+        profile.dump_stats(path)
+        import pstats
+        profile_stats = pstats.Stats(profile)
+        # Each value is (calls, primitive calls, own time, total time,
+        # callers).
+        top = sorted(profile_stats.stats.items(),
+                     key=lambda item: item[1][2], reverse=True)
+        top = top[: performance.PROFILE_SUMMARY_SIZE]
+        return 'Wrote {}: {:.2f}s in {} calls; {}'.format(
+                path, profile_stats.total_tt, profile_stats.total_calls,
+                ', '.join('{} {:.3f}s'.format(_get_function_str(*func),
+                                              values[2])
+                          for func, values in top))
+
+    @staticmethod
+    def start_memory():
+        """Start tracing memory allocations.
+
+        Each allocation keeps PROFILE_MEMORY_FRAMES frames of its
+        traceback.
+
+        Raises;
+            ProfilerError: If memory is already being traced.
+        """
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            raise ProfilerError('Memory is already being traced.')
+        tracemalloc.start(performance.PROFILE_MEMORY_FRAMES)
+
+    @staticmethod
+    def stop_memory(path):
+        """Stop tracing memory and write a snapshot to a file.
+
+        Args:
+            path (str): The file to write, for tracemalloc.Snapshot.load.
+
+        Returns:
+            A summary with the memory traced and the PROFILE_SUMMARY_SIZE
+            lines that allocated the most of it.
+
+        Raises;
+            ProfilerError: If memory is not being traced.
+            OSError: If the file cannot be written.  Tracing is stopped
+                anyway.
+        """
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            raise ProfilerError('Memory is not being traced.')
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+        snapshot.dump(path)
+        statistics = snapshot.statistics('lineno')
+        top = statistics[: performance.PROFILE_SUMMARY_SIZE]
+        return 'Wrote {}: {} in {} blocks; {}'.format(
+                path, _get_size_str(sum(stat.size for stat in statistics)),
+                sum(stat.count for stat in statistics),
+                ', '.join('{} {}'.format(
+                              _get_location(stat.traceback[0].filename,
+                                            stat.traceback[0].lineno),
+                              _get_size_str(stat.size))
+                          for stat in top))
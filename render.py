@@ -0,0 +1,162 @@
+"""Update the screen once per key.
+
+Every widget used to refresh the terminal as soon as it changed, so a
+single key could update the terminal several times, for example once for
+the table and once for the status bar.  Widgets now copy their changes to
+curses' virtual screen with noutrefresh and schedule an update.  The
+input loop flushes the scheduled update once the key has been handled,
+and curses sends only the lines that changed since the last update.
+
+Code that draws while it waits for something other than the input loop,
+such as a prompt or a query that is still reading rows, flushes the
+update itself.
+
+Code that reads a key marks it with RenderScheduler.mark_key.  The
+latency of a key is the time from its mark until the input loop has
+flushed the update that it caused, and is shown by the status bar's
+latency HUD.
+
+Only one Table is visible at a time, so Tables do not keep pads of their
+own.  The visible Table borrows a pad the size of the screen from a pool
+and gives it back when another Table is shown.  Likewise, widgets move
+and resize their windows when the screen is resized instead of creating
+new ones.
+
+Classes:
+    RenderScheduler: Batch the screen updates of all widgets.
+    PadPool: Lend pads to the widgets that are visible.
+
+Functions:
+    place_window: Resize and move a window.
+"""
+import time
+import backend
+import stats
+import settings.performance as performance
+
+
+def place_window(win, rows, cols, beg_row, beg_col):
+    """Resize and move a window.
+
+    The window is resized before it is moved, because curses refuses to
+    move a window to where it would not fit in the screen.
+
+    Args:
+        win: The curses window.
+        rows (int): The number of rows of the window.
+        cols (int): The number of columns of the window.
+        beg_row (int): The screen row of the upper left corner.
+        beg_col (int): The screen column of the upper left corner.
+    """
+    win.resize(rows, cols)
+    win.mvwin(beg_row, beg_col)
+
+
+class RenderScheduler:
+    """Batch the screen updates of all widgets.
+
+    This class provides static methods to schedule and flush screen
+    updates.
+
+    Methods:
+        schedule: Ask for the screen to be updated.
+        flush: Update the screen if an update was scheduled.
+        mark_key: Remember when a key was read.
+        end_key: Return the latency of the key that was read last.
+    """
+    _pending = False
+    _key_time = None
+
+    @staticmethod
+    def schedule():
+        """Ask for the screen to be updated.
+
+        Call this after calling noutrefresh on a window or pad.
+        """
+        RenderScheduler._pending = True
+        stats.Stats.count('screen', 'refreshes scheduled')
+
+    @staticmethod
+    def flush():
+        """Update the screen if an update was scheduled.
+
+        Returns:
+            True if the screen was updated.
+        """
+        if not RenderScheduler._pending:
+            return False
+        RenderScheduler._pending = False
+        start = time.perf_counter()
+        backend.BackendRegistry.get().doupdate()
+        stats.Stats.count('screen', 'terminal updates')
+        stats.Stats.observe('screen', 'terminal update latency',
+                            time.perf_counter() - start)
+        return True
+
+    @staticmethod
+    def mark_key():
+        """Remember when a key was read.
+
+        Call this as soon as a key is read, wherever it is read, so that
+        the key that ends a command, such as Enter in the command line,
+        starts its latency.
+        """
+        RenderScheduler._key_time = time.perf_counter()
+
+    @staticmethod
+    def end_key():
+        """Return the latency of the key that was read last.
+
+        The input loop calls this once it has flushed the update of a
+        key.  The key is then forgotten.
+
+        Returns:
+            The seconds since the key was marked, or None if no key has
+            been marked since the last call.
+        """
+        if RenderScheduler._key_time is None:
+            return None
+        latency = time.perf_counter() - RenderScheduler._key_time
+        RenderScheduler._key_time = None
+        return latency
+
+
+class PadPool:
+    """Lend pads to the widgets that are visible.
+
+    This class provides static methods to borrow pads and give them
+    back.  A pad that is given back is kept to be lent again, so that
+    switching Tables does not allocate a new pad.
+
+    Methods:
+        borrow: Return a pad of the given size.
+        give_back: Return a pad to the pool.
+    """
+    _free = []
+
+    @staticmethod
+    def borrow(rows, cols):
+        """Return a blank pad of the given size.
+
+        Args:
+            rows (int): The number of rows of the pad.
+            cols (int): The number of columns of the pad.
+        """
+        if not PadPool._free:
+            stats.Stats.count('caches', 'pad pool misses')
+            return backend.BackendRegistry.get().newpad(rows, cols)
+        stats.Stats.count('caches', 'pad pool hits')
+        pad = PadPool._free.pop()
+        pad.resize(rows, cols)
+        pad.erase()
+        return pad
+
+    @staticmethod
+    def give_back(pad):
+        """Return a pad to the pool.
+
+        The pad must not be used after this.  At most PAD_POOL_SIZE pads
+        are kept, and any others are freed.
+        """
+        if len(PadPool._free) < performance.PAD_POOL_SIZE:
+            PadPool._free.append(pad)
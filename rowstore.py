@@ -0,0 +1,201 @@
+"""Store rows with dictionary-encoded columns.
+
+Columns such as the studio, the genres and the air date repeat a few
+values across thousands of rows, but sqlite returns a new object for
+every cell.  A RowStore keeps one copy of each distinct value of a
+column, and an array with the index of the value of each row, so a
+repeated value costs a few bytes instead of a whole object.
+
+Columns whose values are mostly distinct, such as the primary key or the
+name, gain nothing from this.  They are stored as plain lists once
+enough rows show that they are.
+
+Classes:
+    RowStore: A list of rows with dictionary-encoded columns.
+"""
+import array
+import sys
+import settings.performance as performance
+
+
+class _Column:
+    """The values of one column of a RowStore.
+
+    While the column is encoded, values holds each distinct value once,
+    codes holds the index in values of each row's value, and lookup maps
+    each distinct value to its index.  Once the column is decoded, values
+    holds each row's value, and codes and lookup are None.
+
+    Values are looked up by type and value, so that 1, 1.0 and True are
+    kept apart.
+    """
+    def __init__(self):
+        self.values = []
+        self.codes = array.array('I')
+        self.lookup = {}
+        self.value_bytes = 0
+
+    def __len__(self):
+        if self.lookup is None:
+            return len(self.values)
+        return len(self.codes)
+
+    def append(self, value):
+        """Add a value to the end of the column."""
+        if self.lookup is None:
+            self.values.append(value)
+            self.value_bytes = self.value_bytes + sys.getsizeof(value)
+            return
+        self.codes.append(self._encode(value))
+        distinct = len(self.values)
+        if (distinct > performance.DICTIONARY_MIN_VALUES) and\
+                (distinct > len(self.codes) *
+                     performance.DICTIONARY_MAX_DISTINCT):
+            self.decode()
+
+    def get(self, idx):
+        """Return the value of a row."""
+        if self.lookup is None:
+            return self.values[idx]
+        return self.values[self.codes[idx]]
+
+    def set(self, idx, value):
+        """Change the value of a row.
+
+        The old value stays in the dictionary of an encoded column.
+        """
+        if self.lookup is None:
+            self.value_bytes = self.value_bytes -\
+                    sys.getsizeof(self.values[idx]) + sys.getsizeof(value)
+            self.values[idx] = value
+        else:
+            self.codes[idx] = self._encode(value)
+
+    def pop(self, idx):
+        """Remove the value of a row."""
+        if self.lookup is None:
+            self.value_bytes = self.value_bytes -\
+                    sys.getsizeof(self.values.pop(idx))
+        else:
+            self.codes.pop(idx)
+
+    def iter_values(self):
+        """Return an iterator over the value of each row."""
+        if self.lookup is None:
+            return iter(self.values)
+        return map(self.values.__getitem__, self.codes)
+
+    def decode(self):
+        """Store the value of each row as a plain list.
+
+        The values themselves are shared, so this does not change how
+        many bytes they take.
+        """
+        self.values = list(self.iter_values())
+        self.codes = None
+        self.lookup = None
+
+    def get_memory_usage(self):
+        """Return an estimate of the bytes used by the column."""
+        usage = sys.getsizeof(self.values) + self.value_bytes
+        if self.lookup is not None:
+            usage = usage + self.codes.itemsize * len(self.codes) +\
+                    sys.getsizeof(self.lookup) +\
+                    len(self.lookup) * sys.getsizeof((None, None))
+        return usage
+
+    def _encode(self, value):
+        """Return the index of a value, adding it if it is new."""
+        key = (value.__class__, value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = len(self.values)
+            self.lookup[key] = code
+            self.values.append(value)
+            self.value_bytes = self.value_bytes + sys.getsizeof(value)
+        return code
+
+
+class RowStore:
+    """A list of rows with dictionary-encoded columns.
+
+    Rows are tuples that all have the same number of elements.  A
+    RowStore supports len, iteration, indexing and slicing like a list
+    of tuples, and returns its rows as tuples.
+
+    Methods:
+        append: Add a row to the end.
+        extend: Add rows to the end.
+        pop: Remove a row and return it.
+        clear: Remove every row.
+        get_memory_usage: Return an estimate of the bytes used.
+    """
+    def __init__(self, rows=()):
+        """Initialize the store.
+
+        Args:
+            rows ([tuples]): The rows to store.
+        """
+        self._cols = []
+        self._row_count = 0
+        self.extend(rows)
+
+    def __len__(self):
+        return self._row_count
+
+    def __iter__(self):
+        return zip(*(col.iter_values() for col in self._cols))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[row_idx]
+                    for row_idx in range(*idx.indices(self._row_count))]
+        return tuple(col.get(idx) for col in self._cols)
+
+    def __setitem__(self, idx, row):
+        for col, value in zip(self._cols, row):
+            col.set(idx, value)
+
+    def append(self, row):
+        """Add a row to the end.
+
+        Args:
+            row (tuple): The row to add.  It must have as many elements
+                as the other rows.
+        """
+        if not self._cols:
+            self._cols = [_Column() for value in row]
+        for col, value in zip(self._cols, row):
+            col.append(value)
+        self._row_count = self._row_count + 1
+
+    def extend(self, rows):
+        """Add rows to the end.
+
+        Args:
+            rows ([tuples]): The rows to add.
+        """
+        for row in rows:
+            self.append(row)
+
+    def pop(self, idx=-1):
+        """Remove a row and return it.
+
+        Raises:
+            IndexError: If there is no such row.
+        """
+        row = self[idx]
+        for col in self._cols:
+            col.pop(idx)
+        self._row_count = self._row_count - 1
+        return row
+
+    def clear(self):
+        """Remove every row."""
+        self._cols = []
+        self._row_count = 0
+
+    def get_memory_usage(self):
+        """Return an estimate of the bytes used by the rows."""
+        return sys.getsizeof(self) +\
+               sum(col.get_memory_usage() for col in self._cols)
@@ -1,9 +1,42 @@
+import collections.abc
+import functools
 import commands
 import keymap
 import enums
 import signals
 
 
+class _LazyCommandMap(collections.abc.Mapping):
+    """A read-only dict of Commands that constructs each on first use.
+
+    Most commands, such as 'mksession' or 'profile', are never used in a
+    session, so they are not constructed on startup.  Their names are
+    still known, for tab completion.
+    """
+    def __init__(self, factories):
+        """Constructor.
+
+        Args:
+            factories: A dict from command names to functions that
+                construct the commands.
+        """
+        self._factories = factories
+        self._commands = {}
+
+    def __getitem__(self, name):
+        cmd = self._commands.get(name)
+        if cmd is None:
+            cmd = self._factories[name]()
+            self._commands[name] = cmd
+        return cmd
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+
 class CommandMap:
     cmd_map = {}
 
@@ -11,32 +44,41 @@ class CommandMap:
     def get():
         if CommandMap.cmd_map:
             return CommandMap.cmd_map
-        clone_cmd = commands.Clone('', '')
-        CommandMap.cmd_map = {
-            'filter': commands.Filter('', ''),
-            'update': commands.Update('', ''),
-            'increment': commands.Increment('', ''),
-            'new_entry': commands.Insert('', ''),
-            'del_entry': commands.Delete('', ''),
-            'sort': commands.Sort('', ''),
-            'next_browser': commands.NextBrowser('', ''),
-            'prev_browser': commands.PreviousBrowser('', ''),
-            'resize': commands.Resize('', ''),
-            'edit': commands.Edit('', ''),
-            'select': commands.Select('', ''),
-            'ls': commands.ShowBuffers('', ''),
-            'clone': clone_cmd,
-            'clone!': clone_cmd,
-            'bd': commands.RemoveTable('', ''),
-            'b': commands.SwitchTable('', ''),
-            'b#': commands.SwitchTable('', ''),
-            'mksession': commands.SaveSession('', ''),
-            'ldsession': commands.LoadSession('', ''),
-            'paste': commands.Paste('', ''),
-            'del_char': commands.SendSignal(signals.Signal.DELETE_CHAR,'',''),
-            'press_enter': commands.SendSignal(signals.Signal.PRESS_ENTER,
-                                               '', ''),
-            }
+        CommandMap.cmd_map = _LazyCommandMap({
+            'filter': functools.partial(commands.Filter, '', ''),
+            'update': functools.partial(commands.Update, '', ''),
+            'increment': functools.partial(commands.Increment, '', ''),
+            'new_entry': functools.partial(commands.Insert, '', ''),
+            'del_entry': functools.partial(commands.Delete, '', ''),
+            'sort': functools.partial(commands.Sort, '', ''),
+            'next_browser': functools.partial(commands.NextBrowser, '', ''),
+            'prev_browser': functools.partial(commands.PreviousBrowser, '',
+                                              ''),
+            'resize': functools.partial(commands.Resize, '', ''),
+            'edit': functools.partial(commands.Edit, '', ''),
+            'select': functools.partial(commands.Select, '', ''),
+            'ls': functools.partial(commands.ShowBuffers, '', ''),
+            'clone': functools.partial(commands.Clone, '', ''),
+            # The same Command as 'clone'.
+            'clone!': lambda: CommandMap.cmd_map['clone'],
+            'bd': functools.partial(commands.RemoveTable, '', ''),
+            'b': functools.partial(commands.SwitchTable, '', ''),
+            'b#': functools.partial(commands.SwitchTable, '', ''),
+            'mksession': functools.partial(commands.SaveSession, '', ''),
+            'ldsession': functools.partial(commands.LoadSession, '', ''),
+            'paste': functools.partial(commands.Paste, '', ''),
+            'cancel': functools.partial(commands.Cancel, '', ''),
+            'detail': functools.partial(commands.ShowDetail, '', ''),
+            'stats': functools.partial(commands.ShowStats, '', ''),
+            'profile': functools.partial(commands.Profile, '', ''),
+            'memprofile': functools.partial(commands.ProfileMemory, '', ''),
+            'hud': functools.partial(commands.ToggleHUD, '', ''),
+            'del_char': functools.partial(commands.SendSignal,
+                                          signals.Signal.DELETE_CHAR, '', ''),
+            'press_enter': functools.partial(commands.SendSignal,
+                                             signals.Signal.PRESS_ENTER, '',
+                                             ''),
+            })
         return CommandMap.cmd_map
 
 
@@ -112,4 +154,5 @@ class KeyMap:
         KeyMap.key_map.add_key('<Rsz>', cmd_map['resize'])
         KeyMap.key_map.add_key('v', cmd_map['select'])
         KeyMap.key_map.add_key('++', cmd_map['increment'])
+        KeyMap.key_map.add_key('K', cmd_map['detail'])
         return KeyMap.key_map
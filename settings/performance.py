@@ -0,0 +1,88 @@
+# Performance settings
+# Background jobs
+# Number of rows written between commits by background jobs.  Each commit
+# is shown in the table as soon as it is made.
+JOB_BATCH_SIZE = 500
+# Milliseconds to wait for a key before checking on background jobs.
+JOB_POLL_INTERVAL = 100
+# Seconds a worker waits for a locked database before giving up.
+WORKER_BUSY_TIMEOUT = 30
+# Seconds that a command waits for a Job of one batch, such as an edit,
+# before leaving it to run in the background.  The keyboard is blocked
+# while it waits.
+RUN_NOW_TIMEOUT = 0.2
+# Seconds to wait for the worker threads when quitting.
+WORKER_SHUTDOWN_TIMEOUT = 2
+# Queries
+# Number of rows fetched at a time when a table is loaded.  Each page is
+# shown as soon as it arrives.
+QUERY_PAGE_SIZE = 1000
+# Number of sqlite instructions between checks for Esc or Ctrl-C while a
+# query runs.
+PROGRESS_HANDLER_STEPS = 10000
+# Minimum seconds between two checks for Esc or Ctrl-C.
+INTERRUPT_POLL_INTERVAL = 0.05
+# Seconds a query runs before its elapsed time is shown in the status bar.
+QUERY_STATUS_DELAY = 0.5
+# Memory
+# Estimated bytes of memory that the rows and pads of all open tables may
+# use.  When this is exceeded, the tables that were shown least recently
+# are unloaded, and are read again when they are next shown.
+BROWSER_MEMORY_BUDGET = 256 * 1024 * 1024
+# Number of unused pads that are kept to be reused.  Only the visible table
+# and the 'ls' list use a pad.
+PAD_POOL_SIZE = 2
+# Estimated bytes used by one character cell of a pad.
+PAD_CELL_BYTES = 28
+# Estimated bytes used to remember the primary key of one row.
+PRIMARY_KEY_BYTES = 36
+# Columns keep one copy of each distinct value, and a small index per row.
+# A column is stored plainly instead once it has more than
+# DICTIONARY_MIN_VALUES distinct values and more distinct values than
+# DICTIONARY_MAX_DISTINCT times its number of rows, like a primary key.
+DICTIONARY_MIN_VALUES = 256
+DICTIONARY_MAX_DISTINCT = 0.5
+# Kibibytes of sqlite page cache for each database.  Unloaded tables are
+# read again from this cache instead of from disk when it is big enough.
+DB_CACHE_SIZE = 64 * 1024
+# Rendering
+# Number of rows, spread over the whole table, whose lengths are measured
+# to compute column widths.  Numbers are measured in every row.
+LAYOUT_SAMPLE_ROWS = 1000
+# Number of formatted lines that each Table keeps, so that the rows next to
+# the cursor and the last pages are not formatted again when they are drawn.
+LINE_CACHE_ROWS = 500
+# Number of fitted cell values to remember.  Only values that are not plain
+# ASCII, such as Japanese titles, are remembered.
+FIT_CACHE_SIZE = 4096
+# Number of bytes of a long value that the detail pane reads at a time.
+DETAIL_CHUNK_SIZE = 4096
+# Milliseconds without a resize before the screen is laid out again.  While
+# a terminal corner is dragged, only the final size is laid out.
+RESIZE_DEBOUNCE_INTERVAL = 100
+# Number of recent keys whose latencies the status bar's latency HUD
+# computes the 95th percentile of.
+LATENCY_HUD_KEYS = 100
+# Prefetching
+# Number of rows read in the background from each table next to the
+# current one (gt, gT and b#), so that switching to it shows them at once.
+PREFETCH_ROWS = 200
+# Most rows of each table that ':mksession' saves to the session's warm
+# cache, to be drawn at once by ':ldsession'.  Tables scrolled further down
+# are drawn once their rows have been read.
+WARM_CACHE_ROWS = 1000
+# Tracing
+# Bytes that an SQL trace file or slow query log may reach before it is
+# rotated, and the number of rotated files that are kept of each.
+SQL_TRACE_MAX_BYTES = 10 * 1024 * 1024
+SQL_TRACE_BACKUPS = 3
+# Milliseconds that a statement runs before it is written to the slow query
+# log, with its query plan.
+SLOW_QUERY_THRESHOLD = 100
+# Profiling
+# Number of functions or lines that ':profile stop' and ':memprofile stop'
+# show in the status bar.
+PROFILE_SUMMARY_SIZE = 3
+# Number of frames of each allocation's traceback that ':memprofile' keeps.
+# More frames show where allocations come from, but use more memory.
+PROFILE_MEMORY_FRAMES = 10
@@ -4,4 +4,17 @@ SCREEN_BOTTOM = 2
 # Load settings
 # Sizes and position settings
 STATUS_BAR_POSITION = SCREEN_BOTTOM
-COL_WIDTHS = [3,20,4,4,10,10,3,10,20]
+# Show the latency of the last key and the row count of the current table at
+# the right of the status bar.  ':hud' shows or hides it.
+LATENCY_HUD = False
+# Column widths are computed from the lengths of the values in each table.
+# A column is as wide as its longest value if that fits in MAX_COL_WIDTH.
+# Otherwise, it is as wide as the COL_WIDTH_PERCENTILE'th percentile of the
+# lengths, up to MAX_COL_WIDTH.
+MIN_COL_WIDTH = 3
+MAX_COL_WIDTH = 30
+COL_WIDTH_PERCENTILE = 90
+# Number of leading columns, such as the primary key and the name, that stay
+# on the screen when a table is scrolled horizontally.  Fewer columns are
+# pinned if they would take more than half of the screen.
+PINNED_COLUMNS = 2
@@ -28,10 +28,12 @@ class DBRegistry:
     Methods:
         get: Return a database connection.
         create: Create a database connection.
+        set_interrupt_check: Allow statements to be cancelled.
         destroy: Close a database connection.
         destroy_add: Close all database connections.
     """
     _db_map = {}
+    _interrupt_check = None
 
     @staticmethod
     def create(name):
@@ -46,9 +48,22 @@ class DBRegistry:
             The database connection.
         """
         if name not in DBRegistry._db_map:
-            DBRegistry._db_map[name] = db.DBConnection(name)
+            connection = db.DBConnection(name)
+            connection.set_interrupt_check(DBRegistry._interrupt_check)
+            DBRegistry._db_map[name] = connection
         return DBRegistry._db_map[name]
 
+    @staticmethod
+    def set_interrupt_check(check):
+        """Allow the statements of all connections to be cancelled.
+
+        Args:
+            check: See DBConnection's set_interrupt_check method.
+        """
+        DBRegistry._interrupt_check = check
+        for connection in DBRegistry._db_map.values():
+            connection.set_interrupt_check(check)
+
     @staticmethod
     def get_db(name):
         """Return a database connection.
@@ -89,7 +104,8 @@ class CopyBuffer:
 
     This class provides static methods to access and modify the copy
     buffers. The copy buffer is a map from a single character
-    (English alphabet, upper or lower case) to a list of tuples.
+    (English alphabet, upper or lower case) to a rowstore.RowStore,
+    which stores repeated values, such as studios, only once.
     Use this class to copy rows from one table into another table
     (provided both have the same schema).
 
@@ -109,9 +125,10 @@ class CopyBuffer:
 
         Args:
             key (char): The name of the buffer.
-            val ([tuple]): The new content of the buffer.  Each tuple
-                is a row in a database table, and each tuple element
-                is a column's value.
+            val (rowstore.RowStore): The new content of the buffer.
+                Each row is a row in a database table, and each row
+                element is a column's value.  A list of tuples can be
+                given instead.
         """
         CopyBuffer._copy_buffer[key] = val
 
@@ -123,8 +140,9 @@ class CopyBuffer:
             key: The name of the buffer.
 
         Returns:
-            A list of tuples.  Each tuple is a row in a database table,
-            and each tuple element is a column's value.
+            A rowstore.RowStore, or a list of tuples.  Each row is a
+            row in a database table, and each row element is a
+            column's value.
 
         Raises:
             KeyError: if no buffer with the given name exists.
@@ -6,6 +6,7 @@ Classes:
     Observer: Interace for a class that receives signals.
 """
 import enum
+import stats
 
 
 # TODO: rename BROWSER_SWITCHED to TABLE_SWITCHED.
@@ -76,6 +77,7 @@ class Subject:
                 enumerations in Signal.
             args: The arguments to send to the observers.
         """
+        stats.Stats.count('signals', str(signal))
         for observer in self._observers:
             observer.receive_signal(signal, args)
 
@@ -0,0 +1,401 @@
+"""Record the SQL statements that aniLog runs.
+
+Tracing is off unless aniLog is started with --trace-sql FILE or
+--slow-queries FILE.  Connections are then opened with TracedConnection,
+whose cursors time every statement, including the time spent fetching
+its rows.  Connections opened while tracing is off are plain sqlite3
+connections, so tracing costs nothing unless it is used.
+
+Each statement is written as one JSON object per line:
+    time: When the statement finished, in seconds since the epoch.
+    thread: The thread that ran it, such as 'MainThread' or a writer.
+    db: The database file.
+    command: The Command that ran it, as in keylog, such as 'Scroll' or
+        ':filter'.  Background jobs keep the Command that started them.
+    sql: The statement.
+    params: Its parameters, or the number of parameter sets of an
+        executemany.
+    rows: The rows read, or the rows changed by other statements.
+    ms: The milliseconds spent running it and fetching its rows.
+    error: The error that it raised, if any.
+The trace file gets every statement and is rotated when it reaches
+SQL_TRACE_MAX_BYTES.  The slow query log gets the statements that took
+at least SLOW_QUERY_THRESHOLD milliseconds, with their query plan from
+EXPLAIN QUERY PLAN as a list of lines.
+
+The rows of a select are counted as they are fetched or iterated over,
+so a select is written once its rows have all been read, or when its
+cursor runs another statement, is closed or is garbage collected.  The
+cursors that the connection's own execute and executemany return are
+thrown away by their callers, so their selects are also written when the
+connection runs its next statement.
+
+logging and json are imported when tracing starts, so that they do not
+slow down starting aniLog.
+
+Classes:
+    SQLTracer: Write statements to rotating JSONL files.
+    SQLTraceRegistry: Manage the tracer and the current Command.
+    TracedConnection: An sqlite3 connection that traces its statements.
+    TracedCursor: An sqlite3 cursor that traces its statements.
+
+Functions:
+    connect: Open an sqlite3 connection, traced if tracing is on.
+"""
+import sqlite3
+import threading
+import time
+import weakref
+import settings.performance as performance
+
+# The longest parameter value that is written in full.
+_MAX_PARAM_LEN = 200
+
+
+def _shorten(value):
+    """Return a parameter value that can be written as JSON."""
+    if isinstance(value, (bytes, memoryview)):
+        return '<{} bytes>'.format(len(value))
+    if isinstance(value, str) and len(value) > _MAX_PARAM_LEN:
+        return value[: _MAX_PARAM_LEN] + '...'
+    return value
+
+
+class SQLTracer:
+    """Write statements to rotating JSONL files.
+
+    Methods:
+        trace: Write a statement that has finished.
+        close: Close the files.
+    """
+    def __init__(self, trace_path=None, slow_path=None):
+        """Open the files.
+
+        Args:
+            trace_path (str): The file to write every statement to, or
+                None.
+            slow_path (str): The file to write slow statements to, or
+                None.
+
+        Raises;
+            OSError: If a file cannot be opened.
+        """
+        self._trace = None
+        self._slow = None
+        if trace_path:
+            self._trace = self._open(trace_path)
+        if slow_path:
+            self._slow = self._open(slow_path)
+
+    def trace(self, connection, db_name, sql, params, rows, elapsed,
+              error=None):
+        """Write a statement that has finished.
+
+        This may be called from any thread.
+
+        Args:
+            connection: The sqlite3 connection that ran the statement.
+                Slow statements are explained on it.
+            db_name (str): The database file.
+            sql (str): The statement.
+            params: The parameters, or the number of parameter sets.
+            rows (int): The rows read or changed.
+            elapsed (float): The seconds that the statement took.
+            error (Exception): The error that it raised, or None.
+        """
+        if isinstance(params, (list, tuple)):
+            params = [_shorten(value) for value in params]
+        elif isinstance(params, dict):
+            params = {key: _shorten(value) for key, value in params.items()}
+        entry = {
+            'time': round(time.time(), 3),
+            'thread': threading.current_thread().name,
+            'db': db_name,
+            'command': SQLTraceRegistry.get_command(),
+            'sql': sql,
+            'params': params,
+            'rows': rows,
+            'ms': round(elapsed * 1000, 3),
+            }
+        if error is not None:
+            entry['error'] = str(error)
+        if self._trace is not None:
+            self._write(self._trace, entry)
+        if (self._slow is not None) and\
+                (elapsed * 1000 >= performance.SLOW_QUERY_THRESHOLD):
+            entry['plan'] = self._explain(connection, sql, params)
+            self._write(self._slow, entry)
+
+    def close(self):
+        """Close the files."""
+        for handler in (self._trace, self._slow):
+            if handler is not None:
+                handler.close()
+
+    def _open(self, path):
+        import logging.handlers
+        handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=performance.SQL_TRACE_MAX_BYTES,
+                backupCount=performance.SQL_TRACE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        return handler
+
+    def _write(self, handler, entry):
+        import json
+        import logging
+        # The handler locks, so threads do not mix their lines.
+        handler.handle(logging.makeLogRecord(
+                {'msg': json.dumps(entry, default=repr)}))
+
+    def _explain(self, connection, sql, params):
+        """Return the query plan of a statement as a list of lines.
+
+        A plain cursor is used, so that the explanation is not traced.
+        """
+        if not isinstance(params, (list, tuple, dict)):
+            # The parameters of an executemany are not kept.
+            return []
+        try:
+            plan = sqlite3.Cursor(connection).execute(
+                    'explain query plan ' + sql, params).fetchall()
+        except (sqlite3.Error, ValueError) as err:
+            return ['not explained: {}'.format(err)]
+        return [row[3] for row in plan]
+
+
+class SQLTraceRegistry:
+    """Manage the tracer and the current Command.
+
+    This class provides static methods to start and stop tracing, and to
+    set the Command that the statements of each thread are attributed
+    to.
+
+    Methods:
+        get: Return the tracer.
+        create: Start tracing.
+        destroy: Stop tracing.
+        set_command: Set the Command of the calling thread.
+        get_command: Return the Command of the calling thread.
+    """
+    _tracer = None
+    _local = threading.local()
+
+    @staticmethod
+    def get():
+        """Return the tracer, or None if tracing is off."""
+        return SQLTraceRegistry._tracer
+
+    @staticmethod
+    def create(trace_path=None, slow_path=None):
+        """Start tracing.
+
+        Only connections that are opened afterwards are traced.
+
+        Raises;
+            OSError: If a file cannot be opened.
+        """
+        if SQLTraceRegistry._tracer is None:
+            SQLTraceRegistry._tracer = SQLTracer(trace_path, slow_path)
+        return SQLTraceRegistry._tracer
+
+    @staticmethod
+    def destroy():
+        """Stop tracing and close the files."""
+        if SQLTraceRegistry._tracer is not None:
+            SQLTraceRegistry._tracer.close()
+            SQLTraceRegistry._tracer = None
+
+    @staticmethod
+    def set_command(name):
+        """Set the Command that the calling thread's statements run for.
+
+        Args:
+            name (str): The name of the Command.
+
+        Returns:
+            The name that was set before, to be set back afterwards.
+        """
+        prev = SQLTraceRegistry.get_command()
+        SQLTraceRegistry._local.command = name
+        return prev
+
+    @staticmethod
+    def get_command():
+        """Return the Command of the calling thread, or ''."""
+        return getattr(SQLTraceRegistry._local, 'command', '')
+
+
+class TracedCursor(sqlite3.Cursor):
+    """An sqlite3 cursor that traces its statements.
+
+    Statements that return no rows are written as soon as they have run.
+    A select is written once its rows have all been fetched, or when the
+    cursor runs another statement, is closed or is garbage collected.
+    """
+    def __init__(self, connection):
+        super(TracedCursor, self).__init__(connection)
+        self._pending = None
+
+    def execute(self, sql, params=()):
+        return self._run(super(TracedCursor, self).execute, sql, params,
+                         params)
+
+    def executemany(self, sql, param_seq):
+        param_seq = list(param_seq)
+        return self._run(super(TracedCursor, self).executemany, sql,
+                         param_seq, len(param_seq))
+
+    def __next__(self):
+        try:
+            row = self._fetch(super(TracedCursor, self).__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._count(1, False)
+        return row
+
+    def fetchone(self):
+        row = self._fetch(super(TracedCursor, self).fetchone)
+        self._count(0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._fetch(super(TracedCursor, self).fetchmany, size)
+        self._count(len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super(TracedCursor, self).fetchall)
+        self._count(len(rows), True)
+        return rows
+
+    def close(self):
+        self._finish()
+        super(TracedCursor, self).close()
+
+    def __del__(self):
+        # _pending is missing if the cursor could not be made.
+        if getattr(self, '_pending', None) is not None:
+            self._finish()
+
+    def _run(self, run, sql, args, params):
+        """Run a statement and trace it, or start tracing its rows."""
+        self._finish()
+        self.connection.finish_thrown_away()
+        start = time.perf_counter()
+        try:
+            run(sql, args)
+        except Exception as err:
+            self._write(sql, params, 0, time.perf_counter() - start, err)
+            raise
+        elapsed = time.perf_counter() - start
+        if self.description is None:
+            self._write(sql, params, max(self.rowcount, 0), elapsed)
+        else:
+            # [sql, params, rows, seconds]
+            self._pending = [sql, params, 0, elapsed]
+        return self
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        except StopIteration:
+            raise
+        except Exception as err:
+            if self._pending is not None:
+                sql, params, rows, elapsed = self._pending
+                self._pending = None
+                self._write(sql, params, rows,
+                            elapsed + time.perf_counter() - start, err)
+            raise
+        finally:
+            if self._pending is not None:
+                self._pending[3] += time.perf_counter() - start
+
+    def _count(self, rows, exhausted):
+        if self._pending is not None:
+            self._pending[2] += rows
+            if exhausted:
+                self._finish()
+
+    def _finish(self):
+        """Write the select whose rows are being fetched, if any."""
+        if self._pending is not None:
+            sql, params, rows, elapsed = self._pending
+            self._pending = None
+            self._write(sql, params, rows, elapsed)
+
+    def _write(self, sql, params, rows, elapsed, error=None):
+        tracer = SQLTraceRegistry.get()
+        if tracer is not None:
+            tracer.trace(self.connection, self.connection.db_name, sql,
+                         params, rows, elapsed, error)
+
+
+class TracedConnection(sqlite3.Connection):
+    """An sqlite3 connection that traces its statements.
+
+    Its cursors are TracedCursors, and commits are traced too.
+
+    Attributes:
+        db_name (str): The database file.
+    """
+    def __init__(self, database, *args, **kwargs):
+        super(TracedConnection, self).__init__(database, *args, **kwargs)
+        self.db_name = database
+        # The cursors returned by execute and executemany.
+        self._thrown_away = weakref.WeakSet()
+
+    def cursor(self, factory=TracedCursor):
+        return super(TracedConnection, self).cursor(factory)
+
+    def execute(self, sql, params=()):
+        cursor = self.cursor().execute(sql, params)
+        self._thrown_away.add(cursor)
+        return cursor
+
+    def executemany(self, sql, param_seq):
+        cursor = self.cursor().executemany(sql, param_seq)
+        self._thrown_away.add(cursor)
+        return cursor
+
+    def finish_thrown_away(self):
+        """Write the selects of the cursors of execute and executemany.
+
+        Their rows are counted up to now.  Cursors from cursor, such as
+        those that read pages between other statements, are not
+        finished.
+        """
+        for cursor in list(self._thrown_away):
+            self._thrown_away.discard(cursor)
+            cursor._finish()
+
+    def commit(self):
+        self.finish_thrown_away()
+        start = time.perf_counter()
+        try:
+            super(TracedConnection, self).commit()
+        except Exception as err:
+            self._write_commit(time.perf_counter() - start, err)
+            raise
+        self._write_commit(time.perf_counter() - start)
+
+    def _write_commit(self, elapsed, error=None):
+        tracer = SQLTraceRegistry.get()
+        if tracer is not None:
+            tracer.trace(self, self.db_name, 'commit', None, 0, elapsed,
+                         error)
+
+
+def connect(db_name, **kwargs):
+    """Open an sqlite3 connection, traced if tracing is on.
+
+    Args:
+        db_name (str): The database file.
+        kwargs: The other arguments of sqlite3.connect.
+    """
+    if SQLTraceRegistry.get() is not None:
+        kwargs['factory'] = TracedConnection
+    return sqlite3.connect(db_name, **kwargs)
@@ -0,0 +1,203 @@
+"""Count what aniLog does during a session.
+
+The ':stats' command shows these counts in a stats_pane.StatsPane, so
+that it can be seen where the time of a slow key goes without attaching
+a profiler:
+    db: Statements run by the input thread and their latency, the rows
+        that they read, and the commits of the input thread and of the
+        background jobs.
+    signals: The signals sent, such as Signal.NEW_QUERY or Scroll.DOWN.
+    screen: Tables and rows drawn, status bar messages, refreshes
+        scheduled, terminal updates and their latency, and the latency
+        of keys, from reading a key to updating the terminal.
+    caches: The hits and misses of each cache, and its hit ratio.
+
+Counting is always on.  Each count is one dict update, so it costs
+far less than what it counts.
+
+Classes:
+    Histogram: Count durations in buckets.
+    Stats: Keep the counts of the session.
+"""
+import bisect
+import collections
+
+# The upper bounds of the buckets of a Histogram, in milliseconds.
+_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """Count durations in buckets.
+
+    The buckets are the durations of up to 1, 2, 5, 10, ... 5000
+    milliseconds, and those of more than 5000 milliseconds.
+
+    Methods:
+        add: Count a duration.
+        get_percentile: Return the bucket that holds a percentile.
+        get_lines: Return the histogram as text.
+
+    Attributes:
+        count (int): The number of durations.
+        total (float): The sum of the durations, in seconds.
+        max (float): The longest duration, in seconds.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets = [0] * (len(_BUCKETS) + 1)
+
+    def add(self, seconds):
+        """Count a duration."""
+        self.count = self.count + 1
+        self.total = self.total + seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._buckets[bisect.bisect_left(_BUCKETS, seconds * 1000)] += 1
+
+    def get_percentile(self, percent):
+        """Return the bucket that holds a percentile.
+
+        Returns:
+            The upper bound of the bucket in milliseconds, or None if the
+            percentile is longer than the last bound or nothing has been
+            counted.
+        """
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(_BUCKETS, self._buckets):
+            seen = seen + count
+            if seen >= rank and seen:
+                return bound
+        return None
+
+    def get_lines(self, name):
+        """Return the histogram as lines of text.
+
+        The first line has the count, the mean, the median, the 95th
+        percentile and the maximum.  The next line has the count of
+        each bucket that is not empty.
+        """
+        if not self.count:
+            return ['{}: none'.format(name)]
+        def bound_str(bound):
+            return '>{}'.format(_BUCKETS[-1]) if bound is None\
+                    else '<={}'.format(bound)
+        summary = '{}: {} in {:.1f}s, mean {:.2f}ms, p50 {}ms, p95 {}ms,'\
+                  ' max {:.2f}ms'.format(
+                      name, self.count, self.total,
+                      self.total * 1000 / self.count,
+                      bound_str(self.get_percentile(50)),
+                      bound_str(self.get_percentile(95)), self.max * 1000)
+        bounds = list(_BUCKETS) + [None]
+        buckets = '  '.join('{}ms: {}'.format(bound_str(bound), count)
+                            for bound, count in zip(bounds, self._buckets)
+                            if count)
+        return [summary, '    ' + buckets]
+
+
+class Stats:
+    """Keep the counts of the session.
+
+    This class provides static methods to count events and durations,
+    and to read the counts.  Counts are kept in groups, such as 'db' and
+    'signals'.  They must only be made on the input thread.
+
+    Methods:
+        count: Add to a count.
+        observe: Count a duration in a histogram.
+        watch_cache: Read the hits and misses of a cache when shown.
+        get_lines: Return every count as text.
+        clear: Set every count to zero.
+    """
+    _counts = collections.defaultdict(collections.Counter)
+    _histograms = collections.defaultdict(dict)
+    _caches = {}
+
+    @staticmethod
+    def count(group, name, amount=1):
+        """Add to a count.
+
+        Args:
+            group (str): The group of the count, such as 'db'.
+            name (str): The name of the count.
+            amount (int): The number to add.
+        """
+        Stats._counts[group][name] += amount
+
+    @staticmethod
+    def observe(group, name, seconds):
+        """Count a duration in a histogram.
+
+        Args:
+            group (str): The group of the histogram, such as 'db'.
+            name (str): The name of the histogram.
+            seconds (float): The duration.
+        """
+        histogram = Stats._histograms[group].get(name)
+        if histogram is None:
+            histogram = Histogram()
+            Stats._histograms[group][name] = histogram
+        histogram.add(seconds)
+
+    @staticmethod
+    def watch_cache(name, cache_info):
+        """Read the hits and misses of a cache when the counts are shown.
+
+        Use this for caches that count their own hits, such as those of
+        functools.lru_cache.  Other caches count 'hits' and 'misses' in
+        the 'caches' group, such as 'layout hits'.
+
+        Args:
+            name (str): The name of the cache.
+            cache_info: A function that returns an object with the
+                attributes hits and misses, like the cache_info method of
+                functools.lru_cache.
+        """
+        Stats._caches[name] = cache_info
+
+    @staticmethod
+    def get_lines():
+        """Return every count as lines of text, by group."""
+        lines = []
+        groups = sorted(set(Stats._counts) | set(Stats._histograms))
+        for group in groups:
+            if group == 'caches':
+                continue
+            lines.append('[{}]'.format(group))
+            for name, count in sorted(Stats._counts[group].items()):
+                lines.append('  {}: {}'.format(name, count))
+            for name, histogram in sorted(Stats._histograms[group].items()):
+                lines.extend('  ' + line
+                             for line in histogram.get_lines(name))
+        lines.append('[caches]')
+        for name, hits, misses in Stats._get_caches():
+            total = hits + misses
+            ratio = '{:.1f}%'.format(hits * 100 / total) if total else '-'
+            lines.append('  {}: {} hits, {} misses, {} hit ratio'.format(
+                             name, hits, misses, ratio))
+        return lines
+
+    @staticmethod
+    def clear():
+        """Set every count to zero.
+
+        The caches watched with watch_cache keep their own counts.
+        """
+        Stats._counts.clear()
+        Stats._histograms.clear()
+
+    @staticmethod
+    def _get_caches():
+        """Return tuples (name, hits, misses) of every cache."""
+        caches = []
+        counts = Stats._counts['caches']
+        names = {name.rsplit(' ', 1)[0] for name in counts}
+        for name in sorted(names):
+            caches.append((name, counts[name + ' hits'],
+                           counts[name + ' misses']))
+        for name, cache_info in sorted(Stats._caches.items()):
+            info = cache_info()
+            caches.append((name, info.hits, info.misses))
+        return caches
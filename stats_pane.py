@@ -0,0 +1,66 @@
+"""Show the counts of the session over the Table.
+
+Classes:
+    StatsPane: Show the counts of stats.Stats.
+"""
+import curses
+import backend
+import keylog
+import render
+import stats
+import settings.positions as positions
+
+
+class StatsPane:
+    """Show the counts of stats.Stats over the Table.
+
+    The counts are drawn on a pad from render.PadPool, like the 'ls'
+    list.  j and k scroll one line, and q or Esc closes the pane.
+
+    Methods:
+        open: Show the counts until the pane is closed.
+    """
+    def __init__(self):
+        self._pad = None
+
+    def open(self):
+        """Show the counts until q or Esc is pressed.
+
+        If the screen is resized, then the pane is closed so that the
+        Table can be redrawn.
+        """
+        lines = stats.Stats.get_lines()
+        upper_left = positions.BROWSER_UPPER_LEFT_COORDS
+        bottom_right = positions.BROWSER_BOTTOM_RIGHT_COORDS
+        page = bottom_right[0] - upper_left[0] + 1
+        cols = bottom_right[1] - upper_left[1] + 1
+        self._pad = render.PadPool.borrow(max(len(lines), page), cols)
+        try:
+            for row_idx, line in enumerate(lines):
+                # Leave the last column empty so that writing the last
+                # cell cannot fail.
+                self._pad.addnstr(row_idx, 0, line, cols - 1)
+            self._pad.keypad(1)
+            top = 0
+            while True:
+                self._pad.touchwin()
+                self._pad.noutrefresh(top, 0, *upper_left, *bottom_right)
+                render.RenderScheduler.schedule()
+                render.RenderScheduler.flush()
+                key = self._pad.getch()
+                if key == curses.KEY_RESIZE:
+                    # The Table reads and records it.
+                    backend.BackendRegistry.get().ungetch(key)
+                    return
+                render.RenderScheduler.mark_key()
+                keylog.KeyRecorderRegistry.record([key], 'stats')
+                if key in (ord('q'), 27):
+                    return
+                elif key in (ord('j'), curses.KEY_DOWN):
+                    top = min(top + 1, max(len(lines) - page, 0))
+                elif key in (ord('k'), curses.KEY_UP):
+                    top = max(top - 1, 0)
+        finally:
+            self._pad.keypad(0)
+            render.PadPool.give_back(self._pad)
+            self._pad = None
@@ -1,11 +1,18 @@
+import collections
 import curses
 import curses.textpad
+import math
 import browser
 import shared
 import enums
 import settings.keys
+import settings.performance as performance
 import settings.positions as positions
 import signals
+import render
+import backend
+import keylog
+import stats
 
 
 # TODO: no hard coding
@@ -23,21 +30,35 @@ class StatusBar(signals.Observer):
     to the user.  It is used to notify users about something that
     they should know.
 
+    If the latency HUD is on, then the right end of the status bar shows
+    the latency of the last key, from reading it to updating the
+    terminal, the 95th percentile of the latencies of the last
+    LATENCY_HUD_KEYS keys, and the row count and load state of the
+    current Table.
+
     Methods:
         prompt: Write a message to the status bar.
         create: Setup the status bar.
         update: Redraw the status bar.
         destroy: Close the status bar.
+        show_latency: Add the latency of a key to the HUD.
+        toggle_hud: Show or hide the latency HUD.
     """
     # TODO: this should be __init__(self).
     def __init__(self, position, cmd_map):
-        curses.initscr()
-        curses.noecho()
+        scr = backend.BackendRegistry.get()
+        scr.initscr()
+        scr.noecho()
         self._scr_right_col = curses.COLS
         self._scr_row = positions.STATUS_BAR_COORDS[0]
-        self._win = curses.newwin(1, curses.COLS - 1, self._scr_row, 0)
+        self._win = scr.newwin(1, curses.COLS - 1, self._scr_row, 0)
+        self._win.leaveok(1)
         self._text_pad = curses.textpad.Textbox(self._win, insert_mode=True)
         self._cur_str = ''
+        self._message = ''
+        self._latencies = collections.deque(
+                maxlen=performance.LATENCY_HUD_KEYS)
+        self._show_hud = positions.LATENCY_HUD
         self._last_cmd_name = ''
         self._last_cmd_args = ''
         self._cmd_map = cmd_map
@@ -61,7 +82,7 @@ class StatusBar(signals.Observer):
 
     def destroy(self):
         """Close the status bar."""
-        curses.echo()
+        backend.BackendRegistry.get().echo()
 
     def prompt(self, prompt_str, mode):
         """Show a message.
@@ -76,19 +97,44 @@ class StatusBar(signals.Observer):
 
         Returns:
             'y'/'n': If the mode is enums.Prompt.CONFIRM.
-            An empty string: If the mode is enums.Prompt.ERROR.
+            An empty string: If the mode is enums.Prompt.ERROR or
+                enums.Prompt.INFO.
         """
         ret_str = ''
         if mode == enums.Prompt.CONFIRM:
             self._clear(prompt_str)
+            render.RenderScheduler.flush()
             ret_str = 0
             while not (ret_str == ord('y') or ret_str == ord('n')):
                 ret_str = self._win.getch()
+                render.RenderScheduler.mark_key()
+                keylog.KeyRecorderRegistry.record([ret_str], 'prompt')
             self.redraw()
         elif mode == enums.Prompt.ERROR:
             self._clear('ERROR: {}'.format(prompt_str))
+        elif mode == enums.Prompt.INFO:
+            self._clear(prompt_str)
         return ret_str
 
+    def show_latency(self, seconds):
+        """Add the latency of a key to the HUD.
+
+        The HUD is drawn again if it is shown.  The terminal is updated
+        the next time that render.RenderScheduler is flushed.
+
+        Args:
+            seconds (float): The time from reading the key to updating
+                the terminal.
+        """
+        self._latencies.append(seconds)
+        if self._show_hud:
+            self._draw()
+
+    def toggle_hud(self):
+        """Show the latency HUD if it is hidden, or hide it."""
+        self._show_hud = not self._show_hud
+        self._draw()
+
     def receive_signal(self, signal, args):
         if signal is signals.Signal.SCREEN_RESIZED:
             self._on_screen_resize()
@@ -103,7 +149,9 @@ class StatusBar(signals.Observer):
         else:
             self._scr_right_col = curses.COLS
             self._scr_row = positions.STATUS_BAR_COORDS[0]
-            self._win = curses.newwin(1, curses.COLS - 1, self._scr_row, 0)
+            self._win = backend.BackendRegistry.get().newwin(
+                    1, curses.COLS - 1, self._scr_row, 0)
+            self._win.leaveok(1)
             self._text_pad = curses.textpad.Textbox(self._win, insert_mode=True)
             self.redraw()
 
@@ -124,10 +172,51 @@ class StatusBar(signals.Observer):
         Args:
             new_str: The string to display in the status bar.
         """
+        stats.Stats.count('screen', 'status bar messages')
+        self._message = new_str
+        self._draw()
+
+    def _draw(self):
+        """Draw the message and the HUD, if it is shown."""
+        # The last cell is left empty, since writing it fails.
+        width = self._win.getmaxyx()[1] - 1
+        hud = self._get_hud_str() if self._show_hud else ''
+        if len(hud) + 1 > width:
+            hud = ''
         self._win.move(0, 0)
         self._win.clrtoeol()
-        self._win.addstr(0, 0, new_str)
-        self._win.refresh()
+        # Long messages, such as profile summaries, are cut to fit.
+        self._win.addnstr(0, 0, self._message,
+                          width - len(hud) - 1 if hud else width)
+        if hud:
+            self._win.addstr(0, width - len(hud), hud)
+        self._win.noutrefresh()
+        render.RenderScheduler.schedule()
+
+    def _get_hud_str(self):
+        """Return the latency HUD.
+
+        For example, '3.1ms p95 12.0ms | 10000 rows loaded'.  A Table is
+        'unloaded' until its rows are read, and 'stale' if they must be
+        read again.
+        """
+        if self._latencies:
+            latencies = sorted(self._latencies)
+            # The nearest rank.
+            p95 = latencies[math.ceil(0.95 * len(latencies)) - 1]
+            latency_str = '{:.1f}ms p95 {:.1f}ms'.format(
+                              self._latencies[-1] * 1000, p95 * 1000)
+        else:
+            latency_str = '-'
+        table = browser.BrowserRegistry.get_buffer().get()
+        if not table.is_loaded():
+            state = 'unloaded'
+        elif table.is_stale():
+            state = 'stale'
+        else:
+            state = 'loaded'
+        return '{} | {} rows {}'.format(latency_str, table.get_row_count(),
+                                        state)
 
     def _on_browser_switch(self):
         """Switch to the new browser and display it.
@@ -142,7 +231,8 @@ class StatusBar(signals.Observer):
         else:
             self._scr_right_col = curses.COLS
             self._scr_row = positions.STATUS_BAR_COORDS[0]
-            self._win = curses.newwin(1, curses.COLS - 1, self._scr_row, 0)
+            render.place_window(self._win, 1, curses.COLS - 1, self._scr_row,
+                                0)
             self._text_pad = curses.textpad.Textbox(self._win, insert_mode=True)
             self.redraw()
 
@@ -1,10 +1,20 @@
 import curses
 import os
+import signal
 import settings.keys
 import settings.positions as positions
 import signals
 import browser
 import status_bar
+import workers
+import db
+import render
+import enums
+import backend
+import keylog
+import sqltrace
+import stats
+import settings.performance as performance
 from shared import DBRegistry
 
 # TODO: merge in aniLog.py
@@ -28,25 +38,31 @@ class UI():
         """
         self._win = None
         self._key_map = key_map
+        self._interrupted = False
 
     def create(self):
         """Start curses and the user interface."""
         os.environ['ESCDELAY'] = '25'
-        self._win = curses.initscr()
-        curses.cbreak()
-        curses.noecho()
-        curses.curs_set(0)
+        scr = backend.BackendRegistry.get()
+        self._win = scr.initscr()
+        scr.cbreak()
+        scr.noecho()
+        scr.curs_set(0)
+        signal.signal(signal.SIGINT, self._on_interrupt)
+        DBRegistry.set_interrupt_check(self._check_interrupt)
         self._set_coords()
         self._create_widgets()
 
     def destroy(self):
         """Destroy all object and end curses."""
+        workers.WorkerPoolRegistry.destroy()
         DBRegistry.destroy_all()
         browser.BrowserRegistry.destroy_all()
-        curses.nocbreak()
-        curses.echo()
-        curses.curs_set(1)
-        curses.endwin()
+        scr = backend.BackendRegistry.get()
+        scr.nocbreak()
+        scr.echo()
+        scr.curs_set(1)
+        scr.endwin()
 
     # TODO: no hardcoding.  Also, Alt-q quits the program because key is q.
     # This would be a problem, but the current while loop conditional is
@@ -55,8 +71,27 @@ class UI():
         """Get a sequence of keys from the user and run a command."""
         key = 0
         cmd = None
+        pool = workers.WorkerPoolRegistry.get()
         while key != ord('q'):
+            # While background jobs run, wake up regularly to show their
+            # progress and results.
+            pool.poll()
+            if pool.is_busy():
+                self._win.timeout(performance.JOB_POLL_INTERVAL)
+            else:
+                self._win.timeout(-1)
+            # Show everything that the last key changed at once.
+            render.RenderScheduler.flush()
+            self._show_latency()
             key = self._win.getch()
+            if self._interrupted: # Ctrl-C
+                self._interrupted = False
+                self._run(settings.keys.CommandMap.get()['cancel'])
+            if key == -1: # timed out or interrupted
+                continue
+            render.RenderScheduler.mark_key()
+            if key == curses.KEY_RESIZE:
+                self._wait_for_resize_end()
             if key == 27: # alt or esc
                 # Get a char while pressing Alt.  Otherwise, the char is
                 # gotten after releasing Alt.
@@ -64,19 +99,123 @@ class UI():
                 key = self._win.getch()
                 self._win.nodelay(False)
                 if key == -1: # esc
+                    cmd = settings.keys.CommandMap.get()['cancel']
+                    keylog.KeyRecorderRegistry.record([27],
+                                                      type(cmd).__name__)
+                    self._run(cmd)
                     continue
+                keys = [27, key]
                 try:
                     self._key_map.get_cmd(27)
                     cmd = self._key_map.get_cmd(key)
                 except KeyError:
                     cmd = None
             else:
+                keys = [key]
                 try:
                     cmd = self._key_map.get_cmd(key)
                 except KeyError:
                     cmd = None
+            keylog.KeyRecorderRegistry.record(
+                    keys, 'none' if cmd is None else type(cmd).__name__)
             if cmd is not None:
-                cmd.execute()
+                self._run(cmd)
+
+    def _run(self, cmd):
+        """Execute a command.
+
+        If the command runs a query that is cancelled, then this is
+        shown in the status bar.
+        """
+        prev_command = sqltrace.SQLTraceRegistry.set_command(
+                type(cmd).__name__)
+        try:
+            cmd.execute()
+        except db.QueryCancelledError as err:
+            status_bar.StatusBarRegistry.get().prompt(str(err),
+                                                      enums.Prompt.INFO)
+        finally:
+            sqltrace.SQLTraceRegistry.set_command(prev_command)
+
+    def _show_latency(self):
+        """Show the latency of the last key in the status bar.
+
+        Nothing is done unless a key was read since the last call.  The
+        status bar is updated on its own, which costs one more flush of
+        at most one line.
+        """
+        latency = render.RenderScheduler.end_key()
+        if latency is None:
+            return
+        stats.Stats.observe('screen', 'key latency', latency)
+        status_bar.StatusBarRegistry.get().show_latency(latency)
+        render.RenderScheduler.flush()
+
+    def _wait_for_resize_end(self):
+        """Drop resizes until the screen stops being resized.
+
+        Dragging the corner of a terminal resizes the screen many times.
+        Each resize that follows the last one within
+        RESIZE_DEBOUNCE_INTERVAL milliseconds is dropped, so that the
+        widgets are laid out once, for the final size.  Any other key is
+        left for get_key.
+        """
+        self._win.timeout(performance.RESIZE_DEBOUNCE_INTERVAL)
+        key = self._win.getch()
+        while key == curses.KEY_RESIZE:
+            key = self._win.getch()
+        if key != -1:
+            backend.BackendRegistry.get().ungetch(key)
+        self._win.timeout(-1)
+
+    def _on_interrupt(self, signum, frame):
+        """Remember that Ctrl-C was pressed instead of quitting."""
+        self._interrupted = True
+
+    def _check_interrupt(self, elapsed):
+        """Return True if the running query should be cancelled.
+
+        This is called regularly while a query runs.  The query is
+        cancelled if Esc or Ctrl-C has been pressed.  Any other keys
+        are left for get_key.  The time that the query has been running
+        is shown in the status bar once it becomes noticeable.
+
+        Args:
+            elapsed (float): The seconds that the query has been running.
+        """
+        stat_bar = status_bar.StatusBarRegistry.get()
+        if (stat_bar is not None) and\
+                (elapsed >= performance.QUERY_STATUS_DELAY):
+            stat_bar.prompt('Query running: {:.1f}s (Esc to cancel)'.format(
+                                elapsed),
+                            enums.Prompt.INFO)
+            render.RenderScheduler.flush()
+        if self._interrupted:
+            self._interrupted = False
+            return True
+        # Every key that is waiting is read, so that Esc is seen even if
+        # other keys were typed before it.  Those are given back.
+        self._win.nodelay(True)
+        keys = []
+        key = self._win.getch()
+        while key != -1:
+            keys.append(key)
+            key = self._win.getch()
+        self._win.nodelay(False)
+        cancel = False
+        for idx, key in enumerate(keys):
+            # Esc followed by another key is Alt and that key, unless it
+            # is Esc again.
+            if (key == 27) and ((idx + 1 == len(keys)) or
+                                (keys[idx + 1] == 27)):
+                del keys[idx]
+                cancel = True
+                break
+        # ungetch pushes a key in front of the others.
+        scr = backend.BackendRegistry.get()
+        for key in reversed(keys):
+            scr.ungetch(key)
+        return cancel
 
     def _create_widgets(self):
         """Create the basic widgets to display on startup."""
@@ -86,7 +225,7 @@ class UI():
     # TODO: This will most likely change when the config file is done.
     def _set_coords(self):
         """Set the coordinates for the widgets."""
-        curses.update_lines_cols()
+        backend.BackendRegistry.get().update_lines_cols()
         if positions.STATUS_BAR_POSITION == positions.SCREEN_TOP:
             positions.STATUS_BAR_COORDS = (0, 0)
             positions.BROWSER_UPPER_LEFT_COORDS = (1, 0)
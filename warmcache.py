@@ -0,0 +1,231 @@
+"""Draw the Tables of a loaded session before their rows are read.
+
+':mksession FILE' also writes FILE.cache, an sqlite database with a
+snapshot of each Table whose rows have been read: the rows on its
+screen, already cut to the widths of their columns, the widths, the
+cursor and the scroll position.  ':ldsession FILE' reads the snapshots
+back, so the current Table is drawn from its snapshot at once, and its
+columns are not measured again.
+
+Each snapshot is stamped with the size and modification time of its
+database and of the database's write-ahead log.  If the stamp still
+matches, then the snapshot's rows are the database's, and only the rows
+after them are read.  Otherwise, the snapshot is drawn while its rows
+are read again in the background, and they replace it once read.
+PRAGMA data_version is not used for this: its value only means
+something to the connection that read it, so it cannot be compared
+with one read by an earlier session.
+
+A snapshot is only used if its database schema has not changed and its
+Table has the query that the snapshot was taken with.
+
+Classes:
+    Snapshot: The first rows and the view of a Table.
+    WarmCache: Write and read the snapshots of a session.
+
+Functions:
+    get_stamp: Return the stamp of a database's files.
+"""
+import os
+import sqlite3
+
+# The file that a session's snapshots are kept in is the session's file
+# with this suffix.
+_SUFFIX = '.cache'
+
+
+def get_stamp(db_name):
+    """Return the stamp of a database's files.
+
+    The stamp changes whenever the database or its write-ahead log is
+    written to, by any process.
+
+    Args:
+        db_name (str): The database file.
+    """
+    parts = []
+    for path in (db_name, db_name + '-wal'):
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            parts.append('-')
+            continue
+        parts.append('{}:{}'.format(info.st_size, info.st_mtime_ns))
+    return ' '.join(parts)
+
+
+class Snapshot:
+    """The first rows and the view of a Table.
+
+    Attributes:
+        db_name (str): The database of the Table.
+        table_name (str): The database table that the Table displays.
+        stamp (str): The stamp of the database when the snapshot was
+            taken, from get_stamp.
+        schema_version (int): The version of the database schema.
+        query (str): The statement of the Table's query, without its
+            result columns.
+        widths ([int]): The width of each column.
+        rows ([tuples]): The first rows of the query, cut to the widths.
+        cur_row (int): The index of the current row.
+        cur_col (int): The index of the current column.
+        first_vis_row (int): The index of the first row on the screen.
+        first_vis_col (int): The index of the first column on the screen
+            after the pinned columns.
+    """
+    def __init__(self, db_name, table_name, stamp, schema_version, query,
+                 widths, rows, cur_row=0, cur_col=0, first_vis_row=0,
+                 first_vis_col=0):
+        self.db_name = db_name
+        self.table_name = table_name
+        self.stamp = stamp
+        self.schema_version = schema_version
+        self.query = query
+        self.widths = widths
+        self.rows = rows
+        self.cur_row = cur_row
+        self.cur_col = cur_col
+        self.first_vis_row = first_vis_row
+        self.first_vis_col = first_vis_col
+
+
+class WarmCache:
+    """Write and read the snapshots of a session.
+
+    This class provides static methods to keep the snapshots of a
+    session's Tables in a file next to the session's.
+
+    Methods:
+        get_path: Return the file of a session's snapshots.
+        save: Write the snapshots of a session.
+        load: Read the snapshots of a session.
+    """
+    @staticmethod
+    def get_path(session_path):
+        """Return the file that the snapshots of a session are kept in."""
+        return session_path + _SUFFIX
+
+    @staticmethod
+    def save(session_path, snapshots):
+        """Write the snapshots of a session.
+
+        The snapshots that were written before are replaced.  They are
+        written to another file first, so that a session's snapshots are
+        never left half written.
+
+        Args:
+            session_path (str): The session's file.
+            snapshots ([Snapshot]): The snapshots to write.
+
+        Raises;
+            OSError: If the file cannot be written.
+            sqlite3.Error: If the file cannot be written.
+        """
+        path = WarmCache.get_path(session_path)
+        temp_path = path + '.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.execute(
+                    'create table snapshot (db text, tbl text, stamp text,'
+                    ' schema_version integer, query text, widths text,'
+                    ' cur_row integer, cur_col integer,'
+                    ' first_vis_row integer, first_vis_col integer,'
+                    ' primary key (db, tbl))')
+            # Each value is a row of its own, so that it keeps its type,
+            # and tables of any number of columns fit.
+            connection.execute(
+                    'create table cell (db text, tbl text, row_idx integer,'
+                    ' col_idx integer, value,'
+                    ' primary key (db, tbl, row_idx, col_idx))'
+                    ' without rowid')
+            for snapshot in snapshots:
+                connection.execute(
+                        'insert into snapshot values'
+                        ' (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (snapshot.db_name, snapshot.table_name,
+                         snapshot.stamp, snapshot.schema_version,
+                         snapshot.query,
+                         ','.join(str(width) for width in snapshot.widths),
+                         snapshot.cur_row, snapshot.cur_col,
+                         snapshot.first_vis_row, snapshot.first_vis_col))
+                connection.executemany(
+                        'insert into cell values (?, ?, ?, ?, ?)',
+                        ((snapshot.db_name, snapshot.table_name, row_idx,
+                          col_idx, value)
+                         for row_idx, row in enumerate(snapshot.rows)
+                         for col_idx, value in enumerate(row)))
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(session_path):
+        """Read the snapshots of a session.
+
+        Args:
+            session_path (str): The session's file.
+
+        Returns:
+            A dict that maps each (database, table) to its Snapshot.  It
+            is empty if the session has no snapshots, or if they cannot
+            be read.
+        """
+        path = WarmCache.get_path(session_path)
+        if not os.path.exists(path):
+            return {}
+        snapshots = {}
+        # The path is quoted, so that a '?', '#' or '%' in it is not taken
+        # as part of the URI.  This is all that sqlite needs quoted.
+        quoted = os.path.abspath(path).replace('%', '%25').\
+                replace('?', '%3f').replace('#', '%23')
+        uri = 'file:{}?mode=ro'.format(quoted)
+        try:
+            connection = sqlite3.connect(uri, uri=True)
+        except sqlite3.Error:
+            return {}
+        try:
+            rows = connection.execute('select * from snapshot').fetchall()
+            for row in rows:
+                snapshot = WarmCache._load_snapshot(connection, row)
+                if snapshot is not None:
+                    snapshots[(snapshot.db_name, snapshot.table_name)] =\
+                            snapshot
+        except sqlite3.Error:
+            return {}
+        finally:
+            connection.close()
+        return snapshots
+
+    @staticmethod
+    def _load_snapshot(connection, row):
+        """Read a snapshot and its rows.
+
+        Args:
+            connection (sqlite3.Connection): The connection to the file of
+                the snapshots.
+            row (tuple): The snapshot's row of the snapshot table.
+
+        Returns:
+            The Snapshot, or None if it cannot be read.
+        """
+        db_name, table_name, stamp, schema_version, query, widths = row[: 6]
+        try:
+            widths = [int(width) for width in widths.split(',')]\
+                    if widths else []
+            snapshot = Snapshot(db_name, table_name, stamp, schema_version,
+                                query, widths, [], *row[6:])
+            if not widths:
+                return snapshot
+            values = [cell[0] for cell in connection.execute(
+                          'select value from cell where db = ? and tbl = ?'
+                          ' order by row_idx, col_idx',
+                          (db_name, table_name))]
+        except (sqlite3.Error, AttributeError, TypeError, ValueError):
+            return None
+        width = len(widths)
+        snapshot.rows = [tuple(values[idx: idx + width])
+                         for idx in range(0, len(values), width)]
+        return snapshot
@@ -0,0 +1,314 @@
+"""Run long commands in the background.
+
+Commands that touch many rows, such as pasting a large copy buffer or
+deleting many selected rows, would block the keyboard until they
+finish.  This module runs them on worker threads instead.  Each
+database gets exactly one worker thread so that there is never more
+than one background writer per database, which is what SQLite's
+locking expects.
+
+Curses is not thread safe, so worker threads never touch the screen.
+They post events (progress, committed batches, completion) to a queue
+that the input thread drains by calling WorkerPool.poll.  All Job
+callbacks run on the input thread.
+
+Classes:
+    Job: A unit of work that runs on a worker thread.
+    WorkerPool: Run Jobs with one writer thread per database.
+    WorkerPoolRegistry: Manage the worker pool.
+"""
+import queue
+import sqlite3
+import threading
+import sqltrace
+import stats
+import settings.performance as performance
+
+
+class Job:
+    """A unit of work that runs on a worker thread.
+
+    The work is a function that takes the Job and an sqlite3
+    connection to the Job's database.  The connection belongs to the
+    worker thread, so it must not be kept after the function returns.
+    The function should call progress and committed as it goes, and
+    should return as soon as is_cancelled returns True.
+
+    The callbacks are called on the input thread by WorkerPool.poll.
+    Each one takes the Job as its first argument.
+
+    Attributes:
+        name (str): A short description shown in the status bar.
+        db_name (str): The database that the Job works on.
+        done (int): The number of units (rows, tables) finished.
+        total (int): The number of units to finish.
+        error (Exception): The error that stopped the Job, or None.
+        command (str): The Command that created the Job.  Its statements
+            are traced as this Command's.
+        cancellable (bool): Whether the user can cancel the Job.  Jobs
+            that aniLog starts on its own, such as prefetches, are not.
+    """
+    def __init__(self, name, db_name, work, on_progress=None,
+                 on_commit=None, on_done=None, cancellable=True):
+        """Constructor.
+
+        Args:
+            name (str): A short description of the Job.
+            db_name (str): The name of the database to work on.
+            work: A function that takes the Job and an sqlite3
+                connection, and does the work.
+            on_progress: Called with the Job whenever progress is
+                reported.
+            on_commit: Called with the Job and the result that was
+                passed to committed.
+            on_done: Called with the Job once it has finished, has
+                been cancelled, or has failed.
+            cancellable (bool): Whether the user can cancel the Job.
+        """
+        self.name = name
+        self.db_name = db_name
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.command = sqltrace.SQLTraceRegistry.get_command()
+        self.cancellable = cancellable
+        self._work = work
+        self._on_progress = on_progress
+        self._on_commit = on_commit
+        self._on_done = on_done
+        self._cancelled = threading.Event()
+        self._finished = False
+        # The connection is shared by the Jobs of a database, so it is
+        # only interrupted while this Job holds it.
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._events = None
+        self._ran = threading.Event()
+
+    def cancel(self):
+        """Ask the Job to stop.
+
+        Batches that have already been committed are kept.  A statement
+        that is running is interrupted and its batch is rolled back.
+        """
+        self._cancelled.set()
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.interrupt()
+
+    def is_cancelled(self):
+        """Return True if the Job has been asked to stop."""
+        return self._cancelled.is_set()
+
+    def is_finished(self):
+        """Return True if the Job's on_done callback has been called."""
+        return self._finished
+
+    def progress(self, done, total):
+        """Report progress.  Call this from the work function."""
+        self._events.put((self, self._deliver_progress, (done, total)))
+
+    def committed(self, result=None):
+        """Report a committed batch.  Call this from the work function.
+
+        Args:
+            result: Anything that on_commit needs to show the batch,
+                such as the primary keys of the affected rows.
+        """
+        self._events.put((self, self._deliver_commit, (result,)))
+
+    def _run(self, connection, events):
+        """Run the work function on the worker thread."""
+        self._events = events
+        with self._connection_lock:
+            self._connection = connection
+        # interrupt only stops the statements that are running, so one
+        # that starts just after cancel is stopped by this handler.
+        connection.set_progress_handler(self._cancelled.is_set,
+                                        performance.PROGRESS_HANDLER_STEPS)
+        prev_command = sqltrace.SQLTraceRegistry.set_command(self.command)
+        try:
+            if not self.is_cancelled():
+                self._work(self, connection)
+        except sqlite3.OperationalError as err:
+            connection.rollback()
+            if not self.is_cancelled():
+                self.error = err
+        except Exception as err:
+            connection.rollback()
+            self.error = err
+        finally:
+            sqltrace.SQLTraceRegistry.set_command(prev_command)
+            # Once released, a late cancel cannot interrupt the next Job.
+            with self._connection_lock:
+                self._connection = None
+            connection.set_progress_handler(None, 0)
+            events.put((self, self._deliver_done, ()))
+            self._ran.set()
+
+    def _deliver_progress(self, done, total):
+        self.done = done
+        self.total = total
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    def _deliver_commit(self, result):
+        stats.Stats.count('db', 'background commits')
+        if self._on_commit is not None:
+            self._on_commit(self, result)
+
+    def _deliver_done(self):
+        self._finished = True
+        if self._on_done is not None:
+            self._on_done(self)
+
+
+class _Writer(threading.Thread):
+    """A thread that runs the Jobs of one database, one at a time."""
+    def __init__(self, db_name, events):
+        super(_Writer, self).__init__(name='writer:' + db_name, daemon=True)
+        self._db_name = db_name
+        self._events = events
+        self._jobs = queue.Queue()
+
+    def submit(self, job):
+        self._jobs.put(job)
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def run(self):
+        connection = sqltrace.connect(self._db_name,
+                                      timeout=performance.WORKER_BUSY_TIMEOUT)
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                job._run(connection, self._events)
+        finally:
+            connection.close()
+
+
+class WorkerPool:
+    """Run Jobs with one writer thread per database.
+
+    Methods:
+        submit: Queue a Job.
+        run_now: Run a Job and wait a moment for it.
+        poll: Deliver the events posted by the worker threads.
+        is_busy: Return True if any Job has not finished.
+        cancel_all: Cancel every queued and running Job.
+        shutdown: Cancel everything and stop the threads.
+    """
+    def __init__(self):
+        self._writers = {}
+        self._events = queue.Queue()
+        self._jobs = []
+
+    def submit(self, job):
+        """Queue a Job on its database's writer thread.
+
+        Jobs for the same database run in the order they are
+        submitted.  Jobs for different databases run concurrently.
+        """
+        writer = self._writers.get(job.db_name)
+        if writer is None:
+            writer = _Writer(job.db_name, self._events)
+            self._writers[job.db_name] = writer
+            writer.start()
+        self._jobs.append(job)
+        writer.submit(job)
+
+    def run_now(self, job):
+        """Run a Job and deliver its events if it finishes at once.
+
+        Use this for small Jobs, so that their results show up without
+        waiting for the next poll.  The Job is queued on its database's
+        writer thread like any other, so it runs after the Jobs queued
+        before it, and waits for the database's lock on that thread.
+        The calling thread waits at most RUN_NOW_TIMEOUT for it.
+
+        Returns:
+            True if the Job finished and its events were delivered, or
+            False if it is still queued or running.
+        """
+        self.submit(job)
+        finished = job._ran.wait(performance.RUN_NOW_TIMEOUT)
+        self.poll()
+        return finished
+
+    def poll(self):
+        """Deliver all pending events to their Jobs' callbacks.
+
+        This must be called from the input thread.
+
+        Returns:
+            True if any events were delivered.
+        """
+        delivered = False
+        while True:
+            try:
+                job, deliver, args = self._events.get_nowait()
+            except queue.Empty:
+                return delivered
+            if deliver == job._deliver_done:
+                self._jobs.remove(job)
+            deliver(*args)
+            delivered = True
+
+    def is_busy(self):
+        """Return True if any submitted Job has not been delivered."""
+        return bool(self._jobs)
+
+    def cancel_all(self, cancellable_only=False):
+        """Cancel every queued and running Job.
+
+        Args:
+            cancellable_only (bool): Whether to cancel only the Jobs
+                that the user can cancel.
+
+        Returns:
+            The number of Jobs that were cancelled.
+        """
+        jobs = [job for job in self._jobs
+                if job.cancellable or not cancellable_only]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def shutdown(self):
+        """Cancel all Jobs and wait for the worker threads to stop."""
+        self.cancel_all()
+        for writer in self._writers.values():
+            writer.stop()
+        for writer in self._writers.values():
+            writer.join(performance.WORKER_SHUTDOWN_TIMEOUT)
+        self._writers.clear()
+
+
+class WorkerPoolRegistry:
+    """Manage the worker pool.
+
+    This class provides static methods to create and access the
+    worker pool.  It makes sure that there is only one.
+
+    Methods:
+        get: Return the worker pool, creating it if needed.
+        destroy: Stop the worker pool.
+    """
+    _pool = None
+
+    @staticmethod
+    def get():
+        """Return the worker pool."""
+        if WorkerPoolRegistry._pool is None:
+            WorkerPoolRegistry._pool = WorkerPool()
+        return WorkerPoolRegistry._pool
+
+    @staticmethod
+    def destroy():
+        """Cancel all Jobs and stop the worker threads."""
+        if WorkerPoolRegistry._pool is not None:
+            WorkerPoolRegistry._pool.shutdown()
+            WorkerPoolRegistry._pool = None